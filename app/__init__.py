@@ -1,9 +1,14 @@
+import os
+
 from flask import Flask
 from flask_cors import CORS # 1. 从 flask_cors 导入 CORS
 
 
-def create_app():
-    """创建并配置 Flask 应用程序实例。"""
+def create_app(start_mqtt: bool = False):
+    """
+    创建并配置 Flask 应用程序实例。
+    start_mqtt=True 时在当前进程启动 MQTT 接收（每个进程只启动一次，见 app.mqtt_service）。
+    """
     app = Flask(__name__)
 
     # 精细化配置CORS
@@ -19,7 +24,16 @@ def create_app():
     # 可以从这里加载配置，例如从 config.py 文件或环境变量
     # app.config.from_object('app.config.Config') # 如果有 config.py
     # 或者直接在这里设置一些基本配置
-    app.config['DEBUG'] = True
+    # 生产环境默认关闭调试；开发时设置 RESTFUL_DEBUG=1（run.py 开发服务器另行开启）
+    app.config['DEBUG'] = os.environ.get('RESTFUL_DEBUG', '0') == '1'
+    # 推論結果的接收方式：per_topic（每个摄像头一个订阅）或 wildcard（一个通配订阅）
+    app.config['INFERENCE_INGEST'] = os.environ.get('RESTFUL_INFERENCE_INGEST', 'per_topic')
+    # wildcard 模式必需（无默认值）：订阅的 topic filter、推論結果 topic 的前缀、inference_result_pb2.py 所在目录
+    app.config['INFERENCE_TOPIC_FILTER'] = os.environ.get('RESTFUL_INFERENCE_TOPIC_FILTER', '')
+    app.config['INFERENCE_TOPIC_PREFIX'] = os.environ.get('RESTFUL_INFERENCE_TOPIC_PREFIX', '')
+    app.config['PROTOBUF_DIR'] = os.environ.get('RESTFUL_PROTOBUF_DIR', '')
+    # 管理接口（/system/profile 等）的令牌，请求头 X-Admin-Token；未设置时管理接口一律拒绝
+    app.config['ADMIN_TOKEN'] = os.environ.get('RESTFUL_ADMIN_TOKEN', '')
     app.config['SECRET_KEY'] = 'your_super_secret_key' # 生产环境请使用更复杂的密钥
 
     # 导入并注册蓝图
@@ -42,4 +56,12 @@ def create_app():
     app.register_blueprint(bp_alert)    # '/panel/alert/*'
     app.register_blueprint(bp_keyarea)  # '/panel/keyarea/*'
 
+    # 所有蓝图的请求耗时（/metrics）
+    from .utils import metrics
+    metrics.init_app(app)
+
+    if start_mqtt:
+        from . import mqtt_service
+        mqtt_service.init_app(app)
+
     return app
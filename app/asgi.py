@@ -0,0 +1,88 @@
+# app/asgi.py
+import asyncio
+import re
+
+from a2wsgi import WSGIMiddleware
+from flask import Flask
+
+from app.routes.keyarea import FRAME_VARIANTS
+from app.utils.frame_hub import DEFAULT_KEEPALIVE_SEC, get_frame_hub
+from app.utils.receiver_registry import get_receiver, hold_frames_async
+
+
+# 走异步路径的帧流路由（与 keyarea.py 中的 /frame、/frame800 对应）
+FRAME_PATH = re.compile(r"^/panel/keyarea/(\d+)/(frame|frame800)$")
+
+
+async def _wait_disconnect(receive):
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            return
+
+
+class FrameStreamingASGI:
+    """
+    ASGI 入口：MJPEG 帧流由协程直接从 FrameHub 读取（等待新帧时不占用线程），
+    其余所有路由原样交给 Flask（a2wsgi 线程池执行）。
+
+    wsgi_app 可传入包装过的 Flask WSGI 应用（例如 StreamSlotMiddleware），
+    frame 路由的配置（MJPEG_KEEPALIVE_SEC / MJPEG_ADAPTIVE / receivers）取自 flask_app.config。
+    """
+
+    def __init__(self, flask_app: Flask, wsgi_app=None, workers: int = 10):
+        self.flask_app = flask_app
+        self.wsgi = WSGIMiddleware(wsgi_app or flask_app, workers=workers)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "GET":
+            m = FRAME_PATH.match(scope["path"])
+            if m:
+                await self._serve_frames(int(m.group(1)), FRAME_VARIANTS[m.group(2)], receive, send)
+                return
+        await self.wsgi(scope, receive, send)
+
+    async def _serve_frames(self, magistrate_id: int, variant, receive, send):
+        config = self.flask_app.config
+        receiver = get_receiver(config, magistrate_id)
+        if receiver is None:
+            await send({
+                "type": "http.response.start",
+                "status": 404,
+                "headers": [(b"content-type", b"text/html; charset=utf-8")],
+            })
+            await send({
+                "type": "http.response.body",
+                "body": f"MQTT receiver not found for pipeline_inference_{magistrate_id}".encode(),
+            })
+            return
+
+        hub = get_frame_hub(magistrate_id, receiver)
+        frames = hold_frames_async(config, magistrate_id, hub.stream_async(
+            variant,
+            config.get("MJPEG_KEEPALIVE_SEC", DEFAULT_KEEPALIVE_SEC),
+            config.get("MJPEG_ADAPTIVE", True),
+        ))
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"multipart/x-mixed-replace; boundary=frame"),
+                (b"cache-control", b"no-cache"),
+            ],
+        })
+
+        async def _pump():
+            async for chunk in frames:
+                await send({"type": "http.response.body", "body": chunk, "more_body": True})
+
+        # 输出与断线检测并行：客户端断开时立即取消输出协程，不必等到下一帧
+        pump = asyncio.ensure_future(_pump())
+        disconnect = asyncio.ensure_future(_wait_disconnect(receive))
+        try:
+            await asyncio.wait({pump, disconnect}, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            pump.cancel()
+            disconnect.cancel()
+            await asyncio.gather(pump, disconnect, return_exceptions=True)
+            await frames.aclose()
@@ -0,0 +1,106 @@
+# app/mqtt_service.py
+import atexit
+import os
+import threading
+
+from flask import Flask
+
+from app.utils.inference_ingest import WildcardInferenceIngest
+from app.utils.receiver_registry import DEFAULT_IDLE_GRACE_SEC, ReceiverRegistry
+from pyengine.io.network.mqtt_bus import MqttBus
+from pyengine.io.network.mqtt_plugins import MqttPluginManager
+from pyengine.io.network.plugins.heart_beat_receiver import HeartbeatReceiverPlugin
+
+
+# 通配订阅模式必需的配置项 -> 对应的环境变量（见 app.create_app）
+_WILDCARD_REQUIRED = {
+    "INFERENCE_TOPIC_FILTER": "RESTFUL_INFERENCE_TOPIC_FILTER",
+    "INFERENCE_TOPIC_PREFIX": "RESTFUL_INFERENCE_TOPIC_PREFIX",
+    "PROTOBUF_DIR": "RESTFUL_PROTOBUF_DIR",
+}
+
+# 每个进程只启动一次：(pid, bus, plugin_manager, 注入到 app.config 的插件)
+# 记录 pid 是为了多 worker（fork）模式下，子进程不会误用父进程的连接。
+_service = None
+_service_lock = threading.Lock()
+
+
+def _start_mqtt_receiver(config):
+    """
+    启动 MQTT 总线与心跳接收插件，返回 (bus, pm, 插件字典)。推論結果接收器由 ReceiverRegistry 按需创建：
+      - INFERENCE_INGEST = "per_topic"（默认）：每个摄像头一个 InferenceResultReceiverPlugin；
+      - INFERENCE_INGEST = "wildcard"：所有摄像头共用一个通配订阅（见 WildcardInferenceIngest），
+        必须同时配置 INFERENCE_TOPIC_FILTER / INFERENCE_TOPIC_PREFIX / PROTOBUF_DIR，缺失时抛出 ValueError。
+    """
+
+    # 从 pipeline_config 读取 broker 配置（容错）
+    host = "127.0.0.1"
+    port = 1883
+    # client_id = f"status_dashboard_{os.getpid()}"  # 测试用ID
+    client_id = "status_dashboard"
+
+    # 启动总线
+    bus = MqttBus(host=host, port=port, client_id=client_id)
+    bus.start()
+
+    # 注册插件
+    pm = MqttPluginManager(bus)
+    receiver = HeartbeatReceiverPlugin(topics=["pipelines/+/status", "magistrates/+/status"], timeout_sec=20, debug=False)
+    pm.register(receiver)
+
+    # 启动插件
+    pm.start()
+
+    ingest = None
+    if config.get("INFERENCE_INGEST", "per_topic") == "wildcard":
+        missing = [f"{key} ({env})" for key, env in _WILDCARD_REQUIRED.items() if not config.get(key)]
+        if missing:
+            raise ValueError("INFERENCE_INGEST=wildcard requires " + ", ".join(missing))
+        ingest = WildcardInferenceIngest(
+            host=host, port=port, client_id=f"{client_id}_ingest",
+            topic_filter=config["INFERENCE_TOPIC_FILTER"],
+            topic_prefix=config["INFERENCE_TOPIC_PREFIX"],
+            pb2_dir=config["PROTOBUF_DIR"],
+        )
+
+    plugins = {
+        "mqtt_bus": bus,
+        "hb_receiver": receiver,
+        "receivers": ReceiverRegistry(
+            bus,
+            idle_grace_sec=config.get("RECEIVER_IDLE_GRACE_SEC", DEFAULT_IDLE_GRACE_SEC),
+            ingest=ingest,
+        ),
+    }
+    return bus, pm, plugins
+
+
+def init_app(app: Flask):
+    """
+    app factory 钩子：在当前进程中启动 MQTT（只启动一次），并把插件实例放进 app.config
+    （路由用 current_app.config["hb_receiver"] / ["receivers"] 访问）。
+    """
+    global _service
+    with _service_lock:
+        if _service is None or _service[0] != os.getpid():
+            bus, pm, plugins = _start_mqtt_receiver(app.config)
+            _service = (os.getpid(), bus, pm, plugins)
+            atexit.register(stop)
+        app.config.update(_service[3])
+
+
+def stop():
+    """退出时优雅关闭插件与总线。"""
+    global _service
+    with _service_lock:
+        if _service is None or _service[0] != os.getpid():
+            return
+        _, bus, pm, plugins = _service
+        _service = None
+    try:
+        plugins["receivers"].stop_all()
+        if pm:
+            pm.stop()
+    finally:
+        if bus:
+            bus.stop()
@@ -1,14 +1,11 @@
 # app/routes/alert.py
 import json
 from flask import Blueprint, render_template, request, make_response
-from app.utils import file_utils
+from app.utils import config_repo, file_utils
 from pyengine.utils.logger import logger
 
-from pyengine.config.magistrate_config_parser import (
-    load_magistrate_config,
-    save_magistrate_config,
-    MagistrateConfig,
-)
+from pyengine.config.magistrate_config_parser import MagistrateConfig
+from pyengine.config.pipeline_config_parser import PipelineConfig
 
 bp_alert = Blueprint('alert', __name__)
 
@@ -20,10 +17,8 @@ def get_alert_config_panel(magistrate_id: int):
     """
     加载并渲染警报配置面板。
     """
-    cfg_name = f"magistrate_config{magistrate_id}"
     try:
-        cfg_path = file_utils.get_config(cfg_name)
-        cfg: MagistrateConfig = load_magistrate_config(cfg_path)
+        cfg: MagistrateConfig = config_repo.get_magistrate_config(magistrate_id)
 
         low_area = cfg.client_magistrate.normal_area_strategy
         high_area = cfg.client_magistrate.key_area_strategy
@@ -99,13 +94,15 @@ def get_alert_config_panel(magistrate_id: int):
 def toggle_alert_strategy(magistrate_id: int, area: str, strategy: str):
     """
     通用路由：返回按钮 HTML，并使用 OOB 同步更新本行两个 input（阈值/罚点）的 disabled 状态。
-    - GET：用于 alert_config_panel.html 初次渲染时的 hx-get（不切状态，只读取配置）
+    - GET：只读取配置返回按钮（面板初次渲染已直接内联全部按钮，不再逐个 hx-get；保留作兼容）
     - POST：用于点按钮切换（需要 hx-include="closest tr" 带回本行两个 input 的当前值）
     """
     try:
-        cfg_name = f"magistrate_config{magistrate_id}"
-        cfg_path = file_utils.get_config(cfg_name)
-        cfg: MagistrateConfig = load_magistrate_config(cfg_path)
+        # POST 要修改配置，取可修改的副本；GET 只读共享快照
+        if request.method == 'POST':
+            cfg: MagistrateConfig = config_repo.edit_magistrate_config(magistrate_id)
+        else:
+            cfg: MagistrateConfig = config_repo.get_magistrate_config(magistrate_id)
 
         # 映射 normal_area/key_area -> 对象属性
         area_attribute_name = f"{area}_strategy"
@@ -115,8 +112,7 @@ def toggle_alert_strategy(magistrate_id: int, area: str, strategy: str):
         # 如果是点击按钮（POST），翻转 enable 并保存
         if request.method == 'POST':
             target_strategy.enable = not bool(target_strategy.enable)
-            save_magistrate_config(cfg_path, cfg)
-            file_utils.copy_single_config(cfg_name)
+            config_repo.save_magistrate(magistrate_id, cfg, sync=True)
 
         # 读取“新的”启用状态
         is_enabled = bool(target_strategy.enable)
@@ -161,11 +157,9 @@ def update_alert_config_panel(magistrate_id: int):
     提交表单 -> 写回 magistrate_config{id}.yaml -> 同步 ->
     返回上一级面板 panel.html，并用 OOB 在 1 秒后 hx-get /panel/magistrate/{id} + push URL
     """
-    cfg_name = f"magistrate_config{magistrate_id}"
     try:
-        # 1) 读取 & 解析
-        cfg_path = file_utils.get_config(cfg_name)
-        cfg: MagistrateConfig = load_magistrate_config(cfg_path)
+        # 1) 读取（可修改的副本）
+        cfg: MagistrateConfig = config_repo.edit_magistrate_config(magistrate_id)
         f = request.form
 
         # 2) 更新 normal_area / key_area（阈值/罚点）
@@ -227,13 +221,10 @@ def update_alert_config_panel(magistrate_id: int):
                     setattr(cfg.general_settings, field, value)
 
         # 5) 保存 & 同步
-        save_magistrate_config(cfg_path, cfg)
-        file_utils.copy_single_config(cfg_name)
+        config_repo.save_magistrate(magistrate_id, cfg, sync=True)
 
         # 6) 渲染回上一级面板（需要 alias/IP，和 cloud/camera 一样从 pipeline_config 取）
-        from pyengine.config.pipeline_config_parser import load_pipeline_config, PipelineConfig
-        p_path = file_utils.get_config("pipeline_config")
-        pcfg: PipelineConfig = load_pipeline_config(p_path)
+        pcfg: PipelineConfig = config_repo.get_pipeline_config()
         inf_name = f"pipeline_inference_{magistrate_id}"
         inf = pcfg.client_pipeline.inferences.get(inf_name)
         alias = getattr(inf, "alias", f"クライアント {magistrate_id}") if inf else f"クライアント {magistrate_id}"
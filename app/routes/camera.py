@@ -1,10 +1,8 @@
 # app/routes/camera.py
 import json
 from flask import Blueprint, make_response, render_template, request
-from app.utils import file_utils
-from pyengine.config.pipeline_config_parser import (
-    load_pipeline_config, save_pipeline_config, PipelineConfig, CameraConfig
-)
+from app.utils import config_repo, file_utils
+from pyengine.config.pipeline_config_parser import PipelineConfig, CameraConfig
 from pyengine.utils.logger import logger
 
 
@@ -12,10 +10,8 @@ bp_camera = Blueprint('camera', __name__)
 
 @bp_camera.route('/panel/camera/<int:camera_id>', methods=['GET'])
 def get_camera_config_panel(camera_id: int):
-    config_name = "pipeline_config"
     try:
-        pipeline_config = file_utils.get_config(config_name)
-        magistrate_config = load_pipeline_config(pipeline_config)
+        magistrate_config = config_repo.get_pipeline_config()
         inference_name = f"pipeline_inference_{camera_id}"
         cam_cfg = magistrate_config.client_pipeline.inferences[inference_name]
 
@@ -36,8 +32,7 @@ def get_camera_config_panel(camera_id: int):
 @bp_camera.route('/panel/camera/<int:camera_id>', methods=['POST'])
 def update_camera_config_panel(camera_id: int):
     try:
-        cfg_path = file_utils.get_config("pipeline_config")
-        cfg: PipelineConfig = load_pipeline_config(cfg_path)
+        cfg: PipelineConfig = config_repo.edit_pipeline_config()
 
         name = f"pipeline_inference_{camera_id}"
         if name not in cfg.client_pipeline.inferences:
@@ -67,8 +62,7 @@ def update_camera_config_panel(camera_id: int):
             cam.password  = f.get('password') or None
 
         # —— 保存并同步（保持不变）——
-        save_pipeline_config(cfg_path, cfg)
-        file_utils.copy_single_config("pipeline_config")
+        config_repo.save_pipeline(cfg, sync=True)
 
         # —— 仅回上一级面板，不再发送 HX-Trigger —— ★关键修改
         alias = inf.alias
@@ -1,19 +1,11 @@
 # app/routes/cloud.py
 import json
 from flask import Blueprint, make_response, render_template, request
-from app.utils import file_utils
+from app.utils import config_repo, file_utils
 from pyengine.utils.logger import logger
 
-from pyengine.config.magistrate_config_parser import (
-    load_magistrate_config,
-    save_magistrate_config,
-    MagistrateConfig,
-)
-
-from pyengine.config.pipeline_config_parser import (
-    load_pipeline_config,
-    PipelineConfig,
-)
+from pyengine.config.magistrate_config_parser import MagistrateConfig
+from pyengine.config.pipeline_config_parser import PipelineConfig
 
 bp_cloud = Blueprint('cloud', __name__)
 
@@ -23,10 +15,8 @@ def get_cloud_config_panel(magistrate_id: int):
     """
     显示云配置面板：用模型读取 magistrate_config{id}.yaml，并把 cloud.* 渲染到表单
     """
-    cfg_name = f"magistrate_config{magistrate_id}"
     try:
-        cfg_path = file_utils.get_config(cfg_name)
-        cfg: MagistrateConfig = load_magistrate_config(cfg_path)
+        cfg: MagistrateConfig = config_repo.get_magistrate_config(magistrate_id)
 
         cloud = cfg.client_magistrate.cloud
         data = {
@@ -54,16 +44,14 @@ def get_cloud_config_panel(magistrate_id: int):
 def update_cloud_config_panel(magistrate_id: int):
     """
     更新云配置：
-      1) 用解析器读取 magistrate_config{id}.yaml 为模型
+      1) 从配置仓库取得 magistrate_config{id}.yaml 模型的可修改副本
       2) 修改 cloud.sceptical_image / cloud.patrol_image
-      3) save_magistrate_config() 写回 YAML，file_utils.sync_single_config() 同步
+      3) config_repo.save_magistrate(sync=True) 合并写回 YAML，落盘后同步到设备目录
       4) 渲染回上一级面板（/panel/magistrate/{id} 的 HTML 片段），不再发送 HX-Trigger
     """
-    cfg_name = f"magistrate_config{magistrate_id}"
     try:
-        # 1) 读取为模型
-        cfg_path = file_utils.get_config(cfg_name)
-        cfg: MagistrateConfig = load_magistrate_config(cfg_path)
+        # 1) 读取为模型（可修改的副本）
+        cfg: MagistrateConfig = config_repo.edit_magistrate_config(magistrate_id)
 
         f = request.form
         cloud = cfg.client_magistrate.cloud
@@ -85,12 +73,10 @@ def update_cloud_config_panel(magistrate_id: int):
             cloud.upload_level = int(ul_raw)
 
         # 3) 写回并同步
-        save_magistrate_config(cfg_path, cfg)
-        file_utils.copy_single_config(cfg_name)
+        config_repo.save_magistrate(magistrate_id, cfg, sync=True)
 
         # 4) 渲染回上一级面板（alias/IP 从 pipeline_config 读取）
-        p_path = file_utils.get_config("pipeline_config")
-        pcfg: PipelineConfig = load_pipeline_config(p_path)
+        pcfg: PipelineConfig = config_repo.get_pipeline_config()
         inf_name = f"pipeline_inference_{magistrate_id}"
         inf = pcfg.client_pipeline.inferences.get(inf_name)
         alias = getattr(inf, "alias", f"クライアント {magistrate_id}") if inf else f"クライアント {magistrate_id}"
@@ -129,9 +115,7 @@ def update_cloud_config_panel(magistrate_id: int):
 @bp_cloud.route('/panel/cloud/<int:magistrate_id>/toggle_button', methods=['GET'])
 def get_cloud_toggle_button(magistrate_id: int):
     try:
-        cfg_name = f"magistrate_config{magistrate_id}"
-        cfg_path = file_utils.get_config(cfg_name)
-        cfg: MagistrateConfig = load_magistrate_config(cfg_path)
+        cfg: MagistrateConfig = config_repo.get_magistrate_config(magistrate_id)
         is_enabled = bool(cfg.client_magistrate.cloud.enable)
         return render_template('_cloud_toggle_button.html',
                                magistrate_id=magistrate_id,
@@ -144,12 +128,9 @@ def get_cloud_toggle_button(magistrate_id: int):
 @bp_cloud.route('/panel/cloud/<int:magistrate_id>/enable_upload', methods=['POST'])
 def enable_cloud_upload(magistrate_id: int):
     try:
-        cfg_name = f"magistrate_config{magistrate_id}"
-        cfg_path = file_utils.get_config(cfg_name)
-        cfg: MagistrateConfig = load_magistrate_config(cfg_path)
+        cfg: MagistrateConfig = config_repo.edit_magistrate_config(magistrate_id)
         cfg.client_magistrate.cloud.enable = True
-        save_magistrate_config(cfg_path, cfg)
-        file_utils.copy_single_config(cfg_name)
+        config_repo.save_magistrate(magistrate_id, cfg, sync=True)
 
         # 重新渲染并返回整个云配置面板
         cloud = cfg.client_magistrate.cloud
@@ -177,12 +158,9 @@ def enable_cloud_upload(magistrate_id: int):
 @bp_cloud.route('/panel/cloud/<int:magistrate_id>/disable_upload', methods=['POST'])
 def disable_cloud_upload(magistrate_id: int):
     try:
-        cfg_name = f"magistrate_config{magistrate_id}"
-        cfg_path = file_utils.get_config(cfg_name)
-        cfg: MagistrateConfig = load_magistrate_config(cfg_path)
+        cfg: MagistrateConfig = config_repo.edit_magistrate_config(magistrate_id)
         cfg.client_magistrate.cloud.enable = False
-        save_magistrate_config(cfg_path, cfg)
-        file_utils.copy_single_config(cfg_name)
+        config_repo.save_magistrate(magistrate_id, cfg, sync=True)
 
         # 重新渲染并返回整个云配置面板
         cloud = cfg.client_magistrate.cloud
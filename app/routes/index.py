@@ -1,8 +1,14 @@
 # app/routes/index.py
 from flask import Blueprint, render_template
+from app.utils import config_repo
 
 bp_index = Blueprint('index', __name__)
 
 @bp_index.route('/')
 def index():
-    return render_template('index.html')
+    # 状态方块的占位数量与 pipeline_config 中的摄像头数量一致
+    try:
+        magistrate_ids = config_repo.magistrate_ids()
+    except Exception:
+        magistrate_ids = []
+    return render_template('index.html', magistrate_ids=magistrate_ids)
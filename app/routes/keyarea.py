@@ -1,59 +1,26 @@
 # app/routes/keyarea.py
+import hashlib
 import json
+import math
+from typing import Optional
 
-import cv2
 import numpy as np
-import time
 from flask import Blueprint, render_template, Response, current_app, request, jsonify, make_response
-from app.utils import file_utils, ground_utils
-from pyengine.config.camera_setting_parser import load_camera_settings, CameraParametersConfig, save_camera_settings
-from pyengine.config.pipeline_config_parser import PipelineConfig, load_pipeline_config
-from pyengine.config.magistrate_config_parser import MagistrateConfig, load_magistrate_config, save_magistrate_config
-from pyengine.io.network.plugins.inference_result_receiver import InferenceResultReceiverPlugin
-from pyengine.utils import scale_utils
-from pyengine.visualization import polygon_drawer
+from app.utils import config_repo, ground_utils, homography_cache
+from app.utils.frame_hub import DEFAULT_KEEPALIVE_SEC, StreamVariant, get_frame_hub
+from app.utils.frame_slot import FrameSource
+from app.utils.receiver_registry import get_receiver, hold_frames
+from pyengine.config.camera_setting_parser import CameraParametersConfig
+from pyengine.config.pipeline_config_parser import PipelineConfig
+from pyengine.config.magistrate_config_parser import MagistrateConfig
 
 bp_keyarea = Blueprint("keyarea", __name__)
 
-
-# ------------------------------------------------------------------
-# MQTT Display
-# ------------------------------------------------------------------
-
-def _pb_to_ndarray(msg) -> np.ndarray | None:
-    """
-    期望字段:
-      - frame_width: int
-      - frame_height: int
-      - frame_channels: int (可为 0)
-      - frame_raw_data: bytes (H*W*C) 或 (H*W) 长度
-    """
-    try:
-        w = int(getattr(msg, "frame_width", 0))
-        h = int(getattr(msg, "frame_height", 0))
-        c = int(getattr(msg, "frame_channels", 0))
-        raw = bytes(getattr(msg, "frame_raw_data", b""))
-        if not raw or w <= 0 or h <= 0:
-            return None
-
-        arr = np.frombuffer(raw, dtype=np.uint8)
-        if c == 0:
-            # 尝试推断
-            if arr.size == h * w:
-                c = 1
-            elif arr.size == h * w * 3:
-                c = 3
-
-        if c == 1 and arr.size == h * w:
-            return arr.reshape((h, w))
-        if c == 3 and arr.size == h * w * 3:
-            return arr.reshape((h, w, 3))
-        # 兜底：能整除就试
-        if c > 0 and arr.size == h * w * c:
-            return arr.reshape((h, w, c))
-        return None
-    except Exception:
-        return None
+# 帧流路由的输出规格（WSGI 路由与 app.asgi 的异步路径共用）
+FRAME_VARIANTS = {
+    "frame": StreamVariant(width=640, height=480, overlay=True),
+    "frame800": StreamVariant(width=800, height=600, overlay=False),
+}
 
 
 @bp_keyarea.route("/panel/keyarea/<int:magistrate_id>", methods=["GET"])
@@ -62,7 +29,7 @@ def get_keyarea_panel(magistrate_id: int):
     展示重点エリア設定页面。
     说明：帧数据不在这里拉流，而是由 /frame 路由通过 MQTT 读取。
     """
-    cfg: PipelineConfig = load_pipeline_config(file_utils.get_config("pipeline_config"))
+    cfg: PipelineConfig = config_repo.get_pipeline_config()
     name = f"pipeline_inference_{magistrate_id}"
     inf = cfg.client_pipeline.inferences.get(name)
     if not inf:
@@ -87,8 +54,7 @@ def update_keyarea_panel(magistrate_id: int):
         # (当前表单为空，所以暂时省略)
 
         # --- 2. 准备返回主面板所需的数据 ---
-        cfg_path = file_utils.get_config("pipeline_config")
-        cfg: PipelineConfig = load_pipeline_config(cfg_path)
+        cfg: PipelineConfig = config_repo.get_pipeline_config()
         name = f"pipeline_inference_{magistrate_id}"
         inf = cfg.client_pipeline.inferences.get(name)
         if not inf:
@@ -126,110 +92,27 @@ def update_keyarea_panel(magistrate_id: int):
         return f"Error updating keyarea config for magistrate {magistrate_id}: {e}", 500
 
 
+# ------------------------------------------------------------------
+# MQTT Display
+# ------------------------------------------------------------------
+
 @bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/frame")
 def keyarea_frame(magistrate_id: int):
     """
     通过 MQTT 订阅器读取最新一帧，转成 MJPEG 推到前端。
-    【优化】使用缓存机制，每5秒重新加载一次配置文件，避免频繁IO。
+    【优化】同一 magistrate 的所有观看者共享一个 FrameHub，每帧只解码/绘制/编码一次。
     """
     topic_key = f"pipeline_inference_{magistrate_id}"
-    receiver: InferenceResultReceiverPlugin = current_app.config.get(f"inference_{magistrate_id}")
+    receiver: FrameSource = get_receiver(current_app.config, magistrate_id)
     if receiver is None:
         return f"MQTT receiver not found for {topic_key}", 404
-    
-    TARGET_W, TARGET_H = 640, 480
-    SRC_W, SRC_H = 800, 600
-    BOUNDARY = b"--frame"
-
-    def generate():
-        # --- 缓存设置 ---
-        cached_areas = {
-            "key_area": [],
-            "ground_area": []
-        }
-        last_config_load_time = 0.0
-        CONFIG_REFRESH_INTERVAL = 5.0
-
-        # --- 【修正】CPU負荷対策と安定化のための変数 ---
-        last_good_frame = None  # 最後に受信した生のフレーム
-        last_encoded_frame = None  # 最後にエンコードされたJPEGデータ
-        FRAME_RATE = 25  # 出力フレームレートを25FPSに制限
-
-        while True:
-            # --- 設定のリフレッシュ（変更なし） ---
-            current_time = time.time()
-            if current_time - last_config_load_time > CONFIG_REFRESH_INTERVAL:
-                try:
-                    mag_cfg = load_magistrate_config(file_utils.get_config(f"magistrate_config{magistrate_id}"))
-                    cam_cfg = load_camera_settings(file_utils.get_config(f"camera_parameters{magistrate_id}"))
-                    cached_areas["key_area"] = mag_cfg.client_magistrate.key_area_settings.area
-                    cached_areas["ground_area"] = cam_cfg.ground_coords
-                    last_config_load_time = current_time
-                except Exception as e:
-                    print(f"[WARNING] Failed to refresh configs for magistrate {magistrate_id}: {e}")
-
-            # --- フレームの読み取りと処理 ---
-            msg = receiver.read()
-            frame = _pb_to_ndarray(msg) if msg is not None else None
-
-            # 【修正】新しいフレームが来た時だけ、描画とエンコードを行う
-            if frame is not None:
-                # 1. 生フレームをリサイズして保存
-                if frame.ndim == 2:
-                    frame_bgr = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-                else:
-                    frame_bgr = frame
-
-                frame_bgr = cv2.resize(frame_bgr, (TARGET_W, TARGET_H))
-                last_good_frame = frame_bgr  # 描画のベースとして保持
-
-                # 2. 【点滅対策】描画用キャンバスを初期化
-                frame_bgr_display = last_good_frame.copy()
-
-                # 3. エリア描画
-                ground_area = cached_areas["ground_area"]
-                if ground_area and len(ground_area) == 4:
-                    scaled_ground_area = scale_utils.scale_euler_pts(
-                        src_width=SRC_W, src_height=SRC_H,
-                        dst_width=TARGET_W, dst_height=TARGET_H,
-                        points=ground_area
-                    )
-                    frame_bgr_display = polygon_drawer.fill_grid_area(
-                        frame_bgr_display, scaled_ground_area,
-                        color="#00AA00", transparency=0.15,
-                        grid_rows=10, grid_cols=10, perspective=True, grid_line_color="#FFFFFF", grid_transparency=0.15
-                    )
-
-                key_area = cached_areas["key_area"]
-                if key_area and len(key_area) == 4:
-                    scaled_key_area = scale_utils.scale_euler_pts(
-                        src_width=SRC_W, src_height=SRC_H,
-                        dst_width=TARGET_W, dst_height=TARGET_H,
-                        points=key_area
-                    )
-                    frame_bgr_display = polygon_drawer.fill_area(
-                        frame_bgr_display, scaled_key_area,
-                        color="#C1121F",
-                        transparency=0.5,
-                    )
-
-                # 4. エンコードして結果をキャッシュ
-                ok, buf = cv2.imencode(".jpg", frame_bgr_display)
-                if ok:
-                    last_encoded_frame = buf.tobytes()
-
-            # --- 配信処理 ---
-            if last_encoded_frame is not None:
-                yield (
-                        BOUNDARY + b"\r\n"
-                                   b"Content-Type: image/jpeg\r\n\r\n" +
-                        last_encoded_frame + b"\r\n"
-                )
-
-            # 【修正】ループの速度を制御し、CPU負荷を削減
-            time.sleep(1 / FRAME_RATE)
-
-    return Response(generate(), mimetype="multipart/x-mixed-replace; boundary=frame")
+
+    hub = get_frame_hub(magistrate_id, receiver)
+    variant = FRAME_VARIANTS["frame"]
+    keepalive_sec = current_app.config.get("MJPEG_KEEPALIVE_SEC", DEFAULT_KEEPALIVE_SEC)
+    adaptive = current_app.config.get("MJPEG_ADAPTIVE", True)
+    frames = hold_frames(current_app.config, magistrate_id, hub.stream(variant, keepalive_sec, adaptive))
+    return Response(frames, mimetype="multipart/x-mixed-replace; boundary=frame")
 
 
 # -------------------------------------------------------------------
@@ -239,7 +122,7 @@ def keyarea_frame(magistrate_id: int):
 @bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/camera-settings", methods=["GET"])
 def camera_settings_modal(magistrate_id: int):
     # 读取相机参数
-    cfg = load_camera_settings(file_utils.get_config(f"camera_parameters{magistrate_id}"))
+    cfg = config_repo.get_camera_settings(magistrate_id)
     return render_template(
         "partials/camera_settings_modal.html",
         magistrate_id=magistrate_id,
@@ -250,7 +133,7 @@ def camera_settings_modal(magistrate_id: int):
 @bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/camera-settings", methods=["POST"])
 def camera_settings_submit(magistrate_id: int):
     # 读原配置，未出现在表单里的字段保持不变（如 ground_coords / 计算结果等）
-    old = load_camera_settings(file_utils.get_config(f"camera_parameters{magistrate_id}"))
+    old = config_repo.get_camera_settings(magistrate_id)
 
     # 逐项获取表单并类型转换；缺省则用旧值
     def _get_int(name, default):
@@ -284,7 +167,7 @@ def camera_settings_submit(magistrate_id: int):
         ground_z_length_calculated=old.ground_z_length_calculated,
     )
 
-    save_camera_settings(file_utils.get_config(f"camera_parameters{magistrate_id}"), new_cfg)
+    config_repo.save_camera(magistrate_id, new_cfg)
 
     # 返回一个小的成功提示片段
     return render_template(
@@ -300,55 +183,22 @@ def camera_settings_submit(magistrate_id: int):
 # ----------- 新增：800x600 的帧流（供地面設定弹窗左侧使用） -----------
 @bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/frame800")
 def keyarea_frame_800(magistrate_id: int):
-    receiver: InferenceResultReceiverPlugin = current_app.config.get(f"inference_{magistrate_id}")
+    receiver: FrameSource = get_receiver(current_app.config, magistrate_id)
     if receiver is None:
         return f"MQTT receiver not found for pipeline_inference_{magistrate_id}", 404
 
-    TARGET_W, TARGET_H = 800, 600
-    BOUNDARY = b"--frame"
-
-    # 生成绘制画面
-    def generate():
-        # --- 【修正】CPU負荷対策と安定化のための変数 ---
-        last_encoded_frame = None  # 最後にエンコードされたJPEGデータをキャッシュ
-        FRAME_RATE = 25  # 出力フレームレートを25FPSに制限
-
-        while True:
-            msg = receiver.read()
-            frame = _pb_to_ndarray(msg) if msg is not None else None
-
-            # 【修正】新しいフレームが来た時だけ、リサイズとエンコードを行う
-            if frame is not None:
-                # 1. 色空間の変換
-                if frame.ndim == 2:
-                    frame_bgr = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
-                else:
-                    frame_bgr = frame
-
-                # 2. リサイズ
-                frame_bgr = cv2.resize(frame_bgr, (TARGET_W, TARGET_H))
-
-                # 3. エンコードして結果をキャッシュ
-                ok, buf = cv2.imencode(".jpg", frame_bgr)
-                if ok:
-                    last_encoded_frame = buf.tobytes()
-
-            # --- 配信処理 ---
-            # キャッシュされたフレームがあれば、それを配信する
-            if last_encoded_frame is not None:
-                yield (BOUNDARY + b"\r\n"
-                                  b"Content-Type: image/jpeg\r\n\r\n" + last_encoded_frame + b"\r\n")
-
-            # 【修正】ループの速度を制御し、CPU負荷を削減
-            time.sleep(1 / FRAME_RATE)
-
-    return Response(generate(), mimetype="multipart/x-mixed-replace; boundary=frame")
+    hub = get_frame_hub(magistrate_id, receiver)
+    variant = FRAME_VARIANTS["frame800"]
+    keepalive_sec = current_app.config.get("MJPEG_KEEPALIVE_SEC", DEFAULT_KEEPALIVE_SEC)
+    adaptive = current_app.config.get("MJPEG_ADAPTIVE", True)
+    frames = hold_frames(current_app.config, magistrate_id, hub.stream(variant, keepalive_sec, adaptive))
+    return Response(frames, mimetype="multipart/x-mixed-replace; boundary=frame")
 
 
 # ----------- 新增：地面設定 弹窗（GET） -----------
 @bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/ground-settings", methods=["GET"])
 def ground_settings_modal(magistrate_id: int):
-    cam = load_camera_settings(file_utils.get_config(f"camera_parameters{magistrate_id}"))
+    cam = config_repo.get_camera_settings(magistrate_id)
     # 传入当前 ground_coords & 已计算尺寸
     return render_template(
         "partials/ground_settings_modal.html",
@@ -360,7 +210,7 @@ def ground_settings_modal(magistrate_id: int):
 # ----------- 地面尺寸计算（POST） -----------
 @bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/ground-settings/calc", methods=["POST"])
 def ground_settings_calc(magistrate_id: int):
-    cam = load_camera_settings(file_utils.get_config(f"camera_parameters{magistrate_id}"))
+    cam = config_repo.get_camera_settings(magistrate_id)
 
     # 读取 points，支持 JSON 或 form
     pts = request.json.get("points") if request.is_json else request.form.get("points")
@@ -391,13 +241,193 @@ def ground_settings_calc(magistrate_id: int):
     )
 
 
+# ----------- 标定用：相机参数 sweep（POST） -----------
+# 一次 sweep 的网格点数上限
+SWEEP_MAX_POINTS = 20000
+
+
+def _sweep_axis_size(spec) -> int:
+    """轴的取值个数（不创建数组），用于在分配内存前检查网格大小。"""
+    if isinstance(spec, dict):
+        return int(spec.get("num", 11))
+    if isinstance(spec, list):
+        return len(spec)
+    raise TypeError("axis must be a list or an object")
+
+
+def _sweep_axis(spec) -> np.ndarray:
+    """轴的取值：数值列表，或 {"start", "stop", "num"}（含两端）/ {"center", "span", "num"}。"""
+    if isinstance(spec, dict):
+        num = int(spec.get("num", 11))
+        if "center" in spec:
+            center, span = float(spec["center"]), float(spec.get("span", 0))
+            values = np.linspace(center - span, center + span, num)
+        else:
+            values = np.linspace(float(spec["start"]), float(spec["stop"]), num)
+    else:
+        values = np.asarray([float(v) for v in spec], dtype=float)
+    if not np.all(np.isfinite(values)):
+        raise ValueError("axis values must be finite")
+    return values
+
+
+def _sweep_points(pts) -> Optional[np.ndarray]:
+    """点集转为 (K, 2) 数组；不是数值坐标列表或不足 4 点时返回 None。"""
+    try:
+        arr = np.asarray(pts, dtype=float)
+    except (TypeError, ValueError):
+        return None
+    if arr.ndim != 2 or arr.shape[1] != 2 or arr.shape[0] < 4 or not np.all(np.isfinite(arr)):
+        return None
+    return arr
+
+
+@bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/ground-settings/sweep", methods=["POST"])
+def ground_settings_sweep(magistrate_id: int):
+    """
+    在 camera_height / pitch_angle / roll_angle / yaw_angle 的网格上一次性计算地面尺寸，
+    代替逐个参数提交 /ground-settings/calc。
+
+    JSON：{"points": [[u, v], ...]（省略时用已保存的 ground_coords）,
+           "axes": {"pitch_angle": {"center": -30, "span": 5, "num": 11}, "camera_height": [250, 300, 350], ...}}
+    未出现在 axes 中的参数固定为当前 camera_parameters 的值。
+    返回 {"params": [轴名...], "axes": {轴名: 取值}, "shape": [...], "ground_x": [...], "ground_y": [...]}，
+    ground_x / ground_y 按 axes 的顺序以 C 顺序展开（米，保留 3 位）。
+    """
+    cam = config_repo.get_camera_settings(magistrate_id)
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict) or not isinstance(payload.get("axes") or {}, dict):
+        return jsonify({"ok": False, "msg": "リクエストの形式が正しくありません"}), 400
+
+    pts = _sweep_points(payload.get("points") or list(cam.ground_coords or []))
+    if pts is None:
+        return jsonify({"ok": False, "msg": "請先在左側選取 4 個點"}), 400
+
+    specs = {name: spec for name, spec in (payload.get("axes") or {}).items() if name in ground_utils.SWEEP_PARAMS}
+    # 先只看各轴的个数：超出上限的请求在分配任何数组之前拒绝
+    try:
+        sizes = [_sweep_axis_size(spec) for spec in specs.values()]
+    except (TypeError, ValueError, OverflowError):
+        return jsonify({"ok": False, "msg": "axes の形式が正しくありません"}), 400
+    if not specs or any(n <= 0 for n in sizes):
+        return jsonify({"ok": False, "msg": "axes の形式が正しくありません"}), 400
+    total = 1
+    for n in sizes:
+        total *= n
+        if total > SWEEP_MAX_POINTS:
+            return jsonify({"ok": False, "msg": f"組み合わせは {SWEEP_MAX_POINTS} 以下にしてください"}), 400
+
+    try:
+        axes = {name: _sweep_axis(spec) for name, spec in specs.items()}
+    except (TypeError, ValueError, KeyError, OverflowError):
+        return jsonify({"ok": False, "msg": "axes の形式が正しくありません"}), 400
+
+    base = {name: getattr(cam, name) for name in ground_utils.SWEEP_PARAMS}
+    dims = ground_utils.sweep_ground_dimensions(
+        base, axes,
+        focal_length=list(cam.focal_length),
+        principal_coord=list(cam.principal_coord),
+        ground_coords=pts.tolist(),
+    )
+
+    params = [name for name in ground_utils.SWEEP_PARAMS if name in axes]
+    return jsonify({
+        "params": params,
+        "axes": {name: axes[name].tolist() for name in params},
+        "base": base,
+        "shape": list(dims.shape[:-1]),
+        "ground_x": np.round(dims[..., 0], 3).reshape(-1).tolist(),
+        "ground_y": np.round(dims[..., 1], 3).reshape(-1).tolist(),
+    })
+
+
+# ----------- 全 magistrate の地面尺寸（GET，批量计算） -----------
+@bp_keyarea.route("/panel/keyarea/ground-dimensions", methods=["GET"])
+def ground_dimensions_all():
+    """
+    按各 magistrate 的 camera_parameters（当前保存的 ground_coords）一次性计算全部地面尺寸。
+    所有相机的视线在一次广播矩阵乘法中反投影（ground_utils.calculate_ground_dimensions_batch）。
+    返回 {magistrate_id: {ground_x, ground_y（米）, ground_x_saved, ground_y_saved（已保存的 mm）}}。
+    """
+    ids, cams = [], []
+    for i in config_repo.magistrate_ids():
+        try:
+            cams.append(config_repo.get_camera_settings(i))
+            ids.append(i)
+        except Exception:
+            # 缺少 camera_parameters 的 magistrate 不参与计算
+            continue
+
+    result = {}
+    if cams:
+        dims = ground_utils.calculate_ground_dimensions_batch(
+            camera_height=np.array([c.camera_height for c in cams], dtype=float),
+            roll_angle=np.array([c.roll_angle for c in cams], dtype=float),
+            pitch_angle=np.array([c.pitch_angle for c in cams], dtype=float),
+            yaw_angle=np.array([c.yaw_angle for c in cams], dtype=float),
+            focal_length=np.array([list(c.focal_length)[:2] for c in cams], dtype=float),
+            principal_coord=np.array([list(c.principal_coord)[:2] for c in cams], dtype=float),
+            ground_coords=ground_utils.pad_point_sets([list(c.ground_coords or []) for c in cams]),
+        )
+        for i, cam, (gx, gy) in zip(ids, cams, dims.tolist()):
+            result[str(i)] = {
+                "ground_x": gx,
+                "ground_y": gy,
+                "ground_x_saved": cam.ground_x_length_calculated,
+                "ground_y_saved": cam.ground_y_length_calculated,
+            }
+    return jsonify(result)
+
+
+# ----------- 浏览器端几何数据（GET） -----------
+# 保存时浏览器计算值与服务器计算值允许的误差（米）：保存的是 mm 整数，半毫米以内视为一致
+GEOMETRY_TOLERANCE_M = 0.0005
+
+
+def _geometry_bundle(magistrate_id: int, cam: CameraParametersConfig) -> dict:
+    camera = ground_utils.camera_geometry(
+        camera_height=cam.camera_height,
+        roll_angle=cam.roll_angle,
+        pitch_angle=cam.pitch_angle,
+        yaw_angle=cam.yaw_angle,
+        focal_length=list(cam.focal_length),
+        principal_coord=list(cam.principal_coord),
+    )
+    matrix = homography_cache.get_homography(magistrate_id)
+    return {
+        # 只由相机参数决定：相机参数变化后，浏览器持有的旧数据在保存时会被拒绝
+        "version": hashlib.blake2b(json.dumps(camera, sort_keys=True).encode(), digest_size=8).hexdigest(),
+        "camera": camera,
+        "homography": matrix.tolist() if matrix is not None else None,
+        "ground_x_saved": cam.ground_x_length_calculated,
+        "ground_y_saved": cam.ground_y_length_calculated,
+    }
+
+
+@bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/geometry", methods=["GET"])
+def geometry_bundle(magistrate_id: int):
+    """
+    床エリア編集用：相机内参 / 旋转矩阵 / 地面单应矩阵。浏览器据此在拖动顶点时本地计算地面尺寸，
+    不再逐次 POST /ground-settings/calc；保存时服务器用同一模型复核（见 ground_settings_submit）。
+    """
+    cam = config_repo.get_camera_settings(magistrate_id)
+    response = jsonify(_geometry_bundle(magistrate_id, cam))
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
 # ----------- 新增：地面設定 保存（POST） -----------
 @bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/ground-settings", methods=["POST"])
 def ground_settings_submit(magistrate_id: int):
     """
     保存 ground_coords, depth_scale, 以及计算出的 ground lengths。
+
+    长度默认使用服务器按同一模型计算的值（浏览器提交的 computed 只用于检测两边模型不一致）；
+    用户手动输入实测长度时，请求中显式带 manual_override=true，才按 ground_x / ground_y 原样保存。
     """
-    cam_old = load_camera_settings(file_utils.get_config(f"camera_parameters{magistrate_id}"))
+    cam_old = config_repo.get_camera_settings(magistrate_id)
 
     if request.is_json:
         payload = request.json
@@ -408,19 +438,51 @@ def ground_settings_submit(magistrate_id: int):
             "points": json.loads(request.form.get("points", "[]")),
             "ground_x": request.form.get("ground_x"),
             "ground_y": request.form.get("ground_y"),
+            "manual_override": request.form.get("manual_override") in ("1", "true"),
         }
 
     pts = payload.get("points") or []
-    try:
-        gx = float(payload.get("ground_x"))
-        gy = float(payload.get("ground_y"))
-    except (TypeError, ValueError):
-        return jsonify({"ok": False, "msg": "尺寸或深度格式不正确"}), 400
-
     if len(pts) != 4:
         return jsonify({"ok": False, "msg": "需要 4 個點"}), 400
 
     pts_int = [(int(round(p[0])), int(round(p[1]))) for p in pts]
+
+    if payload.get("manual_override") is True:
+        try:
+            gx = float(payload.get("ground_x"))
+            gy = float(payload.get("ground_y"))
+        except (TypeError, ValueError):
+            return jsonify({"ok": False, "msg": "尺寸或深度格式不正确"}), 400
+        if not (math.isfinite(gx) and math.isfinite(gy)) or gx < 0 or gy < 0:
+            return jsonify({"ok": False, "msg": "尺寸或深度格式不正确"}), 400
+    else:
+        # 浏览器端本地计算的结果：确认相机参数未变化，且与服务器的计算一致
+        geometry_version = payload.get("geometry_version")
+        if geometry_version is not None:
+            bundle = _geometry_bundle(magistrate_id, cam_old)
+            if geometry_version != bundle["version"]:
+                return jsonify({"ok": False, "msg": "カメラパラメータが更新されました。再計算してください。",
+                                "geometry": bundle}), 409
+
+        gx, gy = ground_utils.calculate_ground_dimensions(
+            camera_height=cam_old.camera_height,
+            pitch_angle=cam_old.pitch_angle,
+            roll_angle=cam_old.roll_angle,
+            yaw_angle=cam_old.yaw_angle,
+            focal_length=list(cam_old.focal_length),
+            principal_coord=list(cam_old.principal_coord),
+            ground_coords=pts_int,
+        )
+        computed = payload.get("computed")
+        if computed is not None:
+            try:
+                mismatch = len(computed) != 2 or abs(float(computed[0]) - gx) > GEOMETRY_TOLERANCE_M \
+                    or abs(float(computed[1]) - gy) > GEOMETRY_TOLERANCE_M
+            except (TypeError, ValueError):
+                mismatch = True
+            if mismatch:
+                return jsonify({"ok": False, "msg": "計算結果がサーバーと一致しません。",
+                                "ground_x": gx, "ground_y": gy}), 409
     new_cam = CameraParametersConfig(
         camera_height=cam_old.camera_height,
         roll_angle=cam_old.roll_angle,
@@ -434,11 +496,60 @@ def ground_settings_submit(magistrate_id: int):
         ground_z_length_calculated=cam_old.ground_z_length_calculated,
     )
 
-    save_camera_settings(file_utils.get_config(f"camera_parameters{magistrate_id}"), new_cam)
+    config_repo.save_camera(magistrate_id, new_cam)
 
     return render_template("partials/save_success_snackbar.html", message="地面設定を保存しました。")
 
 
+def _pixel_rows(rows, width: int) -> Optional[np.ndarray]:
+    """[[...], ...] 转为 (N, width) 的有限数值数组；省略或空列表为 (0, width)，形状或数值不正确时返回 None。"""
+    if rows is None or (isinstance(rows, list) and not rows):
+        return np.empty((0, width))
+    try:
+        arr = np.asarray(rows, dtype=float)
+    except (TypeError, ValueError):
+        return None
+    if arr.ndim != 2 or arr.shape[1] != width or not np.all(np.isfinite(arr)):
+        return None
+    return arr
+
+
+# ----------- 像素 -> 地面毫米坐标 投影（POST，批量） -----------
+@bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/project", methods=["POST"])
+def project_points(magistrate_id: int):
+    """
+    用缓存的地面单应矩阵（homography_cache）把任意数量的像素点一次性投影为地面坐标（mm）。
+
+    JSON：{"points": [[u, v], ...]}，和/或 {"boxes": [[x1, y1, x2, y2], ...]}（检测框，取底边中点作为落脚点）。
+    坐标与 ground_coords 处于同一像素坐标系。
+    返回 {"points": [[x_mm, y_mm], ...], "boxes": [[x_mm, y_mm], ...]}（只包含请求中给出的项），
+    投影不到地面的点为 null。
+    """
+    payload = request.get_json(silent=True)
+    if payload is None:
+        payload = {}
+    if not isinstance(payload, dict):
+        return jsonify({"ok": False, "msg": "リクエストの形式が正しくありません"}), 400
+    points = _pixel_rows(payload.get("points"), 2)
+    boxes = _pixel_rows(payload.get("boxes"), 4)
+    if points is None or boxes is None:
+        return jsonify({"ok": False, "msg": "points / boxes の形式が正しくありません"}), 400
+
+    feet = np.stack([(boxes[:, 0] + boxes[:, 2]) / 2.0, boxes[:, 3]], axis=1)
+    projected = homography_cache.project_to_ground(magistrate_id, np.concatenate([points, feet]))
+    if projected is None:
+        return jsonify({"ok": False, "msg": "床エリアが未設定です"}), 409
+    # 地平线上及以上的点投影不到地面（inf / NaN）：输出 null，保证响应是合法的 JSON
+    rows = [row.tolist() if np.all(np.isfinite(row)) else None for row in np.round(projected, 1)]
+
+    result = {}
+    if "points" in payload:
+        result["points"] = rows[:len(points)]
+    if "boxes" in payload:
+        result["boxes"] = rows[len(points):]
+    return jsonify(result)
+
+
 # -------------------------------------------------------------------
 # KeyArea Setting (新增)
 # -------------------------------------------------------------------
@@ -446,8 +557,7 @@ def ground_settings_submit(magistrate_id: int):
 @bp_keyarea.route("/panel/keyarea/<int:magistrate_id>/keyarea-settings", methods=["GET"])
 def keyarea_settings_modal(magistrate_id: int):
     """显示重点区域设置模态框"""
-    cfg_path = file_utils.get_config(f"magistrate_config{magistrate_id}")
-    cfg = load_magistrate_config(cfg_path)
+    cfg = config_repo.get_magistrate_config(magistrate_id)
     current_area = cfg.client_magistrate.key_area_settings.area
 
     return render_template(
@@ -468,18 +578,16 @@ def keyarea_settings_submit(magistrate_id: int):
 
     try:
         # --- 1. Read existing configurations ---
-        mag_cfg_path = file_utils.get_config(f"magistrate_config{magistrate_id}")
-        cam_cfg_path = file_utils.get_config(f"camera_parameters{magistrate_id}")
-
-        mag_cfg = load_magistrate_config(mag_cfg_path)
-        cam_cfg = load_camera_settings(cam_cfg_path)
+        mag_cfg = config_repo.edit_magistrate_config(magistrate_id)
+        cam_cfg = config_repo.get_camera_settings(magistrate_id)
 
         # --- 2. Calculate real-world dimensions of the key area ---
         real_width, real_height = ground_utils.calculate_area_real_dimensions(
             area_pixel_coords=new_points,
             ground_pixel_coords=cam_cfg.ground_coords,
             ground_real_width_mm=cam_cfg.ground_x_length_calculated,
-            ground_real_depth_mm=cam_cfg.ground_y_length_calculated
+            ground_real_depth_mm=cam_cfg.ground_y_length_calculated,
+            matrix=homography_cache.get_homography(magistrate_id),
         )
 
         # --- 3. Update the configuration object ---
@@ -489,7 +597,7 @@ def keyarea_settings_submit(magistrate_id: int):
         key_area_settings.real_height = real_height
 
         # --- 4. Save the updated configuration ---
-        save_magistrate_config(mag_cfg_path, mag_cfg)
+        config_repo.save_magistrate(magistrate_id, mag_cfg)
 
         return render_template(
             "partials/save_success_snackbar.html",
@@ -1,108 +1,87 @@
 # app/routes/monitor.py
-import time
+import hashlib
 import threading
-from flask import Blueprint, current_app
-from app.utils import file_utils
-from pyengine.config.pipeline_config_parser import PipelineConfig, load_pipeline_config
+import time
+from typing import Callable, Optional
+
+from flask import Blueprint, Response, current_app, jsonify, make_response, request
+from app.utils import config_repo, frame_codec, frame_hub, metrics, status_stream
+from app.utils.frame_slot import FrameCounters
+from pyengine.config.pipeline_config_parser import PipelineConfig
 from pyengine.io.network.plugins.heart_beat_receiver import HeartbeatReceiverPlugin
 
 bp_monitor = Blueprint('monitor', __name__)
 
-# --- 【新增】缓存和锁的初始化 ---
-_config_cache = {}
-_last_load_time = 0.0
-_config_lock = threading.Lock()
-CACHE_TIMEOUT = 10.0  # 缓存超时时间，10秒
-
-
-def _get_cached_pipeline_config() -> PipelineConfig:
-    """
-    一个带超时机制的、线程安全的函数，用于获取 pipeline_config 配置。
-    """
-    global _last_load_time, _config_cache
-
-    # 使用 'with' 语句自动管理锁的获取和释放
-    with _config_lock:
-        # 检查缓存是否超时
-        if (time.time() - _last_load_time) > CACHE_TIMEOUT:
-            try:
-                print(f"[INFO] Monitor config cache expired. Reloading pipeline_config.yaml...")
-                cfg_path = file_utils.get_config("pipeline_config")
-                cfg = load_pipeline_config(cfg_path)
+# 进程内共享一个状态广播器（所有浏览器共用一个轮询线程）
+_status_broadcaster: Optional[status_stream.StatusBroadcaster] = None
+_status_broadcaster_receiver: Optional[HeartbeatReceiverPlugin] = None
+_status_broadcaster_lock = threading.Lock()
 
-                # 更新缓存和时间戳
-                _config_cache['pipeline'] = cfg
-                _last_load_time = time.time()
+# ETag 计算用：区分不同进程生命周期的版本号
+_PROCESS_STARTED_AT = time.time()
 
-            except Exception as e:
-                print(f"[ERROR] Failed to reload pipeline_config.yaml: {e}")
-                # 如果加载失败，继续使用旧的缓存（如果存在）
-                if 'pipeline' not in _config_cache:
-                    raise  # 如果连初始缓存都没有，则重新抛出异常
 
-        return _config_cache['pipeline']
+def _get_status_broadcaster(receiver: HeartbeatReceiverPlugin) -> status_stream.StatusBroadcaster:
+    global _status_broadcaster, _status_broadcaster_receiver
+    with _status_broadcaster_lock:
+        if _status_broadcaster is None or _status_broadcaster_receiver is not receiver:
+            _status_broadcaster = status_stream.StatusBroadcaster(
+                lambda: _render_status_fragments(receiver),
+                fingerprint=lambda: _status_fingerprint(receiver),
+            )
+            _status_broadcaster_receiver = receiver
+        return _status_broadcaster
 
 
-@bp_monitor.route('/get-magistrate-grid')
-def get_magistrate_grid():
-    html_parts = []
-
-    # 【修改】从缓存中获取配置
-    cfg: PipelineConfig = _get_cached_pipeline_config()
+def _render_status_box(i: int, cfg: PipelineConfig, receiver: HeartbeatReceiverPlugin) -> str:
+    """渲染一个 magistrate 的状态方块（带 id，供 SSE 单独替换）。"""
+    magistrate_name = f"pipeline_inference_{i}"
+    magistrate_id = f"magistrate_client_{i}"
 
-    # 获取心跳
-    receiver: HeartbeatReceiverPlugin = current_app.config.get("hb_receiver")
+    alias = cfg.client_pipeline.inferences[magistrate_name].alias
+    ip_address = cfg.client_pipeline.inferences[magistrate_name].camera_config.address
+    display_text = f"{alias} - {ip_address}"
 
-    for i in range(1, 9):
-        magistrate_name = f"pipeline_inference_{i}"
-        magistrate_id = f"magistrate_client_{i}"
-
-        alias = cfg.client_pipeline.inferences[magistrate_name].alias
-        ip_address = cfg.client_pipeline.inferences[magistrate_name].camera_config.address
-        display_text = f"{alias} - {ip_address}"
-
-        # 判断是否启动
-        if magistrate_name in cfg.client_pipeline.enable_sources:
-            state = receiver.get_state(f"magistrates/{magistrate_id}/status")
-            if state == "online":
-                status_class = 'status-enabled-online'
-            elif state == "stale":
-                status_class = 'status-enabled-stale'
-            else:
-                status_class = 'status-enabled-offline'
+    # 判断是否启动
+    if magistrate_name in cfg.client_pipeline.enable_sources:
+        state = receiver.get_state(f"magistrates/{magistrate_id}/status") if receiver else None
+        if state == "online":
+            status_class = 'status-enabled-online'
+        elif state == "stale":
+            status_class = 'status-enabled-stale'
         else:
-            status_class = 'status-disabled'
-
-        # 组装消息
-        html_parts.append(f"""
-            <div class="status-box {status_class}" 
-                 style="cursor: pointer;"
-                 hx-get="/panel/magistrate/{i}"
-                 hx-target="#main-content"
-                 hx-swap="innerHTML"
-                 hx-push-url="true">
-                {display_text}
-            </div>
-        """)
+            status_class = 'status-enabled-offline'
+    else:
+        status_class = 'status-disabled'
 
-    return "".join(html_parts)
+    # 组装消息
+    return f"""
+        <div id="magistrate-status-{i}"
+             class="status-box {status_class}" 
+             style="cursor: pointer;"
+             hx-get="/panel/magistrate/{i}"
+             hx-target="#main-content"
+             hx-swap="innerHTML"
+             hx-push-url="true">
+            {display_text}
+        </div>
+    """
 
 
-@bp_monitor.route('/get-pipeline-indicator')
-def get_pipeline_indicator():
+def _pipeline_status_topic() -> str:
     try:
-        # 【修改】从缓存中获取配置
-        cfg: PipelineConfig = _get_cached_pipeline_config()
+        # 【修改】从配置仓库获取（文件未变化时不解析 YAML）
+        cfg: PipelineConfig = config_repo.get_pipeline_config()
         client_id_to_check = cfg.broker.client_id
     except Exception:
         client_id_to_check = "pipeline_client"
+    return f"pipelines/{client_id_to_check}/status"
 
-    # 获取心跳
-    receiver: HeartbeatReceiverPlugin = current_app.config.get("hb_receiver")
 
+def _render_pipeline_indicator(receiver: HeartbeatReceiverPlugin) -> str:
     # 解析状态
     if receiver:
-        state = receiver.get_state(f"pipelines/{client_id_to_check}/status")
+        state = receiver.get_state(_pipeline_status_topic())
         if state == "online":
             dot_class, status_text = 'dot-green', '接続中'
         elif state == "stale":
@@ -117,4 +96,176 @@ def get_pipeline_indicator():
         <span class="label" style="font-size: 0.7em;">推論モジュール:</span>
         <span class="dot {dot_class}"></span>
         <span style="font-size: 0.7em;">{status_text}</span>
-    """
\ No newline at end of file
+    """
+
+
+def _render_status_fragments(receiver: HeartbeatReceiverPlugin) -> status_stream.Fragments:
+    """SSE 推送用：仪表盘上每个可单独更新的元素 id -> (swap 方式, HTML)。"""
+    cfg: PipelineConfig = config_repo.get_pipeline_config()
+    fragments = {"pipeline-status-indicator": ("innerHTML", _render_pipeline_indicator(receiver))}
+    for i in config_repo.magistrate_ids():
+        fragments[f"magistrate-status-{i}"] = ("outerHTML", _render_status_box(i, cfg, receiver))
+    return fragments
+
+
+def _status_fingerprint(receiver: HeartbeatReceiverPlugin) -> str:
+    """SSE 广播器用：仪表盘全部元素所依赖的配置版本与心跳状态（不变时跳过渲染）。"""
+    topics = [_pipeline_status_topic()]
+    topics.extend(f"magistrates/magistrate_client_{i}/status" for i in config_repo.magistrate_ids())
+    return _status_etag(receiver, topics)
+
+
+def _status_etag(receiver: HeartbeatReceiverPlugin, topics) -> str:
+    """
+    状态片段的版本戳：配置仓库版本 + 相关心跳状态。只读取状态，不渲染 HTML。
+    混入进程启动时间，避免重启后版本号从头计数时与旧 ETag 偶然相同。
+    """
+    states = tuple(receiver.get_state(t) for t in topics) if receiver else None
+    raw = repr((_PROCESS_STARTED_AT, config_repo.version(), states)).encode()
+    return hashlib.blake2b(raw, digest_size=8).hexdigest()
+
+
+def _conditional_fragment(etag: str, render: Callable[[], str]) -> Response:
+    """
+    If-None-Match 命中时直接返回 304（不调用 render）；否则渲染并附带 ETag。
+    浏览器对 XHR 的 304 会透明地还原为缓存的 200，HX-Reswap: none 让 htmx 跳过这次替换。
+    """
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+        response.headers['HX-Reswap'] = 'none'
+    else:
+        response = make_response(render())
+    response.set_etag(etag, weak=True)
+    # 允许缓存，但每次都必须带 If-None-Match 重新验证
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+@bp_monitor.route('/get-magistrate-grid')
+def get_magistrate_grid():
+    # 【修改】从配置仓库获取（文件未变化时不解析 YAML）
+    cfg: PipelineConfig = config_repo.get_pipeline_config()
+
+    # 获取心跳
+    receiver: HeartbeatReceiverPlugin = current_app.config.get("hb_receiver")
+
+    ids = config_repo.magistrate_ids()
+    topics = [f"magistrates/magistrate_client_{i}/status" for i in ids]
+    return _conditional_fragment(
+        _status_etag(receiver, topics),
+        lambda: "".join(_render_status_box(i, cfg, receiver) for i in ids),
+    )
+
+
+@bp_monitor.route('/get-pipeline-indicator')
+def get_pipeline_indicator():
+    # 获取心跳
+    receiver: HeartbeatReceiverPlugin = current_app.config.get("hb_receiver")
+    return _conditional_fragment(
+        _status_etag(receiver, [_pipeline_status_topic()]),
+        lambda: _render_pipeline_indicator(receiver),
+    )
+
+
+@bp_monitor.route('/events/status')
+def status_events():
+    """
+    仪表盘状态的 SSE 推送：连接时发送全部状态方块与推論モジュール指示灯，
+    之后只在心跳状态（或 pipeline 配置）变化时推送变化的那几个元素。
+    """
+    broadcaster = _get_status_broadcaster(current_app.config.get("hb_receiver"))
+    keepalive_sec = current_app.config.get("SSE_KEEPALIVE_SEC", status_stream.DEFAULT_KEEPALIVE_SEC)
+    return Response(
+        broadcaster.stream(keepalive_sec=keepalive_sec),
+        mimetype='text/event-stream',
+        headers={
+            'Cache-Control': 'no-cache',
+            'X-Accel-Buffering': 'no',  # 反向代理不要缓冲
+        },
+    )
+
+
+@bp_monitor.route('/get-frame-decode-stats')
+def get_frame_decode_stats():
+    """帧解码计数（raw / jpeg / failed / jpeg_passthrough / shape_cache_miss）。"""
+    return jsonify(frame_codec.decode_stats())
+
+
+@bp_monitor.route('/get-stream-stats')
+def get_stream_stats():
+    """各 magistrate 的 MJPEG 订阅数、规格，以及每个客户端当前的自适应档位与吞吐。"""
+    return jsonify({str(k): v for k, v in frame_hub.all_hub_stats().items()})
+
+
+@bp_monitor.route('/get-frame-stats')
+def get_frame_stats():
+    """
+    各摄像头（正在订阅的）的帧流水线计数：received / dropped_stale / decoded / passthrough / decode_failed /
+    encoded / delivered，以及最近一帧的 age_of_latest_sec。用于按实测数据评估多路摄像头所需的硬件。
+    dropped_stale 只在通配订阅模式下可测；按摄像头订阅（per_topic）模式下为 null。
+    """
+    registry = current_app.config.get("receivers")
+    stats = registry.frame_stats() if registry is not None else {}
+    return jsonify({str(k): v for k, v in stats.items()})
+
+
+@bp_monitor.route('/get-receiver-stats')
+def get_receiver_stats():
+    """当前正在订阅推論結果的 magistrate，以及各自的观看者数、是否处于取消订阅前的宽限期。"""
+    registry = current_app.config.get("receivers")
+    stats = registry.stats() if registry is not None else {}
+    return jsonify({str(k): v for k, v in stats.items()})
+
+
+# ----------------------------------------------------------------------
+# /metrics：抓取时计算的指标（请求/配置/帧处理的直方图在 metrics 模块中直接记录）
+# ----------------------------------------------------------------------
+
+def _collect_active_streams():
+    return [({"magistrate": str(mid)}, stats["subscribers"]) for mid, stats in sorted(frame_hub.all_hub_stats().items())]
+
+
+def _collect_heartbeat_states():
+    receiver: HeartbeatReceiverPlugin = current_app.config.get("hb_receiver")
+    if receiver is None:
+        return []
+    topics = [("pipeline", _pipeline_status_topic())]
+    topics += [("magistrate", f"magistrates/magistrate_client_{i}/status") for i in config_repo.magistrate_ids()]
+    counts = {(role, state): 0 for role in ("pipeline", "magistrate") for state in ("online", "stale", "offline")}
+    for role, topic in topics:
+        state = receiver.get_state(topic)
+        key = (role, state if state in ("online", "stale") else "offline")
+        counts[key] += 1
+    return [({"role": role, "state": state}, n) for (role, state), n in counts.items()]
+
+
+def _collect_frame_pipeline():
+    registry = current_app.config.get("receivers")
+    stats = registry.frame_stats() if registry is not None else {}
+    # 不可用的计数（按摄像头订阅模式下的 dropped_stale）不输出，避免与真实的 0 混淆
+    return [({"magistrate": str(mid), "stage": field}, snap[field])
+            for mid, snap in stats.items() for field in FrameCounters.FIELDS if snap[field] is not None]
+
+
+def _collect_frame_age():
+    registry = current_app.config.get("receivers")
+    stats = registry.frame_stats() if registry is not None else {}
+    return [({"magistrate": str(mid)}, snap["age_of_latest_sec"])
+            for mid, snap in stats.items() if snap["age_of_latest_sec"] is not None]
+
+
+metrics.register_collector("restful_active_streams", "MJPEG clients currently attached, per camera.",
+                           _collect_active_streams)
+metrics.register_collector("restful_heartbeat_targets", "Heartbeat topics by role and state.",
+                           _collect_heartbeat_states)
+metrics.register_collector("restful_frame_pipeline_frames_total",
+                           "Frames per pipeline stage since the camera was subscribed (FrameCounters).",
+                           _collect_frame_pipeline, metric_type="counter")
+metrics.register_collector("restful_frame_age_seconds", "Seconds since the latest frame arrived, per camera.",
+                           _collect_frame_age)
+
+
+@bp_monitor.route('/metrics')
+def get_metrics():
+    """Prometheus 文本格式的指标：路由耗时、YAML 解析/保存耗时、resize/imencode 耗时、活跃流数、心跳状态。"""
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
@@ -1,7 +1,9 @@
 # app/routes/ops.py
+import hmac
 import json, os
-from flask import Blueprint, make_response, render_template
-from app.utils import file_utils
+from flask import Blueprint, Response, current_app, jsonify, make_response, render_template, request
+from app.utils import config_repo, config_writer, file_utils
+from app.utils.profiler import DEFAULT_INTERVAL_SEC, profiler
 
 bp_ops = Blueprint('ops', __name__)
 
@@ -9,6 +11,8 @@ bp_ops = Blueprint('ops', __name__)
 @bp_ops.route('/panel/sync/<int:magistrate_id>', methods=['POST'])
 def sync_config(magistrate_id: int):
     cfg = f"magistrate_config{magistrate_id}"
+    # 先把窗口期内尚未落盘的修改写出，再同步
+    config_writer.writer.flush(cfg)
     file_utils.copy_single_config(cfg)
 
     # 【关键修改】使用 HX-Redirect 头部，让 HTMX 自己处理跳转
@@ -26,8 +30,9 @@ def sync_config(magistrate_id: int):
 
 @bp_ops.route('/config/sync_all', methods=['POST'])
 def sync_all_configs():
-    # 分别同步各文件
-    for i in range(1, 9):
+    # 先把窗口期内尚未落盘的修改写出，再分别同步各文件
+    config_writer.writer.flush()
+    for i in config_repo.magistrate_ids():
         file_utils.copy_single_config(f"magistrate_config{i}")
     file_utils.copy_single_config("pipeline_config")
 
@@ -42,7 +47,9 @@ def sync_all_configs():
 
 @bp_ops.route('/config/reset', methods=['POST'])
 def reset_configs():
+    config_writer.writer.flush()
     file_utils.copy_configs(os.path.join("configs", "defaults"), "configs")
+    config_repo.invalidate()
     resp = make_response("")
     resp.headers['HX-Trigger'] = json.dumps({"showsuccessmodal": "初期設定が読み込まれました"})
 
@@ -54,8 +61,10 @@ def reset_configs():
 @bp_ops.route('/config/load_all', methods=['POST'])
 def load_all_configs():
     # utils.load_configs_from_device()
+    config_writer.writer.flush()
     file_utils.copy_configs(src_folder="/opt/SurveillanceService/configs",
                        dest_folder="configs")
+    config_repo.invalidate()
     resp = make_response("")
     resp.headers['HX-Trigger'] = json.dumps({"showsuccessmodal": "デバイスから設定が読み込まれました"})
 
@@ -70,3 +79,60 @@ def restart_system():
     resp = make_response("")
     resp.headers['HX-Trigger'] = json.dumps({"showsuccessmodal": "システムは正常に再起動されました！"})
     return resp
+
+
+def _admin_denied():
+    """X-Admin-Token 与 ADMIN_TOKEN 不一致（或未配置 ADMIN_TOKEN）时返回 403 响应，否则返回 None。"""
+    expected = current_app.config.get("ADMIN_TOKEN", "")
+    given = request.headers.get("X-Admin-Token", "")
+    if not expected or not hmac.compare_digest(given.encode(), expected.encode()):
+        return jsonify({"error": "admin token required"}), 403
+    return None
+
+
+@bp_ops.route('/system/profile', methods=['GET', 'POST'])
+def profile():
+    """
+    运行时采样分析（管理员）：
+      POST ?seconds=10&interval_ms=5  开始对所有线程采样 N 秒（已在采样中时返回 409）；
+      GET                             查看采样状态。
+    结果用 /system/profile/report 取得。
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if request.method == 'POST':
+        seconds = request.args.get('seconds', 10, type=float)
+        interval = request.args.get('interval_ms', DEFAULT_INTERVAL_SEC * 1000, type=float) / 1000
+        if not profiler.start(seconds, interval=max(interval, 0.001)):
+            return jsonify(profiler.status()), 409
+        return jsonify(profiler.status()), 202
+    return jsonify(profiler.status())
+
+
+@bp_ops.route('/system/profile/stop', methods=['POST'])
+def profile_stop():
+    denied = _admin_denied()
+    if denied:
+        return denied
+    profiler.stop()
+    return jsonify(profiler.status())
+
+
+@bp_ops.route('/system/profile/report')
+def profile_report():
+    """
+    最近一次采样的结果：format=folded（默认，flamegraph.pl / speedscope 可直接读取）
+    或 format=top（按函数的 self / total 采样数，idle=1 时包含阻塞等待的线程）。
+    """
+    denied = _admin_denied()
+    if denied:
+        return denied
+    if profiler.running():
+        return jsonify(profiler.status()), 409
+    if request.args.get('format', 'folded') == 'top':
+        body = profiler.top(limit=request.args.get('limit', 40, type=int),
+                            include_idle=request.args.get('idle') == '1')
+    else:
+        body = profiler.folded()
+    return Response(body, mimetype='text/plain')
@@ -1,8 +1,7 @@
 # app/routes/panel.py
 from flask import Blueprint, make_response, render_template, request
-from app.utils import file_utils
-from pyengine.config.pipeline_config_parser import PipelineInferenceDetail, load_pipeline_config, PipelineConfig, \
-    save_pipeline_config
+from app.utils import config_repo
+from pyengine.config.pipeline_config_parser import PipelineInferenceDetail, PipelineConfig
 
 bp_panel = Blueprint('panel', __name__)
 
@@ -10,7 +9,7 @@ bp_panel = Blueprint('panel', __name__)
 @bp_panel.route('/panel/magistrate/<int:magistrate_id>')
 def magistrate_panel(magistrate_id: int):
     """读取 pipeline_config 获取别名/IP，渲染面板抬头；支持直链 & HTMX 两种入口。"""
-    cfg = load_pipeline_config(file_utils.get_config("pipeline_config"))
+    cfg = config_repo.get_pipeline_config()
     name = f"pipeline_inference_{magistrate_id}"
     inf: PipelineInferenceDetail = cfg.client_pipeline.inferences.get(name)
     if not inf:
@@ -42,7 +41,7 @@ def magistrate_panel(magistrate_id: int):
 
 @bp_panel.route('/panel/magistrate/<int:magistrate_id>/toggle_button')
 def get_toggle_button(magistrate_id: int):
-    cfg = load_pipeline_config(file_utils.get_config("pipeline_config"))
+    cfg = config_repo.get_pipeline_config()
     name = f"pipeline_inference_{magistrate_id}"
     is_enabled = name in cfg.client_pipeline.enable_sources
     return render_template('_panel_toggle_button.html',
@@ -51,10 +50,8 @@ def get_toggle_button(magistrate_id: int):
 
 def _save_pipeline_enable_sources(magistrate_id: int, enable: bool):
 
-    # 解析文件路径
-    cfg_name = "pipeline_config"
-    cfg_path = file_utils.get_config(cfg_name)
-    cfg: PipelineConfig = load_pipeline_config(cfg_path)
+    # 取得可修改的副本
+    cfg: PipelineConfig = config_repo.edit_pipeline_config()
 
     # 确认配置 key
     key_name = f"pipeline_inference_{magistrate_id}"
@@ -68,7 +65,7 @@ def _save_pipeline_enable_sources(magistrate_id: int, enable: bool):
         cfg.client_pipeline.enable_sources.append(key_name)
 
     # 更新文件
-    save_pipeline_config(cfg_path, cfg)
+    config_repo.save_pipeline(cfg)
 
 
 @bp_panel.route('/panel/magistrate/<int:magistrate_id>/start_source', methods=['POST'])
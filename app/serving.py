@@ -0,0 +1,92 @@
+# app/serving.py
+import threading
+
+from pyengine.utils.logger import logger
+
+
+# 长连接响应的 Content-Type（MJPEG 画面 / SSE 状态推送）
+STREAMING_MIMETYPES = ("multipart/x-mixed-replace", "text/event-stream")
+
+
+class StreamSlotMiddleware:
+    """
+    限制长连接（MJPEG / SSE）同时占用的工作线程数。
+
+    线程池型 WSGI 服务器（waitress 等）每个响应在输出完毕前独占一个线程；画面流永远输出不完，
+    开得多了会把线程池占满，普通的 htmx 请求只能排队。本中间件按响应的 Content-Type 识别长连接，
+    最多允许 max_streams 个同时存在，超出时返回 503 + Retry-After；
+    服务器线程数取 普通请求线程数 + max_streams，普通请求始终有专用的线程可用。
+
+    视图返回的生成器在第一次迭代前不会执行，因此被拒绝的流不会订阅 FrameHub。
+    """
+
+    def __init__(self, app, max_streams: int, retry_after: int = 5):
+        self.app = app
+        self.max_streams = max_streams
+        self.retry_after = retry_after
+        self._slots = threading.BoundedSemaphore(max_streams)
+        self._lock = threading.Lock()
+        self._active = 0
+
+    @property
+    def active_streams(self) -> int:
+        with self._lock:
+            return self._active
+
+    def __call__(self, environ, start_response):
+        captured = {}
+
+        def _capture(status, headers, exc_info=None):
+            captured["status"] = status
+            captured["headers"] = headers
+            captured["exc_info"] = exc_info
+            # 推迟到确认是否占用流名额之后再真正 start_response
+            return lambda data: None
+
+        result = self.app(environ, _capture)
+        content_type = next((v for k, v in captured.get("headers", []) if k.lower() == "content-type"), "")
+        if not content_type.startswith(STREAMING_MIMETYPES):
+            start_response(captured["status"], captured["headers"], captured["exc_info"])
+            return result
+
+        if not self._slots.acquire(blocking=False):
+            if hasattr(result, "close"):
+                result.close()
+            logger.warning("StreamSlotMiddleware",
+                           f"Rejected stream {environ.get('PATH_INFO')}: {self.max_streams} streams already open")
+            start_response("503 Service Unavailable", [
+                ("Content-Type", "text/plain; charset=utf-8"),
+                ("Retry-After", str(self.retry_after)),
+            ])
+            return [b"Too many live streams"]
+
+        with self._lock:
+            self._active += 1
+        start_response(captured["status"], captured["headers"], captured["exc_info"])
+        return _ReleasingIterable(result, self._release)
+
+    def _release(self):
+        with self._lock:
+            self._active -= 1
+        self._slots.release()
+
+
+class _ReleasingIterable:
+    """包装流响应：服务器 close() 时（客户端断开或输出结束）归还流名额。"""
+
+    def __init__(self, iterable, release):
+        self._iterable = iterable
+        self._release = release
+        self._released = False
+
+    def __iter__(self):
+        return iter(self._iterable)
+
+    def close(self):
+        try:
+            if hasattr(self._iterable, "close"):
+                self._iterable.close()
+        finally:
+            if not self._released:
+                self._released = True
+                self._release()
@@ -64,3 +64,77 @@ function togglePasswordVisibility() {
         icon.textContent = '👁️';
     }
 }
+
+
+// 仪表盘状态的 SSE 推送（/events/status）
+// 连接期间只在状态变化时更新对应的方块；断线时 window.statusStreamActive 为 false，
+// index.html 中的 hx-trigger 轮询（every 3s [!window.statusStreamActive]）自动接管。
+let statusStream = null;
+window.statusStreamActive = false;
+
+function applyStatusFragment(event) {
+    let data;
+    try {
+        data = JSON.parse(event.data);
+    } catch (e) {
+        console.error('Invalid status event:', e);
+        return;
+    }
+    const target = document.getElementById(data.target);
+    if (!target) {
+        // 后来新增的摄像头在当前网格中没有对应的方块：重新取一次整个网格
+        if (data.target.startsWith('magistrate-status-')) refreshMagistrateGrid();
+        return;
+    }
+
+    if (data.swap === 'innerHTML') {
+        target.innerHTML = data.html;
+        htmx.process(target);
+    } else {
+        const template = document.createElement('template');
+        template.innerHTML = data.html;
+        const el = template.content.firstElementChild;
+        if (!el) return;
+        target.replaceWith(el);
+        htmx.process(el);
+    }
+}
+
+// 同一批推送中可能有多个缺失的方块，合并为一次网格请求
+let gridRefreshPending = false;
+
+function refreshMagistrateGrid() {
+    if (gridRefreshPending || !document.getElementById('magistrate-grid-container')) return;
+    gridRefreshPending = true;
+    htmx.ajax('GET', '/get-magistrate-grid', {
+        target: '#magistrate-grid-container',
+        swap: 'innerHTML'
+    }).finally(() => {
+        gridRefreshPending = false;
+    });
+}
+
+function syncStatusStream() {
+    const onDashboard = !!document.getElementById('magistrate-grid-container');
+    if (!window.EventSource) return;
+
+    if (onDashboard && !statusStream) {
+        statusStream = new EventSource('/events/status');
+        statusStream.addEventListener('status', applyStatusFragment);
+        statusStream.onopen = function() {
+            window.statusStreamActive = true;
+        };
+        statusStream.onerror = function() {
+            // EventSource 会自动重连；重连成功前由轮询兜底
+            window.statusStreamActive = false;
+        };
+    } else if (!onDashboard && statusStream) {
+        statusStream.close();
+        statusStream = null;
+        window.statusStreamActive = false;
+    }
+}
+
+syncStatusStream();
+document.body.addEventListener('htmx:afterSettle', syncStatusStream);
+document.body.addEventListener('htmx:historyRestore', syncStatusStream);
@@ -0,0 +1,282 @@
+# app/utils/config_repo.py
+import copy
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.utils import config_writer, file_utils, metrics
+from pyengine.config.camera_setting_parser import CameraParametersConfig, load_camera_settings, save_camera_settings
+from pyengine.config.magistrate_config_parser import MagistrateConfig, load_magistrate_config, save_magistrate_config
+from pyengine.config.pipeline_config_parser import PipelineConfig, load_pipeline_config, save_pipeline_config
+from pyengine.utils.logger import logger
+
+
+class _Entry:
+    __slots__ = ("path", "stamp", "snapshot")
+
+    def __init__(self, path: str, stamp: Tuple[int, int], snapshot: Any):
+        self.path = path
+        self.stamp = stamp
+        self.snapshot = snapshot
+
+
+def _stat_stamp(path: str) -> Tuple[int, int]:
+    st = os.stat(path)
+    return st.st_mtime_ns, st.st_size
+
+
+class ConfigRepository:
+    """
+    进程级配置仓库：按配置名（不带 .yaml）缓存解析结果，每个 YAML 只解析一次，
+    之后按文件 stat(mtime/size) 判断是否需要重新加载。
+
+    - get()   返回共享快照，调用方只读，不要修改；
+    - edit()  返回深拷贝，可自由修改后交给 save()；
+    - save()  立即刷新缓存并经 config_writer 合并、原子写回 YAML，后续读取直接命中，
+              不再有 TTL 造成的陈旧窗口。
+    - subscribe() 配置变化时推送新快照，常驻的使用方（FrameHub 的叠加区域）无需定期重新读取。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._entries: Dict[str, _Entry] = {}
+        # 配置名 -> 已提交、尚未落盘（成功或失败）的 save() 次数
+        self._pending_writes: Dict[str, int] = {}
+        # 配置名 -> 加载锁（只串行化同一配置的解析，全局锁只保护条目的替换）
+        self._load_locks: Dict[str, threading.Lock] = {}
+        self._version = 0
+        # 配置名 -> 变更回调
+        self._listeners: Dict[str, List[Callable[[Any], None]]] = {}
+        self._listeners_lock = threading.Lock()
+
+    @property
+    def version(self) -> int:
+        """任意配置发生变化（重新加载或保存）时递增，可用作缓存/ETag 的版本戳。"""
+        return self._version
+
+    def get(self, config_name: str, loader: Callable[[str], Any]) -> Any:
+        path = file_utils.get_config(config_name)
+        stamp = _stat_stamp(path)
+
+        with self._lock:
+            entry = self._entries.get(config_name)
+            if self._is_current_locked(config_name, entry, path, stamp):
+                return entry.snapshot
+            load_lock = self._load_locks.get(config_name)
+            if load_lock is None:
+                load_lock = self._load_locks[config_name] = threading.Lock()
+
+        # 解析在全局锁之外进行：某个 YAML 解析较慢时，不会阻塞其它配置的读取；
+        # 同一配置由该配置的加载锁串行化，并发读取只解析一次
+        with load_lock:
+            stamp = _stat_stamp(path)
+            with self._lock:
+                entry = self._entries.get(config_name)
+                if self._is_current_locked(config_name, entry, path, stamp):
+                    return entry.snapshot
+
+            try:
+                with metrics.CONFIG_IO.time(server_timing="yaml", config=metrics.config_kind(config_name), op="load"):
+                    snapshot = loader(path)
+            except Exception:
+                # 文件可能正被外部写入：有旧快照则继续使用旧快照
+                if entry is None:
+                    raise
+                logger.error_trace("ConfigRepository.get", f"Failed to reload {path}, keep previous snapshot")
+                return entry.snapshot
+
+            with self._lock:
+                current = self._entries.get(config_name)
+                if current is not entry:
+                    # 解析期间 save() 换入了更新的快照：以它为准，不用磁盘上的旧内容覆盖
+                    return current.snapshot if current is not None else snapshot
+                self._entries[config_name] = _Entry(path, stamp, snapshot)
+                self._version += 1
+
+        # 文件在外部被修改（或首次加载）：通知订阅者
+        self._notify(config_name, snapshot)
+        return snapshot
+
+    def _is_current_locked(self, config_name: str, entry: Optional[_Entry], path: str, stamp: Tuple[int, int]) -> bool:
+        if entry is None or entry.path != path:
+            return False
+        # 写入尚未全部落盘时，磁盘上可能是较早的一次保存：一律以缓存为准，不按 stat 重新加载
+        return entry.stamp == stamp or bool(self._pending_writes.get(config_name))
+
+    def edit(self, config_name: str, loader: Callable[[str], Any]) -> Any:
+        return copy.deepcopy(self.get(config_name, loader))
+
+    def save(self, config_name: str, cfg: Any, saver: Callable[[str, Any], None],
+             sync: bool = False, durable: Optional[bool] = None):
+        """
+        更新缓存并交给 write-behind 写入：之后的读取立即看到新内容，文件在合并窗口结束后原子落盘。
+        sync=True 时落盘后同步到设备目录；durable（默认取自请求）为 True 时等待落盘完成再返回。
+        提交过的写入全部落盘之前，get() 始终返回最新保存的快照，不会因磁盘上先落盘的旧内容回退。
+        """
+        path = file_utils.get_config(config_name)
+        # 缓存一份独立副本，调用方之后继续修改 cfg 不会污染快照
+        snapshot = copy.deepcopy(cfg)
+        with self._lock:
+            entry = self._entries.get(config_name)
+            if entry is not None and entry.path == path:
+                stamp = entry.stamp
+            else:
+                stamp = _stat_stamp(path)
+            # 落盘前文件仍是旧内容，沿用旧 stamp；挂起计数不为 0 期间 get() 不做 stat 比较
+            self._entries[config_name] = _Entry(path, stamp, snapshot)
+            self._pending_writes[config_name] = self._pending_writes.get(config_name, 0) + 1
+            self._version += 1
+
+        def _settle_locked() -> int:
+            remaining = self._pending_writes.get(config_name, 0) - 1
+            if remaining > 0:
+                self._pending_writes[config_name] = remaining
+            else:
+                self._pending_writes.pop(config_name, None)
+            return remaining
+
+        def _on_written(new_stamp: Tuple[int, int]):
+            with self._lock:
+                remaining = _settle_locked()
+                current = self._entries.get(config_name)
+                # 只有最后一次提交的写入落盘后，文件内容才与缓存的快照一致
+                if remaining <= 0 and current is not None and current.snapshot is snapshot:
+                    current.stamp = new_stamp
+
+        def _on_failed(error: BaseException):
+            # 写入失败：不能继续提供磁盘上并不存在的内容，丢弃快照，下次读取回到文件
+            with self._lock:
+                _settle_locked()
+                current = self._entries.get(config_name)
+                if current is None or current.snapshot is not snapshot:
+                    return
+                del self._entries[config_name]
+                self._version += 1
+            logger.error("ConfigRepository.save", f"{config_name} was not saved, cached snapshot dropped: {error}")
+            self._notify(config_name, None)
+
+        self._notify(config_name, snapshot)
+
+        pending = config_writer.writer.submit(config_name, path, snapshot, saver, sync=sync,
+                                              on_written=_on_written, on_failed=_on_failed)
+        if durable is None:
+            durable = config_writer.durable_requested()
+        if durable:
+            config_writer.writer.wait(pending)
+
+    def invalidate(self, config_name: Optional[str] = None):
+        """丢弃缓存（外部批量拷贝配置后调用）。config_name 为 None 时全部丢弃。"""
+        with self._lock:
+            if config_name is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(config_name, None)
+            self._version += 1
+        # 文件可能已被整体替换：快照未知（None），订阅者需要时自行重新读取
+        if config_name is None:
+            for name in list(self._listeners):
+                self._notify(name, None)
+        else:
+            self._notify(config_name, None)
+
+    # ------------------------------------------------------------------
+    # 变更通知
+    # ------------------------------------------------------------------
+
+    def subscribe(self, config_name: str, callback: Callable[[Any], None]) -> Callable[[], None]:
+        """
+        订阅某个配置的变化：save() 与检测到文件变化的 get() 以新快照调用 callback，
+        invalidate() 以 None 调用。callback 在触发变化的线程中同步执行，应当只做轻量的工作。
+        返回取消订阅的函数。
+        """
+        with self._listeners_lock:
+            self._listeners.setdefault(config_name, []).append(callback)
+
+        def _unsubscribe():
+            with self._listeners_lock:
+                callbacks = self._listeners.get(config_name, [])
+                if callback in callbacks:
+                    callbacks.remove(callback)
+                if not callbacks:
+                    self._listeners.pop(config_name, None)
+        return _unsubscribe
+
+    def _notify(self, config_name: str, snapshot: Any):
+        with self._listeners_lock:
+            callbacks = list(self._listeners.get(config_name, ()))
+        for callback in callbacks:
+            try:
+                callback(snapshot)
+            except Exception:
+                logger.error_trace("ConfigRepository.notify", f"Listener for {config_name} failed")
+
+
+_repo = ConfigRepository()
+
+
+def version() -> int:
+    return _repo.version
+
+
+def invalidate(config_name: Optional[str] = None):
+    _repo.invalidate(config_name)
+
+
+def subscribe(config_name: str, callback: Callable[[Any], None]) -> Callable[[], None]:
+    return _repo.subscribe(config_name, callback)
+
+
+# ------------------------------------------------------------------
+# pipeline_config.yaml
+# ------------------------------------------------------------------
+
+def get_pipeline_config() -> PipelineConfig:
+    return _repo.get("pipeline_config", load_pipeline_config)
+
+
+def edit_pipeline_config() -> PipelineConfig:
+    return _repo.edit("pipeline_config", load_pipeline_config)
+
+
+def save_pipeline(cfg: PipelineConfig, sync: bool = False, durable: Optional[bool] = None):
+    _repo.save("pipeline_config", cfg, save_pipeline_config, sync=sync, durable=durable)
+
+
+def magistrate_ids() -> List[int]:
+    """
+    pipeline_config 中定义的全部 magistrate 编号（client_pipeline.inferences 的 pipeline_inference_N），升序。
+    摄像头的数量完全由配置决定，增减摄像头无需改代码。
+    """
+    return file_utils.inference_ids(get_pipeline_config())
+
+
+# ------------------------------------------------------------------
+# magistrate_config{id}.yaml
+# ------------------------------------------------------------------
+
+def get_magistrate_config(magistrate_id: int) -> MagistrateConfig:
+    return _repo.get(f"magistrate_config{magistrate_id}", load_magistrate_config)
+
+
+def edit_magistrate_config(magistrate_id: int) -> MagistrateConfig:
+    return _repo.edit(f"magistrate_config{magistrate_id}", load_magistrate_config)
+
+
+def save_magistrate(magistrate_id: int, cfg: MagistrateConfig, sync: bool = False, durable: Optional[bool] = None):
+    _repo.save(f"magistrate_config{magistrate_id}", cfg, save_magistrate_config, sync=sync, durable=durable)
+
+
+# ------------------------------------------------------------------
+# camera_parameters{id}.yaml
+# ------------------------------------------------------------------
+
+def get_camera_settings(magistrate_id: int) -> CameraParametersConfig:
+    return _repo.get(f"camera_parameters{magistrate_id}", load_camera_settings)
+
+
+def edit_camera_settings(magistrate_id: int) -> CameraParametersConfig:
+    return _repo.edit(f"camera_parameters{magistrate_id}", load_camera_settings)
+
+
+def save_camera(magistrate_id: int, cfg: CameraParametersConfig, sync: bool = False, durable: Optional[bool] = None):
+    _repo.save(f"camera_parameters{magistrate_id}", cfg, save_camera_settings, sync=sync, durable=durable)
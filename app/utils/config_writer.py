@@ -0,0 +1,184 @@
+# app/utils/config_writer.py
+import atexit
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import has_request_context, request
+
+from app.utils import file_utils, metrics
+from pyengine.utils.logger import logger
+
+
+# 同一文件在该时间窗口内的连续修改合并为一次写入（秒）
+DEFAULT_WRITE_WINDOW = 0.3
+
+# durable 保存时等待落盘的最长时间（秒）
+DURABLE_WAIT_TIMEOUT = 10.0
+
+
+def durable_requested() -> bool:
+    """
+    当前请求是否要求“落盘后再返回”：
+      - 请求头 X-Durable-Write: 1
+      - 或查询参数 ?durable=1
+    """
+    if not has_request_context():
+        return False
+    return request.headers.get("X-Durable-Write") == "1" or request.args.get("durable") == "1"
+
+
+class _PendingWrite:
+    """某个配置文件尚未落盘的最新内容，以及等待这一批写入完成的 durable 请求。"""
+
+    def __init__(self, path: str, cfg: Any, saver: Callable[[str, Any], None], sync: bool):
+        self.path = path
+        self.cfg = cfg
+        self.saver = saver
+        self.sync = sync
+        self.on_written: List[Callable[[Tuple[int, int]], None]] = []
+        self.on_failed: List[Callable[[BaseException], None]] = []
+        self.done = threading.Event()
+        self.error: Optional[BaseException] = None
+
+
+class ConfigWriteBehind:
+    """
+    配置文件的延迟合并写入（write-behind）。
+
+    - submit() 立即返回；同一文件在窗口期内的多次修改只保留最后一份，窗口结束时写一次；
+    - 写入走 临时文件 + fsync + os.replace（再 fsync 目录），读方永远看不到写了一半的 YAML，
+      done 置位时内容已确实落盘；
+    - 磁盘 I/O 在全局锁之外进行，某个文件的写入/同步不会阻塞其它文件的 submit()；
+      同一文件的各批次由该文件的写锁串行化，按提交顺序写出；
+    - 这一批中只要有一次修改要求同步，就在落盘后调用一次 copy_single_config()；
+    - 需要确认落盘的调用方可用 wait() 等待这一批完成（durable ack）。
+    """
+
+    def __init__(self, window: float = DEFAULT_WRITE_WINDOW):
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending: Dict[str, _PendingWrite] = {}
+        self._timers: Dict[str, threading.Timer] = {}
+        # 配置名 -> 写锁（同一文件的批次按顺序写出）
+        self._file_locks: Dict[str, threading.Lock] = {}
+
+    def submit(self, config_name: str, path: str, cfg: Any, saver: Callable[[str, Any], None],
+               sync: bool = False, on_written: Optional[Callable[[Tuple[int, int]], None]] = None,
+               on_failed: Optional[Callable[[BaseException], None]] = None) -> _PendingWrite:
+        stale = None
+        with self._lock:
+            pending = self._pending.get(config_name)
+            if pending is None or pending.path != path:
+                if pending is not None:
+                    # 路径变了（配置目录切换）：旧路径那一批在锁外立即写出
+                    stale = self._take_locked(config_name)
+                pending = _PendingWrite(path, cfg, saver, sync)
+                self._pending[config_name] = pending
+                timer = threading.Timer(self.window, self.flush, args=(config_name,))
+                timer.daemon = True
+                self._timers[config_name] = timer
+                timer.start()
+            else:
+                pending.cfg = cfg
+                pending.saver = saver
+                pending.sync = pending.sync or sync
+            if on_written is not None:
+                pending.on_written.append(on_written)
+            if on_failed is not None:
+                pending.on_failed.append(on_failed)
+
+        if stale is not None:
+            with self._file_lock(config_name):
+                self._write(config_name, stale)
+        return pending
+
+    def wait(self, pending: _PendingWrite, timeout: float = DURABLE_WAIT_TIMEOUT):
+        """等待这一批写入完成；写入失败时把异常抛给调用方。"""
+        if not pending.done.wait(timeout):
+            raise TimeoutError(f"Timed out waiting for {pending.path} to be written")
+        if pending.error is not None:
+            raise pending.error
+
+    def flush(self, config_name: Optional[str] = None):
+        """立即写出挂起的修改（config_name 为 None 时写出全部）。"""
+        with self._lock:
+            names = [config_name] if config_name is not None else list(self._pending)
+        for name in names:
+            # 先取得文件写锁再取出批次：保证同一文件的批次按提交顺序落盘
+            with self._file_lock(name):
+                with self._lock:
+                    pending = self._take_locked(name)
+                if pending is not None:
+                    self._write(name, pending)
+
+    def _file_lock(self, config_name: str) -> threading.Lock:
+        with self._lock:
+            lock = self._file_locks.get(config_name)
+            if lock is None:
+                lock = self._file_locks[config_name] = threading.Lock()
+            return lock
+
+    def _take_locked(self, config_name: str) -> Optional[_PendingWrite]:
+        pending = self._pending.pop(config_name, None)
+        timer = self._timers.pop(config_name, None)
+        if timer is not None:
+            timer.cancel()
+        return pending
+
+    def _write(self, config_name: str, pending: _PendingWrite):
+        """在全局锁之外写出一批：临时文件 fsync 后替换，再 fsync 目录，之后才通知/同步。"""
+        tmp_path = f"{pending.path}.tmp"
+        try:
+            with metrics.CONFIG_IO.time(config=metrics.config_kind(config_name), op="save"):
+                pending.saver(tmp_path, pending.cfg)
+                _fsync_file(tmp_path)
+                os.replace(tmp_path, pending.path)
+                _fsync_dir(os.path.dirname(os.path.abspath(pending.path)))
+            st = os.stat(pending.path)
+            for callback in pending.on_written:
+                callback((st.st_mtime_ns, st.st_size))
+            if pending.sync:
+                file_utils.copy_single_config(config_name)
+        except Exception as e:
+            pending.error = e
+            logger.error_trace("ConfigWriteBehind.flush", f"Failed to write {pending.path}")
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            for callback in pending.on_failed:
+                try:
+                    callback(e)
+                except Exception:
+                    logger.error_trace("ConfigWriteBehind.flush", f"on_failed callback for {pending.path} failed")
+        finally:
+            pending.done.set()
+
+
+def _fsync_file(path: str):
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.fsync(fd)
+    finally:
+        os.close(fd)
+
+
+def _fsync_dir(dir_path: str):
+    # 让 os.replace 的目录项变更也落盘；不支持对目录 fsync 的平台（Windows）跳过
+    try:
+        fd = os.open(dir_path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+writer = ConfigWriteBehind()
+
+# 进程退出前把窗口期内尚未写出的修改落盘
+atexit.register(writer.flush)
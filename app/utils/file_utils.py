@@ -2,13 +2,27 @@ import os
 import shutil
 from pathlib import Path
 import traceback
-from typing import Dict, List, Optional, Union
+from typing import Dict, Iterable, List, Optional, Tuple, Union
 
 from flask import has_request_context, request
 
+from pyengine.config.pipeline_config_parser import load_pipeline_config
 from pyengine.utils.logger import logger
 
 
+INFERENCE_PREFIX = "pipeline_inference_"
+
+
+def inference_ids(pipeline_cfg) -> List[int]:
+    """pipeline_config 中 client_pipeline.inferences 定义的 magistrate 编号（pipeline_inference_N 的 N），升序。"""
+    ids = []
+    for name in pipeline_cfg.client_pipeline.inferences:
+        suffix = name[len(INFERENCE_PREFIX):]
+        if name.startswith(INFERENCE_PREFIX) and suffix.isdigit():
+            ids.append(int(suffix))
+    return sorted(ids)
+
+
 def search_files(dir_path: Union[str, Path], pattern: str) -> List[Path]:
     """
     在指定目录下递归搜索匹配 pattern 的文件。
@@ -28,7 +42,35 @@ def search_files(dir_path: Union[str, Path], pattern: str) -> List[Path]:
     return list(dir_path.rglob(pattern))
 
 
+# (config_name, default_folder, RESTFUL_CONFIG_DIR) -> 已解析的文件路径
+_config_path_cache: Dict[Tuple[str, str, Optional[str]], str] = {}
+
+
+def _resolve_config(config_name: str, default_folder: str, env_dir: Optional[str]) -> str:
+    candidates = [
+        default_folder,
+        env_dir,                                              # 可通过环境变量注入
+        "/opt/SurveillanceServiceRestful/configs",            # 运行时目标
+        "/opt/SurveillanceServiceRestful/default",            # 默认兜底
+        "/opt/SurveillanceService/configs",                   # 上游项目
+    ]
+    for folder in [p for p in candidates if p]:
+
+        # 组合文件路径
+        filepath = os.path.join(folder, f"{config_name}.yaml")
+
+        # 发现目标文件
+        if os.path.isfile(filepath):
+            return filepath
+
+    raise FileNotFoundError(f"Configuration file '{config_name}.yaml' not found in: {candidates}")
+
+
 def get_config(config_name: str, default_folder: str = "configs"):
+    """
+    按优先级解析配置文件路径。结果按 (名称, default_folder, RESTFUL_CONFIG_DIR) 缓存，
+    命中时只确认文件仍存在（一次 stat）；环境变量变化或文件消失时重新解析。
+    """
     # # --- 【新增】打印调用来源和堆栈信息 ---
     # print("-----------------------------------------------------")
     # # 检查是否在 Flask 请求上下文中，如果是，则打印请求信息
@@ -43,25 +85,35 @@ def get_config(config_name: str, default_folder: str = "configs"):
     # print("-----------------------------------------------------")
     # # --- 结束新增部分 ---
 
-    candidates = [
-        default_folder,
-        os.environ.get("RESTFUL_CONFIG_DIR"),                 # 可通过环境变量注入
-        "/opt/SurveillanceServiceRestful/configs",            # 运行时目标
-        "/opt/SurveillanceServiceRestful/default",            # 默认兜底
-        "/opt/SurveillanceService/configs",                   # 上游项目
-    ]
-    for folder in [p for p in candidates if p]:
+    env_dir = os.environ.get("RESTFUL_CONFIG_DIR")
+    key = (config_name, default_folder, env_dir)
 
-        # 组合文件路径
-        filepath = os.path.join(folder, f"{config_name}.yaml")
+    filepath = _config_path_cache.get(key)
+    if filepath is not None and os.path.isfile(filepath):
+        return filepath
 
-        # print(f"Loading config from {filepath}")
+    filepath = _resolve_config(config_name, default_folder, env_dir)
+    _config_path_cache[key] = filepath
+    return filepath
 
-        # 发现目标文件
-        if os.path.isfile(filepath):
-            return filepath
 
-    raise FileNotFoundError(f"Configuration file '{config_name}.yaml' not found in: {candidates}")
+def clear_config_cache():
+    """清空路径缓存（批量拷贝配置后调用，让更高优先级目录里的新文件生效）。"""
+    _config_path_cache.clear()
+
+
+def preresolve_configs(magistrate_ids: Iterable[int]):
+    """启动时预先解析所有 magistrate / camera / pipeline 配置路径，找不到的只记录日志。"""
+    names = ["pipeline_config"]
+    for i in magistrate_ids:
+        names.append(f"magistrate_config{i}")
+        names.append(f"camera_parameters{i}")
+
+    for name in names:
+        try:
+            get_config(name)
+        except FileNotFoundError as e:
+            logger.warning("preresolve_configs", str(e))
 
 
 def copy_configs(
@@ -101,16 +153,22 @@ def copy_configs(
             return False
 
         pipeline = dir_path / "pipeline_config.yaml"
-        magistrate_configs = search_files(dir_path, "magistrate_config*.yaml")
-        camera_configs = search_files(dir_path, "camera_parameters*.yaml")
-
-        # 期望两者数量一致，且至少 8 份
         if not pipeline.exists():
             return False
-        if len(magistrate_configs) < 8:
+
+        # pipeline_config 中定义的每个 magistrate 都要有对应的 magistrate / camera 配置
+        try:
+            ids = inference_ids(load_pipeline_config(str(pipeline)))
+        except Exception:
+            logger.error_trace("_has_target_configs", f"Failed to parse {pipeline}")
             return False
-        if len(magistrate_configs) != len(camera_configs):
+        if not ids:
             return False
+        for i in ids:
+            if not (dir_path / f"magistrate_config{i}.yaml").exists():
+                return False
+            if not (dir_path / f"camera_parameters{i}.yaml").exists():
+                return False
         return True
 
     dest = Path(dest_folder)
@@ -158,6 +216,10 @@ def copy_configs(
             result["failed"].append(src_file.name)
             logger.error_trace("copy_configs", f"Failed, while copying {src_file.name} -> {dest_file}")
 
+    # 目标目录新增了文件，之前解析到的低优先级路径可能已不是最优
+    if result["copied"]:
+        clear_config_cache()
+
     return result
 
 
@@ -0,0 +1,168 @@
+# app/utils/frame_codec.py
+import threading
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+
+class _DecodeStats:
+    """解码计数器（线程安全）：按解码路径（原始像素 / JPEG / 直通 / 失败）统计帧数。"""
+
+    FIELDS = ("raw", "jpeg", "failed", "shape_cache_miss", "jpeg_passthrough")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = {k: 0 for k in self.FIELDS}
+
+    def incr(self, key: str, n: int = 1):
+        with self._lock:
+            self._counts[key] += n
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self._counts)
+
+    def reset(self):
+        with self._lock:
+            for k in self._counts:
+                self._counts[k] = 0
+
+
+_stats = _DecodeStats()
+
+# (w, h, c, payload_size) -> reshape 目标形状；None 表示不是原始像素
+_shape_cache: Dict[Tuple[int, int, int, int], Optional[Tuple[int, ...]]] = {}
+_shape_cache_lock = threading.Lock()
+_SHAPE_CACHE_MAX = 64
+
+# JPEG 的 SOI 标记（FF D8）+ 下一个段标记的首字节（FF）
+_JPEG_MAGIC = b"\xff\xd8\xff"
+
+
+def _resolve_shape(w: int, h: int, c: int, size: int) -> Optional[Tuple[int, ...]]:
+    """
+    根据元信息推断原始像素的形状。同一路摄像头的元信息几乎不变，结果按 key 缓存，
+    每帧只需一次字典查找。
+    """
+    key = (w, h, c, size)
+    shape = _shape_cache.get(key, ...)
+    if shape is not ...:
+        return shape
+
+    _stats.incr("shape_cache_miss")
+    shape = None
+    if w > 0 and h > 0:
+        if c == 0:
+            # 尝试推断
+            if size == h * w:
+                c = 1
+            elif size == h * w * 3:
+                c = 3
+        if c == 1 and size == h * w:
+            shape = (h, w)
+        elif c > 0 and size == h * w * c:
+            shape = (h, w, c)
+
+    with _shape_cache_lock:
+        if len(_shape_cache) >= _SHAPE_CACHE_MAX:
+            _shape_cache.clear()
+        _shape_cache[key] = shape
+    return shape
+
+
+def payload_view(msg) -> Optional[memoryview]:
+    """
+    读取一次 frame_raw_data 并以 memoryview 包装（不支持 buffer 协议的对象先转为 bytes）。
+    每条消息只应调用一次，结果传给 jpeg_payload() / decode_frame() 的 view 参数。
+    """
+    raw = getattr(msg, "frame_raw_data", None)
+    if not raw:
+        return None
+    try:
+        view = memoryview(raw)
+    except TypeError:
+        view = memoryview(bytes(raw))
+    if view.ndim != 1 or view.itemsize != 1:
+        view = view.cast("B")
+    return view
+
+
+def is_jpeg(view) -> bool:
+    """负载是否为 JPEG（只检查文件头，不解码）。"""
+    return view is not None and len(view) >= 3 and bytes(view[:3]) == _JPEG_MAGIC
+
+
+def jpeg_payload(msg, view: Optional[memoryview] = None) -> Optional[bytes]:
+    """
+    若 frame_raw_data 是 JPEG（如 fake_vid_sim.py --encode jpeg），返回其字节，用于直通转发；
+    否则返回 None。长度与元信息吻合的负载按原始像素处理（像素值恰好以 FF D8 FF 开头也不会误判）。
+    view 为 payload_view() 的结果（省略时在这里读取）。
+    """
+    if view is None:
+        view = payload_view(msg)
+    if view is None or not is_jpeg(view):
+        return None
+    w = int(getattr(msg, "frame_width", 0))
+    h = int(getattr(msg, "frame_height", 0))
+    c = int(getattr(msg, "frame_channels", 0))
+    if _resolve_shape(w, h, c, len(view)) is not None:
+        return None
+    _stats.incr("jpeg_passthrough")
+    if isinstance(view.obj, bytes) and len(view.obj) == len(view):
+        return view.obj
+    return view.tobytes()
+
+
+def decode_frame(msg, allow_jpeg: bool = True, view: Optional[memoryview] = None) -> Optional[np.ndarray]:
+    """
+    把 InferenceResult / RawFrame 消息还原成 ndarray。
+
+    期望字段:
+      - frame_width: int
+      - frame_height: int
+      - frame_channels: int (可为 0)
+      - frame_raw_data: bytes (H*W*C) 或 (H*W) 长度的原始像素，或 JPEG 字节
+
+    原始像素直接在负载之上建立只读视图（零拷贝）；需要修改时请先 copy()。
+    view 为 payload_view() 的结果；省略时在这里读取负载。
+    """
+    try:
+        w = int(getattr(msg, "frame_width", 0))
+        h = int(getattr(msg, "frame_height", 0))
+        c = int(getattr(msg, "frame_channels", 0))
+        if view is None:
+            view = payload_view(msg)
+        if view is None or w <= 0 or h <= 0:
+            _stats.incr("failed")
+            return None
+
+        arr = np.frombuffer(view, dtype=np.uint8)
+
+        # 1) 先试“原始像素”
+        shape = _resolve_shape(w, h, c, arr.size)
+        if shape is not None:
+            _stats.incr("raw")
+            return arr.reshape(shape)
+
+        # 2) 再试“JPEG 压缩”
+        if allow_jpeg:
+            img = cv2.imdecode(arr, cv2.IMREAD_COLOR)
+            if img is not None:
+                _stats.incr("jpeg")
+                return img
+
+        _stats.incr("failed")
+        return None
+    except Exception:
+        _stats.incr("failed")
+        return None
+
+
+def decode_stats() -> Dict[str, int]:
+    """返回当前的解码计数快照。"""
+    return _stats.snapshot()
+
+
+def reset_decode_stats():
+    _stats.reset()
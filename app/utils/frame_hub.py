@@ -0,0 +1,522 @@
+# app/utils/frame_hub.py
+import asyncio
+import threading
+import time
+from typing import Dict, List, NamedTuple, Optional
+
+import cv2
+import numpy as np
+
+from app.utils import metrics, overlay_areas, overlay_cache
+from app.utils.frame_codec import decode_frame, jpeg_payload, payload_view
+from app.utils.frame_slot import FrameSource
+from pyengine.utils.logger import logger
+
+
+# 输出帧率上限
+FRAME_RATE = 25
+
+# 工作线程等待新帧的单次上限（秒）：到时后重新检查订阅者与 close()
+RECEIVER_WAIT_TIMEOUT = 0.5
+
+# 无新帧时，重发上一帧作为 keep-alive 的默认间隔（秒）
+DEFAULT_KEEPALIVE_SEC = 10.0
+
+BOUNDARY = b"--frame"
+
+# cv2.imencode 的默认 JPEG 品质
+DEFAULT_JPEG_QUALITY = 95
+
+
+class StreamVariant(NamedTuple):
+    """一路输出流的规格：分辨率 + 是否叠加区域绘制 + JPEG 品质。相同规格的订阅者共享同一份 JPEG。"""
+    width: int
+    height: int
+    overlay: bool
+    quality: int = DEFAULT_JPEG_QUALITY
+
+
+class QualityTier(NamedTuple):
+    """自适应档位：JPEG 品质、相对分辨率、帧率上限。"""
+    name: str
+    quality: int
+    scale: float
+    fps: float
+
+
+QUALITY_TIERS = (
+    QualityTier("high", DEFAULT_JPEG_QUALITY, 1.0, FRAME_RATE),
+    QualityTier("medium", 75, 0.75, 12),
+    QualityTier("low", 50, 0.5, 5),
+)
+
+# 写出一帧的耗时（EWMA）超过帧间隔的这个比例 -> 降档
+STEP_DOWN_RATIO = 0.5
+# 写出耗时低于上一档帧间隔的这个比例，并持续 STEP_UP_HOLD_SEC -> 升档
+STEP_UP_RATIO = 0.15
+STEP_DOWN_HOLD_SEC = 2.0
+STEP_UP_HOLD_SEC = 10.0
+WRITE_EWMA_ALPHA = 0.2
+
+
+class _StreamClient:
+    """
+    单个 MJPEG 客户端的自适应状态。
+
+    生成器 yield 之后到下一次恢复执行之间，WSGI 服务器在把这一帧写进 socket；
+    这段耗时反映了客户端的吞吐与背压。慢客户端逐档降低品质/分辨率/帧率，
+    避免长时间占住工作线程；快客户端保持（或恢复到）最高档。
+    """
+
+    def __init__(self, base: StreamVariant, adaptive: bool):
+        self.base = base
+        self.adaptive = adaptive
+        self.tier_index = 0
+        self.write_ewma: Optional[float] = None
+        self.bytes_per_sec = 0.0
+        self.frames_sent = 0
+        self.last_change = time.monotonic()
+
+    @property
+    def tier(self) -> QualityTier:
+        return QUALITY_TIERS[self.tier_index]
+
+    @property
+    def variant(self) -> StreamVariant:
+        tier = self.tier
+        if tier.scale == 1.0:
+            width, height = self.base.width, self.base.height
+        else:
+            width = max(2, int(self.base.width * tier.scale) // 2 * 2)
+            height = max(2, int(self.base.height * tier.scale) // 2 * 2)
+        return StreamVariant(width, height, self.base.overlay, tier.quality)
+
+    def record_write(self, nbytes: int, elapsed: float) -> bool:
+        """记录一次写出；档位发生变化时返回 True。"""
+        self.frames_sent += 1
+        elapsed = max(elapsed, 1e-6)
+        if self.write_ewma is None:
+            self.write_ewma = elapsed
+        else:
+            self.write_ewma += WRITE_EWMA_ALPHA * (elapsed - self.write_ewma)
+        self.bytes_per_sec = nbytes / self.write_ewma
+
+        if not self.adaptive:
+            return False
+
+        now = time.monotonic()
+        held = now - self.last_change
+        if (self.tier_index < len(QUALITY_TIERS) - 1
+                and self.write_ewma > STEP_DOWN_RATIO / self.tier.fps
+                and held >= STEP_DOWN_HOLD_SEC):
+            self.tier_index += 1
+        elif (self.tier_index > 0
+                and self.write_ewma < STEP_UP_RATIO / QUALITY_TIERS[self.tier_index - 1].fps
+                and held >= STEP_UP_HOLD_SEC):
+            self.tier_index -= 1
+        else:
+            return False
+
+        self.last_change = now
+        self.write_ewma = None
+        return True
+
+    def stats(self) -> dict:
+        return {
+            "tier": self.tier.name,
+            "variant": _variant_label(self.variant),
+            "write_ms": round((self.write_ewma or 0.0) * 1000, 2),
+            "kbps": round(self.bytes_per_sec * 8 / 1000, 1),
+            "frames_sent": self.frames_sent,
+        }
+
+
+class _LoopSignal:
+    """
+    某个 asyncio 事件循环内的新帧通知。工作线程每帧只投递一次 fire()，
+    该循环内所有等待中的协程同时被唤醒；之后换上新的 Event 供下一帧使用。
+    """
+
+    def __init__(self):
+        self.event = asyncio.Event()
+        self.subscribers = 0
+
+    def fire(self):
+        event, self.event = self.event, asyncio.Event()
+        event.set()
+
+
+def _multipart_chunk(jpg: bytes) -> bytes:
+    return (BOUNDARY + b"\r\n"
+                       b"Content-Type: image/jpeg\r\n\r\n" + jpg + b"\r\n")
+
+
+def _variant_label(variant: StreamVariant) -> str:
+    overlay = "+overlay" if variant.overlay else ""
+    return f"{variant.width}x{variant.height}{overlay}@q{variant.quality}"
+
+
+class FrameHub:
+    """
+    单个 magistrate 的帧广播器。
+
+    一个后台线程负责 读取 -> 解码 -> 缩放 -> 绘制 -> 编码，每种 StreamVariant 每帧只编码一次，
+    所有订阅者共享同一份 JPEG 字节。没有订阅者时线程挂起，不消耗 CPU。
+    """
+
+    def __init__(self, magistrate_id: int, receiver: FrameSource):
+        self.magistrate_id = magistrate_id
+        self.receiver = receiver
+
+        self._lock = threading.Lock()
+        self._new_frame = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._subscribers: Dict[StreamVariant, int] = {}
+        self._latest: Dict[StreamVariant, bytes] = {}
+        # 每个规格的帧序号：订阅者据此判断是否有“真正的新帧”
+        self._seq: Dict[StreamVariant, int] = {}
+        self._clients: List[_StreamClient] = []
+        self._worker: Optional[threading.Thread] = None
+        # 有异步订阅者的事件循环 -> 新帧通知
+        self._loop_signals: Dict[asyncio.AbstractEventLoop, _LoopSignal] = {}
+        self._closed = False
+
+        # 叠加绘制用的区域（配置保存时由 config_repo 推送，见 overlay_areas）
+        self._overlay_areas = overlay_areas.get_overlay_areas(magistrate_id)
+
+    # ------------------------------------------------------------------
+    # 订阅管理
+    # ------------------------------------------------------------------
+
+    def _attach(self, variant: StreamVariant):
+        with self._lock:
+            self._subscribers[variant] = self._subscribers.get(variant, 0) + 1
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(
+                    target=self._run, name=f"frame-hub-{self.magistrate_id}", daemon=True
+                )
+                self._worker.start()
+        self._wakeup.set()
+
+    def _detach(self, variant: StreamVariant):
+        with self._lock:
+            count = self._subscribers.get(variant, 0) - 1
+            if count > 0:
+                self._subscribers[variant] = count
+            else:
+                # 该规格无人观看：删除计数与缓存，工作线程不再为其编码
+                self._subscribers.pop(variant, None)
+                self._latest.pop(variant, None)
+                self._seq.pop(variant, None)
+            if not self._subscribers:
+                self._wakeup.clear()
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return sum(self._subscribers.values())
+
+    def close(self):
+        """
+        结束工作线程，并让所有正在输出的 MJPEG 流（同步/异步）结束。
+        receiver 被替换、旧 FrameHub 废弃，或摄像头从配置中删除时调用。
+        """
+        with self._new_frame:
+            self._closed = True
+            self._new_frame.notify_all()
+            signals = list(self._loop_signals.items())
+        self._wakeup.set()
+        for loop, signal in signals:
+            try:
+                loop.call_soon_threadsafe(signal.fire)
+            except RuntimeError:
+                pass
+
+    def stats(self) -> dict:
+        """当前订阅情况：各规格的订阅数与每个客户端的档位/吞吐。"""
+        with self._lock:
+            return {
+                "subscribers": sum(self._subscribers.values()),
+                "variants": {_variant_label(v): n for v, n in self._subscribers.items()},
+                "clients": [c.stats() for c in self._clients],
+            }
+
+    def stream(self, base: StreamVariant, keepalive_sec: float = DEFAULT_KEEPALIVE_SEC, adaptive: bool = True):
+        """
+        MJPEG multipart 生成器。只在有新帧时输出；超过 keepalive_sec 没有新帧时，
+        重发上一帧（已编码字节，不做任何计算）以维持连接。
+        adaptive=True 时按客户端吞吐在 QUALITY_TIERS 之间自动升降档。
+        客户端断开时 WSGI 服务器会 close() 生成器，finally 中自动解除订阅；FrameHub 被 close() 时流随之结束。
+        """
+        client = _StreamClient(base, adaptive)
+        variant = client.variant
+        self._attach(variant)
+        with self._lock:
+            self._clients.append(client)
+        try:
+            last_seq = 0
+            next_send_at = 0.0
+            while True:
+                # 档位帧率上限：未到发送时间先休眠，醒来后直接取最新帧
+                delay = next_send_at - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+
+                with self._new_frame:
+                    self._new_frame.wait_for(lambda: self._closed or self._seq.get(variant, 0) > last_seq,
+                                             timeout=keepalive_sec)
+                    if self._closed:
+                        return
+                    seq = self._seq.get(variant, 0)
+                    jpg = self._latest.get(variant)
+                # 超时且从未收到过帧：继续等待，不输出
+                if jpg is None:
+                    continue
+                last_seq = seq
+
+                started = time.monotonic()
+                next_send_at = started + 1 / client.tier.fps
+                yield _multipart_chunk(jpg)
+                self.receiver.counters.incr("delivered")
+
+                if client.record_write(len(jpg), time.monotonic() - started):
+                    # 切换档位：换订阅规格，从新规格的最新帧开始
+                    self._detach(variant)
+                    variant = client.variant
+                    self._attach(variant)
+                    last_seq = 0
+        finally:
+            with self._lock:
+                self._clients.remove(client)
+            self._detach(variant)
+
+    def _register_loop(self, loop: asyncio.AbstractEventLoop) -> _LoopSignal:
+        with self._lock:
+            signal = self._loop_signals.get(loop)
+            if signal is None:
+                signal = _LoopSignal()
+                self._loop_signals[loop] = signal
+            signal.subscribers += 1
+            return signal
+
+    def _unregister_loop(self, loop: asyncio.AbstractEventLoop):
+        with self._lock:
+            signal = self._loop_signals.get(loop)
+            if signal is not None:
+                signal.subscribers -= 1
+                if signal.subscribers <= 0:
+                    del self._loop_signals[loop]
+
+    async def stream_async(self, base: StreamVariant, keepalive_sec: float = DEFAULT_KEEPALIVE_SEC,
+                           adaptive: bool = True):
+        """
+        stream() 的 asyncio 版本（供 app.asgi 使用）：等待新帧时挂起协程而不占用线程，
+        输出内容、keep-alive 与自适应档位的行为与 stream() 相同。
+        调用方负责在客户端断开时 aclose()，finally 中解除订阅。
+        """
+        loop = asyncio.get_running_loop()
+        signal = self._register_loop(loop)
+        client = _StreamClient(base, adaptive)
+        variant = client.variant
+        self._attach(variant)
+        with self._lock:
+            self._clients.append(client)
+        try:
+            last_seq = 0
+            next_send_at = 0.0
+            while True:
+                delay = next_send_at - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+                # 等到本规格出现新帧，或超过 keepalive_sec（重发上一帧）
+                deadline = time.monotonic() + keepalive_sec
+                while True:
+                    # 先取 Event 再检查序号：检查之后到达的帧一定会 set 这个 Event
+                    event = signal.event
+                    with self._lock:
+                        closed = self._closed
+                        seq = self._seq.get(variant, 0)
+                        jpg = self._latest.get(variant)
+                    remaining = deadline - time.monotonic()
+                    if closed or seq > last_seq or remaining <= 0:
+                        break
+                    try:
+                        await asyncio.wait_for(event.wait(), remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                if closed:
+                    return
+                # 超时且从未收到过帧：继续等待，不输出
+                if jpg is None:
+                    continue
+                last_seq = seq
+
+                started = time.monotonic()
+                next_send_at = started + 1 / client.tier.fps
+                yield _multipart_chunk(jpg)
+                self.receiver.counters.incr("delivered")
+
+                if client.record_write(len(jpg), time.monotonic() - started):
+                    self._detach(variant)
+                    variant = client.variant
+                    self._attach(variant)
+                    last_seq = 0
+        finally:
+            with self._lock:
+                self._clients.remove(client)
+            self._detach(variant)
+            self._unregister_loop(loop)
+
+    # ------------------------------------------------------------------
+    # 工作线程
+    # ------------------------------------------------------------------
+
+    def _render(self, msg, variants: List[StreamVariant]) -> Dict[StreamVariant, bytes]:
+        encoded: Dict[StreamVariant, bytes] = {}
+        counters = self.receiver.counters
+
+        # 0. JPEG パススルー：上流が既に JPEG を送っていて、描画もリサイズも不要な規格は
+        #    元のバイト列をそのまま配信する（デコード/エンコードなし）
+        src_size = (int(getattr(msg, "frame_width", 0)), int(getattr(msg, "frame_height", 0)))
+        passthrough = [v for v in variants
+                       if not v.overlay and (v.width, v.height) == src_size and v.quality == DEFAULT_JPEG_QUALITY]
+        #    ペイロードはメッセージごとに一度だけ読み、パススルー判定とデコードで同じビューを共有する
+        view = payload_view(msg)
+        jpg = jpeg_payload(msg, view=view) if passthrough else None
+        pending: List[StreamVariant] = []
+        for variant in variants:
+            if jpg is not None and variant in passthrough:
+                encoded[variant] = jpg
+            else:
+                pending.append(variant)
+        if encoded:
+            counters.incr("passthrough")
+
+        if not pending:
+            return encoded
+
+        # 描画またはリサイズが必要な規格がある場合のみデコードする
+        frame = decode_frame(msg, view=view)
+        if frame is None:
+            counters.incr("decode_failed")
+            return encoded
+        counters.incr("decoded")
+
+        # 1. 色空間の変換（全規格共通、一度だけ）
+        if frame.ndim == 2:
+            frame_bgr = cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR)
+        else:
+            frame_bgr = frame
+
+        if any(v.overlay for v in pending):
+            key_area, ground_area = self._overlay_areas.areas()
+
+        # 2. 同じ解像度のリサイズ結果は規格間で共有する
+        resized: Dict[tuple, np.ndarray] = {}
+        for variant in pending:
+            size = (variant.width, variant.height)
+            if size not in resized:
+                if frame_bgr.shape[1::-1] == size:
+                    resized[size] = frame_bgr
+                else:
+                    with metrics.FRAME_OP.time(magistrate=self.magistrate_id, op="resize"):
+                        resized[size] = cv2.resize(frame_bgr, size)
+            canvas = resized[size]
+
+            # 3. エリア描画：事前に描画済みのオーバーレイ層を一回の演算で合成する
+            if variant.overlay:
+                layer = overlay_cache.get_overlay(
+                    self.magistrate_id, key_area, ground_area,
+                    variant.width, variant.height
+                )
+                if layer is not None:
+                    canvas = layer.apply(canvas)
+
+            # 4. エンコード
+            with metrics.FRAME_OP.time(magistrate=self.magistrate_id, op="encode"):
+                ok, buf = cv2.imencode(".jpg", canvas, [int(cv2.IMWRITE_JPEG_QUALITY), variant.quality])
+            if ok:
+                encoded[variant] = buf.tobytes()
+                counters.incr("encoded")
+        return encoded
+
+    def _run(self):
+        next_render_at = 0.0
+        while True:
+            # 无订阅者时挂起，直到有新的客户端接入
+            self._wakeup.wait()
+            if self._closed:
+                return
+
+            # 输出帧率上限：未到时间先休眠，醒来后只取最新的一帧（期间被覆盖的帧计入 dropped_stale）
+            now = time.monotonic()
+            if now < next_render_at:
+                time.sleep(next_render_at - now)
+
+            msg = self.receiver.take()
+            if msg is None:
+                # 通配模式下由 put() 唤醒；按摄像头订阅模式下退化为短间隔轮询
+                self.receiver.wait(RECEIVER_WAIT_TIMEOUT)
+                continue
+            next_render_at = time.monotonic() + 1 / FRAME_RATE
+
+            with self._lock:
+                variants = list(self._subscribers.keys())
+            try:
+                encoded = self._render(msg, variants)
+            except Exception:
+                logger.error_trace("FrameHub", f"Magistrate {self.magistrate_id} failed to render frame")
+                continue
+
+            with self._new_frame:
+                for variant, jpg in encoded.items():
+                    # 渲染期间订阅者可能已全部离开
+                    if variant in self._subscribers:
+                        self._latest[variant] = jpg
+                        self._seq[variant] = self._seq.get(variant, 0) + 1
+                self._new_frame.notify_all()
+                signals = list(self._loop_signals.items())
+
+            # 异步订阅者：每个事件循环投递一次通知
+            for loop, signal in signals:
+                try:
+                    loop.call_soon_threadsafe(signal.fire)
+                except RuntimeError:
+                    # 事件循环已关闭
+                    pass
+
+
+# ------------------------------------------------------------------
+# 进程级注册表：每个 receiver 对应一个 FrameHub
+# ------------------------------------------------------------------
+
+_hubs: Dict[int, FrameHub] = {}
+_hubs_lock = threading.Lock()
+
+
+def get_frame_hub(magistrate_id: int, receiver: FrameSource) -> FrameHub:
+    """取得（必要时创建）指定 magistrate 的 FrameHub。"""
+    with _hubs_lock:
+        hub = _hubs.get(magistrate_id)
+        if hub is None or hub.receiver is not receiver:
+            # receiver 已被重新创建（空闲后取消订阅、配置变更）：废弃旧的 FrameHub
+            if hub is not None:
+                hub.close()
+            hub = FrameHub(magistrate_id, receiver)
+            _hubs[magistrate_id] = hub
+        return hub
+
+
+def close_frame_hub(magistrate_id: int):
+    """废弃指定 magistrate 的 FrameHub（摄像头已从配置中删除）：正在输出的流随之结束。"""
+    with _hubs_lock:
+        hub = _hubs.pop(magistrate_id, None)
+    if hub is not None:
+        hub.close()
+
+
+def all_hub_stats() -> Dict[int, dict]:
+    """所有 FrameHub 的订阅/档位统计（magistrate_id -> stats）。"""
+    with _hubs_lock:
+        hubs = list(_hubs.values())
+    return {hub.magistrate_id: hub.stats() for hub in hubs}
@@ -0,0 +1,130 @@
+# app/utils/frame_slot.py
+import threading
+import time
+from typing import Dict, Optional, Union
+
+
+# PolledReceiverSlot 轮询插件的间隔（秒）：插件不提供到达通知，只能定期 read()
+POLL_INTERVAL = 0.005
+
+
+class FrameCounters:
+    """
+    单个摄像头的帧流水线计数（线程安全）：
+
+      received       收到的推論結果
+      dropped_stale  还未被取走就被更新的一帧覆盖、从未解码的帧
+      decoded        解码成功的帧
+      passthrough    上游已是 JPEG、至少一个输出规格原样转发的帧（只直通、不解码的帧不计入 decoded）
+      decode_failed  解析/解码失败的帧
+      encoded        编码出的 JPEG（每个输出规格各计一次）
+      delivered      写给 MJPEG 客户端的帧（含 keep-alive 重发）
+
+    另外记录最近一帧的到达时间，snapshot() 中换算为 age_of_latest_sec。
+    tracks_dropped=False 表示帧来源无法观测覆盖（PolledReceiverSlot），snapshot() 中 dropped_stale 为 None。
+    """
+
+    FIELDS = ("received", "dropped_stale", "decoded", "passthrough", "decode_failed", "encoded", "delivered")
+
+    def __init__(self, tracks_dropped: bool = True):
+        self.tracks_dropped = tracks_dropped
+        self._lock = threading.Lock()
+        self._counts = {k: 0 for k in self.FIELDS}
+        self._last_received_at: Optional[float] = None
+
+    def incr(self, key: str, n: int = 1):
+        with self._lock:
+            self._counts[key] += n
+
+    def mark_received(self, dropped: bool):
+        with self._lock:
+            self._counts["received"] += 1
+            if dropped:
+                self._counts["dropped_stale"] += 1
+            self._last_received_at = time.monotonic()
+
+    def snapshot(self) -> Dict[str, object]:
+        with self._lock:
+            snap: Dict[str, object] = dict(self._counts)
+            last = self._last_received_at
+        if not self.tracks_dropped:
+            snap["dropped_stale"] = None
+        snap["age_of_latest_sec"] = None if last is None else round(time.monotonic() - last, 3)
+        return snap
+
+
+class LatestFrameSlot:
+    """
+    容量为 1 的最新帧槽位（通配订阅模式使用，由 WildcardInferenceIngest 写入）。
+
+    MQTT 线程 put() 只保存原始负载（不解析）并唤醒 wait() 中的工作线程；
+    FrameHub 的工作线程 take() 取走最新一帧时才解析 protobuf。
+    上一帧尚未被取走就被覆盖时计入 dropped_stale，因此被跳过的帧不产生任何解析开销。
+    """
+
+    def __init__(self, magistrate_id: int, message_cls):
+        self.magistrate_id = magistrate_id
+        self.counters = FrameCounters()
+        self._message_cls = message_cls
+        self._lock = threading.Lock()
+        self._arrived = threading.Condition(self._lock)
+        self._payload: Optional[bytes] = None
+
+    def put(self, payload: bytes):
+        with self._lock:
+            dropped = self._payload is not None
+            self._payload = payload
+            self._arrived.notify_all()
+        self.counters.mark_received(dropped)
+
+    def wait(self, timeout: float) -> bool:
+        """等待新帧到达（最多 timeout 秒）；有未取走的帧时返回 True。"""
+        with self._lock:
+            return self._arrived.wait_for(lambda: self._payload is not None, timeout=timeout)
+
+    def take(self):
+        """取走最新一帧（解析后的消息）；自上次 take() 以来没有新帧时返回 None。"""
+        with self._lock:
+            payload, self._payload = self._payload, None
+        if payload is None:
+            return None
+        msg = self._message_cls()
+        try:
+            msg.ParseFromString(payload)
+        except Exception:
+            self.counters.incr("decode_failed")
+            return None
+        return msg
+
+
+class PolledReceiverSlot:
+    """
+    把 InferenceResultReceiverPlugin（每个摄像头一个订阅的模式）包装成与 LatestFrameSlot 相同的 take() 接口。
+
+    插件只提供 read()（返回最新消息），消息本身也不带序号，两次轮询之间被覆盖的消息无法观测，
+    因此该模式下 received 只统计轮询观察到的新消息，dropped_stale 报告为 None（不可用，而不是 0）；
+    需要丢帧数字时使用通配订阅模式（LatestFrameSlot）。
+    """
+
+    def __init__(self, magistrate_id: int, receiver):
+        self.magistrate_id = magistrate_id
+        self.receiver = receiver
+        self.counters = FrameCounters(tracks_dropped=False)
+        self._last_msg = None
+
+    def wait(self, timeout: float) -> bool:
+        """插件没有到达通知：休眠一个轮询间隔，由调用方再次 take()。"""
+        time.sleep(min(POLL_INTERVAL, timeout))
+        return False
+
+    def take(self):
+        msg = self.receiver.read()
+        if msg is None or msg is self._last_msg:
+            return None
+        self._last_msg = msg
+        self.counters.mark_received(dropped=False)
+        return msg
+
+
+# FrameHub 的帧来源：两种订阅模式下都提供 take()、wait() 与 counters
+FrameSource = Union[LatestFrameSlot, PolledReceiverSlot]
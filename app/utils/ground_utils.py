@@ -3,24 +3,7 @@ import numpy as np
 from typing import List, Tuple, Optional
 
 def _rotation_world_from_camera(yaw: float, pitch: float, roll: float) -> np.ndarray:
-    R_align = np.array([[1.0, 0.0, 0.0],
-                        [0.0, 0.0, 1.0],
-                        [0.0, -1.0, 0.0]], dtype=float)
-
-    cy, sy = np.cos(yaw), np.sin(yaw)
-    cp, sp = np.cos(pitch), np.sin(pitch)
-    cr, sr = np.cos(roll), np.sin(roll)
-
-    Rz = np.array([[cy, -sy, 0.0],
-                   [sy,  cy, 0.0],
-                   [0.0, 0.0, 1.0]], dtype=float)
-    Rx = np.array([[1.0, 0.0, 0.0],
-                   [0.0,  cp, -sp],
-                   [0.0,  sp,  cp]], dtype=float)
-    Ry = np.array([[ cr, 0.0, sr],
-                   [0.0, 1.0, 0.0],
-                   [-sr, 0.0, cr]], dtype=float)
-    return Rz @ Rx @ Ry @ R_align
+    return _rotations_world_from_camera(np.array([yaw]), np.array([pitch]), np.array([roll]))[0]
 
 
 def _intersect_y_boundary(P: np.ndarray, Q: np.ndarray, keep_func) -> Optional[np.ndarray]:
@@ -53,6 +36,181 @@ def _intersect_y_boundary(P: np.ndarray, Q: np.ndarray, keep_func) -> Optional[n
     return np.array([x, k], dtype=float)
 
 
+def _rotations_world_from_camera(yaw: np.ndarray, pitch: np.ndarray, roll: np.ndarray) -> np.ndarray:
+    """_rotation_world_from_camera 的批量版本：输入 (N,) 弧度，返回 (N, 3, 3)。"""
+    R_align = np.array([[1.0, 0.0, 0.0],
+                        [0.0, 0.0, 1.0],
+                        [0.0, -1.0, 0.0]], dtype=float)
+
+    n = yaw.shape[0]
+    cy, sy = np.cos(yaw), np.sin(yaw)
+    cp, sp = np.cos(pitch), np.sin(pitch)
+    cr, sr = np.cos(roll), np.sin(roll)
+    zeros, ones = np.zeros(n), np.ones(n)
+
+    Rz = np.stack([cy, -sy, zeros, sy, cy, zeros, zeros, zeros, ones], axis=-1).reshape(n, 3, 3)
+    Rx = np.stack([ones, zeros, zeros, zeros, cp, -sp, zeros, sp, cp], axis=-1).reshape(n, 3, 3)
+    Ry = np.stack([cr, zeros, sr, zeros, ones, zeros, -sr, zeros, cr], axis=-1).reshape(n, 3, 3)
+    return Rz @ Rx @ Ry @ R_align
+
+
+def project_ground_points_batch(
+    camera_height: np.ndarray,
+    roll_angle: np.ndarray,
+    pitch_angle: np.ndarray,
+    yaw_angle: np.ndarray,
+    focal_length: np.ndarray,
+    principal_coord: np.ndarray,
+    ground_coords: np.ndarray,
+) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    把 N 台相机各自的 K 个像素点反投影到地面（Z=0），一次广播矩阵乘法完成全部视线的旋转。
+
+    参数形状：camera_height / roll / pitch / yaw 为 (N,)（cm、度），focal_length / principal_coord 为 (N, 2)，
+    ground_coords 为 (N, K, 2)。点数不同的点集用 NaN 补齐到同一个 K，NaN 点视为无效。
+
+    返回 (hits, valid)：hits 为 (N, K, 2) 的地面坐标（米，X 横向 / Y 纵向），
+    valid 为 (N, K) 布尔数组，视线不向下（不与地面相交）或输入为 NaN 的点为 False。
+    """
+    H = np.asarray(camera_height, dtype=float) / 100.0  # cm -> m
+    focal = np.asarray(focal_length, dtype=float)
+    principal = np.asarray(principal_coord, dtype=float)
+    uv = np.asarray(ground_coords, dtype=float)
+
+    R_wc = _rotations_world_from_camera(
+        np.deg2rad(np.asarray(yaw_angle, dtype=float)),
+        np.deg2rad(np.asarray(pitch_angle, dtype=float)),
+        np.deg2rad(np.asarray(roll_angle, dtype=float)),
+    )
+
+    # 归一化相机坐标系下的视线 (N, K, 3)
+    xy = (uv - principal[:, None, :]) / focal[:, None, :]
+    r_cam = np.concatenate([xy, np.ones(xy.shape[:2] + (1, ))], axis=-1)
+    r_cam /= (np.linalg.norm(r_cam, axis=-1, keepdims=True) + 1e-12)
+
+    # (N, 3, 3) x (N, 3, K) -> (N, K, 3)
+    d = np.matmul(R_wc, r_cam.transpose(0, 2, 1)).transpose(0, 2, 1)
+    dz = d[..., 2]
+
+    # 视线没有向下的点不与地面相交
+    valid = dz < -1e-12
+    valid &= ~np.isnan(dz)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        t = np.where(valid, -H[:, None] / np.where(valid, dz, -1.0), 0.0)
+    hits = t[..., None] * d[..., :2]  # 相机中心位于 (0, 0, H)，只保留 X,Y
+    return hits, valid
+
+
+def ground_dimensions_from_hits(hits: np.ndarray, valid: np.ndarray) -> np.ndarray:
+    """
+    由 project_ground_points_batch 的结果计算每台相机的 (width_x, depth_y)，返回 (N, 2)。
+    有效点少于 2 个时（包括点集为空、K == 0）为 (0, 0)。
+    """
+    # initial 保证 K == 0 时归约不报错（结果随后由有效点数清零）
+    masked_min = np.where(valid[..., None], hits, np.inf).min(axis=1, initial=np.inf)
+    masked_max = np.where(valid[..., None], hits, -np.inf).max(axis=1, initial=-np.inf)
+    dims = np.maximum(masked_max - masked_min, 0.0)
+    dims[valid.sum(axis=1) < 2] = 0.0
+    return dims
+
+
+def calculate_ground_dimensions_batch(
+    camera_height: np.ndarray,
+    roll_angle: np.ndarray,
+    pitch_angle: np.ndarray,
+    yaw_angle: np.ndarray,
+    focal_length: np.ndarray,
+    principal_coord: np.ndarray,
+    ground_coords: np.ndarray,
+) -> np.ndarray:
+    """
+    calculate_ground_dimensions 的批量版本（参数形状见 project_ground_points_batch），
+    返回 (N, 2)：每台相机 / 每个点集的 (width_x, depth_y)，单位米。
+    """
+    hits, valid = project_ground_points_batch(
+        camera_height, roll_angle, pitch_angle, yaw_angle, focal_length, principal_coord, ground_coords
+    )
+    return ground_dimensions_from_hits(hits, valid)
+
+
+def pad_point_sets(point_sets: List[List[List[float]]]) -> np.ndarray:
+    """把点数不同的点集用 NaN 补齐为 (N, K, 2)，供批量接口使用。"""
+    k = max((len(pts) for pts in point_sets), default=0)
+    out = np.full((len(point_sets), k, 2), np.nan, dtype=float)
+    for i, pts in enumerate(point_sets):
+        if len(pts):
+            out[i, :len(pts)] = np.asarray(pts, dtype=float)[:, :2]
+    return out
+
+
+def camera_geometry(
+    camera_height: float,
+    roll_angle: float,
+    pitch_angle: float,
+    yaw_angle: float,
+    focal_length: List[float],
+    principal_coord: List[float],
+) -> dict:
+    """
+    浏览器端实时计算地面尺寸所需的全部相机几何量（与 project_ground_points_batch 的计算完全对应）：
+      height_m       相机高度（米）
+      focal          [fx, fy]
+      principal      [cx, cy]
+      R_world_cam    3x3 旋转矩阵（行优先），视线 d = R @ normalize([(u-cx)/fx, (v-cy)/fy, 1])
+    视线与地面的交点为 (-height_m / d_z) * (d_x, d_y)，d_z >= -1e-12 的视线不与地面相交。
+    """
+    R = _rotation_world_from_camera(
+        np.deg2rad(float(yaw_angle)), np.deg2rad(float(pitch_angle)), np.deg2rad(float(roll_angle))
+    )
+    return {
+        "height_m": float(camera_height) / 100.0,
+        "focal": [float(v) for v in list(focal_length)[:2]],
+        "principal": [float(v) for v in list(principal_coord)[:2]],
+        "R_world_cam": R.tolist(),
+    }
+
+
+# sweep 可扫描的相机参数（顺序即结果数组的轴顺序）
+SWEEP_PARAMS = ("camera_height", "pitch_angle", "roll_angle", "yaw_angle")
+
+
+def sweep_ground_dimensions(
+    base: dict,
+    axes: dict,
+    focal_length: List[float],
+    principal_coord: List[float],
+    ground_coords: List[List[float]],
+) -> np.ndarray:
+    """
+    在相机参数网格上计算地面尺寸（标定时的灵敏度面）。
+
+    base 为 SWEEP_PARAMS 各参数的当前值；axes 为要扫描的参数 -> 取值数组（未给出的参数固定为 base 中的值）。
+    整个网格展开成 N 台"虚拟相机"，共用同一组像素点，一次 calculate_ground_dimensions_batch 完成。
+    返回形状为 (len(axis_0), len(axis_1), ..., 2) 的数组（轴按 SWEEP_PARAMS 中出现在 axes 里的顺序），
+    最后一维为 (width_x, depth_y)，单位米。
+    """
+    names = [name for name in SWEEP_PARAMS if name in axes]
+    grids = np.meshgrid(*[np.asarray(axes[name], dtype=float) for name in names], indexing="ij")
+    shape = grids[0].shape if grids else ()
+    n = int(np.prod(shape))
+
+    columns = {name: np.full(n, float(base[name])) for name in SWEEP_PARAMS}
+    for name, grid in zip(names, grids):
+        columns[name] = grid.reshape(-1)
+
+    pts = pad_point_sets([ground_coords])
+    dims = calculate_ground_dimensions_batch(
+        camera_height=columns["camera_height"],
+        roll_angle=columns["roll_angle"],
+        pitch_angle=columns["pitch_angle"],
+        yaw_angle=columns["yaw_angle"],
+        focal_length=np.broadcast_to(np.asarray(focal_length, dtype=float)[:2], (n, 2)),
+        principal_coord=np.broadcast_to(np.asarray(principal_coord, dtype=float)[:2], (n, 2)),
+        ground_coords=np.broadcast_to(pts, (n, ) + pts.shape[1:]),
+    )
+    return dims.reshape(shape + (2, ))
+
+
 def calculate_ground_dimensions(
     camera_height: float,
     roll_angle: float,
@@ -66,76 +224,35 @@ def calculate_ground_dimensions(
     返回 (width_x, depth_y)：
       - width_x: X方向跨度（横向，米）
       - depth_y: Y方向跨度（纵向，米）
-    若提供 depth_scale，则把地面四边形按 Y∈[0, depth_scale] 裁剪后再计算跨度。
-    """
-    H = float(camera_height) / 100.0  # cm -> m
-    fx, fy = float(focal_length[0]), float(focal_length[1])
-    cx, cy = float(principal_coord[0]), float(principal_coord[1])
-
-    yaw = np.deg2rad(float(yaw_angle))
-    pitch = np.deg2rad(float(pitch_angle))
-    roll = np.deg2rad(float(roll_angle))
-
-    R_wc = _rotation_world_from_camera(yaw, pitch, roll)
-    C = np.array([0.0, 0.0, H], dtype=float)  # 相机中心（世界系）
-
-    hits = []
-    for (u, v) in ground_coords:
-        x = (float(u) - cx) / fx
-        y = (float(v) - cy) / fy
-        r_cam = np.array([x, y, 1.0], dtype=float)
-        r_cam /= (np.linalg.norm(r_cam) + 1e-12)
-        d = R_wc @ r_cam
-        dz = d[2]
-        if dz >= -1e-12:
-            # 这条视线没有向下，不与地面相交，略过
-            continue
-        t = -H / dz
-        P = C + t * d
-        P[2] = 0.0
-        # 只保留 X,Y
-        hits.append([P[0], P[1]])
-
-    if len(hits) < 3:
-        # 不是有效多边形，用简单 min/max（至少 2 点）兜底
-        if len(hits) < 2:
-            return 0.0, 0.0
-        arr = np.asarray(hits)
-        width_x = float(arr[:,0].max() - arr[:,0].min())
-        depth_y = float(arr[:,1].max() - arr[:,1].min())
-        return max(width_x, 0.0), max(depth_y, 0.0)
-
-    poly = np.asarray(hits, dtype=float)  # 形如 [[x,y],...]
-
-    X = poly[:, 0]
-    Y = poly[:, 1]
-    width_x = float(X.max() - X.min())
-    depth_y = float(Y.max() - Y.min())
-    return max(width_x, 0.0), max(depth_y, 0.0)
+    单台相机时的便捷接口，内部走 calculate_ground_dimensions_batch（N=1）。
+    """
+    if not ground_coords:
+        return 0.0, 0.0
+    dims = calculate_ground_dimensions_batch(
+        np.array([camera_height], dtype=float),
+        np.array([roll_angle], dtype=float),
+        np.array([pitch_angle], dtype=float),
+        np.array([yaw_angle], dtype=float),
+        np.array([focal_length], dtype=float)[:, :2],
+        np.array([principal_coord], dtype=float)[:, :2],
+        pad_point_sets([ground_coords]),
+    )
+    return float(dims[0, 0]), float(dims[0, 1])
 
 
-def calculate_area_real_dimensions(
-        area_pixel_coords: List[Tuple[int, int]],
+def ground_homography(
         ground_pixel_coords: List[Tuple[int, int]],
         ground_real_width_mm: int,
         ground_real_depth_mm: int
-) -> Tuple[int, int]:
+) -> Optional[np.ndarray]:
     """
-    Calculates the real-world dimensions (width, height) of a given area using a perspective transform.
-
-    Args:
-        area_pixel_coords (List[Tuple[int, int]]): The 4 pixel coordinates of the target area.
-        ground_pixel_coords (List[Tuple[int, int]]): The 4 pixel coordinates of the calibrated ground plane.
-        ground_real_width_mm (int): The real-world width of the ground plane in millimeters.
-        ground_real_depth_mm (int): The real-world depth (height) of the ground plane in millimeters.
-
-    Returns:
-        Tuple[int, int]: A tuple containing the calculated real width and height in millimeters.
+    由标定的地面四边形（像素）与实测长度（mm）求 像素 -> 地面毫米坐标 的单应矩阵 (3, 3)。
+    地面四边形或长度未设置时返回 None。
     """
-    if not all([area_pixel_coords, ground_pixel_coords, ground_real_width_mm > 0, ground_real_depth_mm > 0]):
-        return 0, 0
+    if not ground_pixel_coords or len(ground_pixel_coords) != 4 or ground_real_width_mm <= 0 or ground_real_depth_mm <= 0:
+        return None
 
-    # 1. Define source (pixel) and destination (real-world) points for the transformation matrix
+    # Define source (pixel) and destination (real-world) points for the transformation matrix
     src_pts = np.array(ground_pixel_coords, dtype="float32")
 
     dst_pts = np.array([
@@ -145,15 +262,19 @@ def calculate_area_real_dimensions(
         [0, ground_real_depth_mm - 1]
     ], dtype="float32")
 
-    # 2. Compute the perspective transform matrix
-    matrix = cv2.getPerspectiveTransform(src_pts, dst_pts)
+    return cv2.getPerspectiveTransform(src_pts, dst_pts)
+
 
-    # 3. Transform the key area's pixel coordinates to real-world coordinates
-    key_area_pts_np = np.array([area_pixel_coords], dtype="float32")  # Needs to be in a list for perspectiveTransform
-    real_coords = cv2.perspectiveTransform(key_area_pts_np, matrix)[0]
+def apply_homography(matrix: np.ndarray, pixel_points: np.ndarray) -> np.ndarray:
+    """用单应矩阵把 (N, 2) 像素坐标一次性投影为 (N, 2) 地面坐标。"""
+    pts = np.asarray(pixel_points, dtype=float).reshape(-1, 2)
+    projected = pts @ matrix[:, :2].T + matrix[:, 2]
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return projected[:, :2] / projected[:, 2:3]
 
-    # 4. Calculate the average width and height from the transformed points
-    # real_coords now holds the 4 corners in the real-world millimeter coordinate system
+
+def area_dimensions_from_real_coords(real_coords: np.ndarray) -> Tuple[int, int]:
+    """已投影到毫米坐标系的 4 个角点 -> 对边长度平均后的 (width, height)，单位 mm。"""
     # Example: p0=(x0,y0), p1=(x1,y1), p2=(x2,y2), p3=(x3,y3)
     p0, p1, p2, p3 = real_coords
 
@@ -168,3 +289,36 @@ def calculate_area_real_dimensions(
     avg_height = int(round((height1 + height2) / 2.0))
 
     return avg_width, avg_height
+
+
+def calculate_area_real_dimensions(
+        area_pixel_coords: List[Tuple[int, int]],
+        ground_pixel_coords: List[Tuple[int, int]],
+        ground_real_width_mm: int,
+        ground_real_depth_mm: int,
+        matrix: Optional[np.ndarray] = None,
+) -> Tuple[int, int]:
+    """
+    Calculates the real-world dimensions (width, height) of a given area using a perspective transform.
+
+    Args:
+        area_pixel_coords (List[Tuple[int, int]]): The 4 pixel coordinates of the target area.
+        ground_pixel_coords (List[Tuple[int, int]]): The 4 pixel coordinates of the calibrated ground plane.
+        ground_real_width_mm (int): The real-world width of the ground plane in millimeters.
+        ground_real_depth_mm (int): The real-world depth (height) of the ground plane in millimeters.
+        matrix (Optional[np.ndarray]): A precomputed ground homography (e.g. from homography_cache);
+            computed from the ground arguments when omitted.
+
+    Returns:
+        Tuple[int, int]: A tuple containing the calculated real width and height in millimeters.
+    """
+    if not area_pixel_coords:
+        return 0, 0
+    if matrix is None:
+        matrix = ground_homography(ground_pixel_coords, ground_real_width_mm, ground_real_depth_mm)
+    if matrix is None:
+        return 0, 0
+
+    # Transform the key area's pixel coordinates to real-world coordinates
+    real_coords = apply_homography(matrix, area_pixel_coords)
+    return area_dimensions_from_real_coords(real_coords)
@@ -0,0 +1,49 @@
+# app/utils/homography_cache.py
+import threading
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from app.utils import config_repo, ground_utils
+
+
+def _ground_key(cam) -> tuple:
+    """决定单应矩阵的全部输入：地面四边形（像素）与实测的 X/Y 长度（mm）。"""
+    coords = tuple((float(p[0]), float(p[1])) for p in (cam.ground_coords or []))
+    return coords, int(cam.ground_x_length_calculated or 0), int(cam.ground_y_length_calculated or 0)
+
+
+# magistrate_id -> (输入 key, 单应矩阵（未标定时为 None）)
+# 每次读取都从 config_repo 取当前的相机参数重新算 key：保存（save_camera 直接更新快照）、重置、
+# 外部修改后 key 不再一致，下次读取时自动重新计算，因此不需要另外的失效接口。
+_matrices: Dict[int, Tuple[tuple, Optional[np.ndarray]]] = {}
+_matrices_lock = threading.Lock()
+
+
+def get_homography(magistrate_id: int) -> Optional[np.ndarray]:
+    """
+    指定 magistrate 的 像素 -> 地面毫米坐标 单应矩阵（只读，调用方不要修改）。
+    地面尚未标定（ground_coords 不足 4 点或长度为 0）时返回 None。
+    """
+    cam = config_repo.get_camera_settings(magistrate_id)
+    key = _ground_key(cam)
+    with _matrices_lock:
+        cached = _matrices.get(magistrate_id)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+
+    matrix = ground_utils.ground_homography(list(key[0]), key[1], key[2])
+    if matrix is not None:
+        matrix.setflags(write=False)
+    with _matrices_lock:
+        _matrices[magistrate_id] = (key, matrix)
+    return matrix
+
+
+def project_to_ground(magistrate_id: int, pixel_points) -> Optional[np.ndarray]:
+    """把 (N, 2) 像素坐标投影为 (N, 2) 地面毫米坐标；未标定时返回 None。"""
+    matrix = get_homography(magistrate_id)
+    if matrix is None:
+        return None
+    return ground_utils.apply_homography(matrix, pixel_points)
+
@@ -0,0 +1,125 @@
+# app/utils/inference_ingest.py
+import os
+import threading
+from typing import Dict, List, Optional, Set
+
+import paho.mqtt.client as mqtt
+
+from app.utils.frame_slot import LatestFrameSlot
+from pyengine.io.network.protobufs import import_inference_result
+from pyengine.utils.logger import logger
+
+
+# 通配订阅没有默认的 topic filter / 前缀 / pb2 目录：订阅范围与 inference_result_pb2.py 的位置取决于部署，
+# 默认 "#" 会订阅 broker 上的全部 topic（含视频帧以外的大流量），因此必须显式配置，缺失时启动即报错。
+
+
+class WildcardInferenceIngest:
+    """
+    用一个 MQTT 连接、一次通配订阅接收所有摄像头的推論結果，按 topic 后缀（pipeline_inference_N 的 N）
+    写入各摄像头的 LatestFrameSlot，代替每个摄像头一个订阅/插件。
+
+    - open(N) 返回槽位；第一个槽位打开时才建立订阅，最后一个关闭时断开（由 ReceiverRegistry 按观看者驱动）；
+    - MQTT 线程只做前缀/编号检查并保存原始负载，解析推迟到 FrameHub 取帧时；
+    - 未打开的摄像头的消息直接丢弃；
+    - 收到过消息的编号记录在 seen_ids() 中，新增的摄像头无需重启即可出现。
+    """
+
+    def __init__(self, host: str, port: int, client_id: str,
+                 topic_filter: str, topic_prefix: str, pb2_dir: str):
+        if not topic_filter:
+            raise ValueError("WildcardInferenceIngest: topic_filter is required (e.g. 'inference/#')")
+        if not topic_prefix:
+            raise ValueError("WildcardInferenceIngest: topic_prefix is required (e.g. 'inference/pipeline_inference_')")
+        if not pb2_dir or not os.path.isdir(pb2_dir):
+            raise ValueError(f"WildcardInferenceIngest: protobuf directory not found: {pb2_dir!r}")
+        if topic_filter == "#":
+            logger.warning("WildcardInferenceIngest", "topic_filter '#' subscribes to every topic on the broker")
+
+        self.host = host
+        self.port = port
+        self.client_id = client_id
+        self.topic_filter = topic_filter
+        self.topic_prefix = topic_prefix
+        self._message_cls = import_inference_result(pb2_dir)
+
+        self._lock = threading.Lock()
+        self._slots: Dict[int, LatestFrameSlot] = {}
+        self._seen: Set[int] = set()
+        self._client: Optional[mqtt.Client] = None
+
+    # ------------------------------------------------------------------
+    # 槽位管理
+    # ------------------------------------------------------------------
+
+    def open(self, magistrate_id: int) -> LatestFrameSlot:
+        with self._lock:
+            slot = self._slots.get(magistrate_id)
+            if slot is None:
+                slot = LatestFrameSlot(magistrate_id, self._message_cls)
+                self._slots[magistrate_id] = slot
+            if self._client is None:
+                self._connect_locked()
+            return slot
+
+    def close(self, magistrate_id: int):
+        client = None
+        with self._lock:
+            self._slots.pop(magistrate_id, None)
+            if not self._slots:
+                client, self._client = self._client, None
+        if client is not None:
+            self._disconnect(client)
+
+    def seen_ids(self) -> List[int]:
+        with self._lock:
+            return sorted(self._seen)
+
+    def stop(self):
+        with self._lock:
+            self._slots.clear()
+            client, self._client = self._client, None
+        if client is not None:
+            self._disconnect(client)
+
+    # ------------------------------------------------------------------
+    # MQTT
+    # ------------------------------------------------------------------
+
+    def _connect_locked(self):
+        if hasattr(mqtt, "CallbackAPIVersion"):
+            client = mqtt.Client(mqtt.CallbackAPIVersion.VERSION2, client_id=self.client_id)
+        else:
+            client = mqtt.Client(client_id=self.client_id)
+        client.on_connect = self._on_connect
+        client.on_message = self._on_message
+        client.connect_async(self.host, self.port)
+        client.loop_start()
+        self._client = client
+        logger.info("WildcardInferenceIngest", f"Subscribing to {self.topic_filter} on {self.host}:{self.port}")
+
+    def _disconnect(self, client: mqtt.Client):
+        # 在锁外执行：loop_stop() 会等待网络线程结束，而 _on_message 可能正在等这把锁
+        client.disconnect()
+        client.loop_stop()
+        logger.info("WildcardInferenceIngest", f"Unsubscribed from {self.topic_filter}")
+
+    def _on_connect(self, client, userdata, *args):
+        # 断线重连后也会回调：重新订阅
+        client.subscribe(self.topic_filter, qos=0)
+
+    def _on_message(self, client, userdata, message):
+        topic = message.topic
+        if not topic.startswith(self.topic_prefix):
+            return
+        suffix = topic[len(self.topic_prefix):]
+        if not suffix.isdigit():
+            return
+        magistrate_id = int(suffix)
+
+        slot = self._slots.get(magistrate_id)
+        if slot is not None:
+            slot.put(message.payload)
+        if magistrate_id not in self._seen:
+            with self._lock:
+                self._seen.add(magistrate_id)
@@ -0,0 +1,199 @@
+# app/utils/metrics.py
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from flask import g, has_request_context, request
+
+from pyengine.utils.logger import logger
+
+
+# 默认桶（秒）：覆盖 0.5 ms 的 imencode 到数秒的 YAML 落盘
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(pairs: Iterable[Tuple[str, str]]) -> str:
+    body = ",".join(f'{k}="{_escape(v)}"' for k, v in pairs)
+    return f"{{{body}}}" if body else ""
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Histogram:
+    """
+    带标签的直方图（线程安全），按 Prometheus 文本格式输出 _bucket / _sum / _count。
+    标签值应来自有限集合（路由规则、配置名、摄像头编号），不要用原始 URL。
+    """
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        self._lock = threading.Lock()
+        # 标签值 -> ([各桶计数（不累计）..., +Inf], sum)
+        self._series: Dict[Tuple[str, ...], Tuple[List[int], List[float]]] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(str(labels[k]) for k in self.labelnames)
+        idx = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = ([0] * (len(self.buckets) + 1), [0.0])
+                self._series[key] = series
+            series[0][idx] += 1
+            series[1][0] += value
+
+    @contextmanager
+    def time(self, server_timing: Optional[str] = None, **labels):
+        """计时并记录；指定 server_timing 时同时计入当前请求的 Server-Timing 头（在请求上下文中时）。"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.observe(elapsed, **labels)
+            if server_timing is not None:
+                add_server_timing(server_timing, elapsed)
+
+    def render(self) -> List[str]:
+        with self._lock:
+            series = {k: (list(counts), total[0]) for k, (counts, total) in self._series.items()}
+
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        for key in sorted(series):
+            counts, total = series[key]
+            base = list(zip(self.labelnames, key))
+            cumulative = 0
+            for bound, n in zip(self.buckets + (float("inf"), ), counts):
+                cumulative += n
+                le = _format_labels(base + [("le", _format_value(bound))])
+                lines.append(f"{self.name}_bucket{le} {cumulative}")
+            lines.append(f"{self.name}_sum{_format_labels(base)} {total!r}")
+            lines.append(f"{self.name}_count{_format_labels(base)} {cumulative}")
+        return lines
+
+
+class CollectedFamily:
+    """
+    抓取时才计算的指标：collect() 返回 [(标签字典, 值)]。
+    用于活跃流数、心跳状态、FrameCounters 等本来就保存在别处的值，避免再维护一份计数。
+    """
+
+    def __init__(self, name: str, documentation: str, collect: Callable[[], List[Tuple[Dict[str, str], float]]],
+                 metric_type: str = "gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.collect = collect
+        self.metric_type = metric_type
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{_format_labels(sorted(labels.items()))} {_format_value(value)}")
+        return lines
+
+
+# ----------------------------------------------------------------------
+# 进程内的指标
+# ----------------------------------------------------------------------
+
+REQUEST_LATENCY = Histogram(
+    "restful_request_duration_seconds",
+    "Time from request start to response headers, per route rule.",
+    ("method", "route", "status"),
+)
+
+CONFIG_IO = Histogram(
+    "restful_config_io_seconds",
+    "YAML config parse (op=load) and atomic write (op=save) durations.",
+    ("config", "op"),
+)
+
+FRAME_OP = Histogram(
+    "restful_frame_op_seconds",
+    "Per-frame cv2.resize (op=resize) and cv2.imencode (op=encode) durations in the MJPEG workers.",
+    ("magistrate", "op"),
+)
+
+def config_kind(config_name: str) -> str:
+    """magistrate_config3 / camera_parameters3 按种类聚合为一个标签值，避免每个摄像头一条时间序列。"""
+    return config_name.rstrip("0123456789")
+
+
+_collected: List[CollectedFamily] = []
+_collected_lock = threading.Lock()
+
+
+def register_collector(name: str, documentation: str, collect: Callable[[], List[Tuple[Dict[str, str], float]]],
+                       metric_type: str = "gauge"):
+    """注册（或按名字替换）一个抓取时计算的指标。collect() 在 /metrics 的请求上下文中调用。"""
+    with _collected_lock:
+        _collected[:] = [c for c in _collected if c.name != name]
+        _collected.append(CollectedFamily(name, documentation, collect, metric_type))
+
+
+def add_server_timing(name: str, seconds: float):
+    """把一段耗时累加到当前请求的 Server-Timing 中（同名多次累加）；不在请求上下文中时忽略。"""
+    if not has_request_context():
+        return
+    timings = g.setdefault("_server_timings", {})
+    timings[name] = timings.get(name, 0.0) + seconds
+
+
+def _server_timing_header(total: float) -> str:
+    parts = [f"app;dur={total * 1000:.2f}"]
+    for name, seconds in g.get("_server_timings", {}).items():
+        parts.append(f"{name};dur={seconds * 1000:.2f}")
+    return ", ".join(parts)
+
+
+def init_app(app):
+    """
+    按路由规则（而不是原始 URL）记录所有蓝图的请求耗时。流式响应记录到响应头为止。
+    HTMX 片段请求（HX-Request: true）的响应附带 Server-Timing，浏览器开发者工具的 Timing 页可直接查看。
+    """
+
+    @app.before_request
+    def _start_timer():
+        g._metrics_started_at = time.perf_counter()
+
+    @app.after_request
+    def _observe_latency(response):
+        started = g.pop("_metrics_started_at", None)
+        if started is not None:
+            elapsed = time.perf_counter() - started
+            rule = request.url_rule.rule if request.url_rule is not None else "<unmatched>"
+            REQUEST_LATENCY.observe(elapsed, method=request.method, route=rule, status=response.status_code)
+            if request.headers.get("HX-Request") == "true":
+                response.headers["Server-Timing"] = _server_timing_header(elapsed)
+        return response
+
+
+def render() -> str:
+    """所有指标的 Prometheus 文本格式。"""
+    lines: List[str] = []
+    for hist in (REQUEST_LATENCY, CONFIG_IO, FRAME_OP):
+        lines.extend(hist.render())
+    with _collected_lock:
+        collected = list(_collected)
+    for family in collected:
+        try:
+            lines.extend(family.render())
+        except Exception:
+            logger.error_trace("metrics.render", f"Failed to collect {family.name}")
+    return "\n".join(lines) + "\n"
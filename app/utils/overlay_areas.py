@@ -0,0 +1,99 @@
+# app/utils/overlay_areas.py
+import threading
+import time
+from typing import Dict, List, Tuple
+
+from app.utils import config_repo
+from pyengine.utils.logger import logger
+
+
+# 读取失败（文件缺失等）后，再次尝试读取前的等待时间（秒）
+RETRY_INTERVAL = 5.0
+
+# 经 config_repo 检查文件是否在应用外被修改的间隔（秒）；每次只是一次 stat，未变化时不解析 YAML
+RECHECK_INTERVAL = 1.0
+
+
+class OverlayAreas:
+    """
+    单个 magistrate 的叠加区域（重点エリア / 床エリア），进程内所有 MJPEG 流共用一份。
+
+    订阅 config_repo 中 magistrate_config{id} / camera_parameters{id} 的变化：
+      - keyarea_settings_submit / ground_settings_submit 保存时直接收到新快照，下一帧即生效，不做任何 I/O；
+      - invalidate()（重置、从设备读入）只标记为需要重新读取，下一次 areas() 时读取一次；
+      - 此外 areas() 每隔 RECHECK_INTERVAL 经 config_repo 读取一次（只 stat，文件未变化时直接命中缓存），
+        在应用外直接修改 YAML 也会在该间隔内生效。
+    """
+
+    def __init__(self, magistrate_id: int):
+        self.magistrate_id = magistrate_id
+        self._lock = threading.Lock()
+        self._key_area: List = []
+        self._ground_area: List = []
+        self._dirty = True
+        self._retry_at = 0.0
+        self._next_check = 0.0
+        self._unsubscribe = [
+            config_repo.subscribe(f"magistrate_config{magistrate_id}", self._on_magistrate_config),
+            config_repo.subscribe(f"camera_parameters{magistrate_id}", self._on_camera_settings),
+        ]
+
+    def areas(self) -> Tuple[List, List]:
+        """(key_area, ground_area)；首次、invalidate() 之后以及每隔 RECHECK_INTERVAL 经 config_repo 读取。"""
+        now = time.monotonic()
+        with self._lock:
+            if self._dirty:
+                if now < self._retry_at:
+                    return self._key_area, self._ground_area
+            elif now < self._next_check:
+                return self._key_area, self._ground_area
+            self._dirty = False
+            self._next_check = now + RECHECK_INTERVAL
+
+        try:
+            # get() 检测到文件变化时会经由订阅回调更新区域；这里再显式写入一次，覆盖首次加载（无变化通知）的情况
+            self._on_magistrate_config(config_repo.get_magistrate_config(self.magistrate_id))
+            self._on_camera_settings(config_repo.get_camera_settings(self.magistrate_id))
+        except Exception:
+            logger.error_trace("OverlayAreas", f"Failed to load areas for magistrate {self.magistrate_id}")
+            with self._lock:
+                self._dirty = True
+                self._retry_at = time.monotonic() + RETRY_INTERVAL
+
+        with self._lock:
+            return self._key_area, self._ground_area
+
+    def _on_magistrate_config(self, cfg):
+        with self._lock:
+            if cfg is None:
+                self._dirty = True
+                self._retry_at = 0.0
+            else:
+                self._key_area = cfg.client_magistrate.key_area_settings.area
+
+    def _on_camera_settings(self, cfg):
+        with self._lock:
+            if cfg is None:
+                self._dirty = True
+                self._retry_at = 0.0
+            else:
+                self._ground_area = cfg.ground_coords
+
+    def close(self):
+        for unsubscribe in self._unsubscribe:
+            unsubscribe()
+        self._unsubscribe = []
+
+
+# magistrate_id -> OverlayAreas（FrameHub 重建时沿用同一份）
+_watchers: Dict[int, OverlayAreas] = {}
+_watchers_lock = threading.Lock()
+
+
+def get_overlay_areas(magistrate_id: int) -> OverlayAreas:
+    with _watchers_lock:
+        watcher = _watchers.get(magistrate_id)
+        if watcher is None:
+            watcher = OverlayAreas(magistrate_id)
+            _watchers[magistrate_id] = watcher
+        return watcher
@@ -0,0 +1,103 @@
+# app/utils/overlay_cache.py
+import threading
+from typing import Dict, Optional, Tuple
+
+import cv2
+import numpy as np
+
+from pyengine.utils import scale_utils
+from pyengine.visualization import polygon_drawer
+
+
+# 上游推送的原始画面尺寸（重点エリア / 床エリア坐标以此为基准）
+SRC_W, SRC_H = 800, 600
+
+
+def _freeze(points) -> Tuple[Tuple[float, float], ...]:
+    """把 YAML 读出的坐标列表转成可哈希的 tuple，作为缓存 key 的一部分。"""
+    if not points:
+        return ()
+    return tuple((float(p[0]), float(p[1])) for p in points)
+
+
+def draw_areas(frame_bgr: np.ndarray, key_area, ground_area, width: int, height: int) -> np.ndarray:
+    """在 width x height 的画面上绘制 床エリア（透视网格）与 重点エリア。"""
+    if ground_area and len(ground_area) == 4:
+        scaled_ground_area = scale_utils.scale_euler_pts(
+            src_width=SRC_W, src_height=SRC_H,
+            dst_width=width, dst_height=height,
+            points=ground_area
+        )
+        frame_bgr = polygon_drawer.fill_grid_area(
+            frame_bgr, scaled_ground_area,
+            color="#00AA00", transparency=0.15,
+            grid_rows=10, grid_cols=10, perspective=True, grid_line_color="#FFFFFF", grid_transparency=0.15
+        )
+
+    if key_area and len(key_area) == 4:
+        scaled_key_area = scale_utils.scale_euler_pts(
+            src_width=SRC_W, src_height=SRC_H,
+            dst_width=width, dst_height=height,
+            points=key_area
+        )
+        frame_bgr = polygon_drawer.fill_area(
+            frame_bgr, scaled_key_area,
+            color="#C1121F",
+            transparency=0.5,
+        )
+    return frame_bgr
+
+
+class OverlayLayer:
+    """
+    预先渲染好的叠加层。
+
+    polygon_drawer 的半透明绘制对每个像素都是 out = frame * (1 - a) + color * a 的形式，
+    因此分别在全黑 / 全白画面上绘制一次即可得到：
+      - premul = color * a              （全黑画面上的结果，预乘颜色）
+      - keep   = 255 * (1 - a)          （全白结果 - 全黑结果）
+    之后每帧只需一次向量化合成：out = frame * keep / 255 + premul。
+    """
+
+    def __init__(self, premul: np.ndarray, keep: np.ndarray):
+        self.premul = premul
+        self.keep = keep
+
+    @classmethod
+    def render(cls, key_area, ground_area, width: int, height: int) -> "OverlayLayer":
+        black = np.zeros((height, width, 3), dtype=np.uint8)
+        white = np.full((height, width, 3), 255, dtype=np.uint8)
+        on_black = draw_areas(black, key_area, ground_area, width, height)
+        on_white = draw_areas(white, key_area, ground_area, width, height)
+        keep = cv2.subtract(on_white, on_black)
+        return cls(premul=on_black, keep=keep)
+
+    def apply(self, frame_bgr: np.ndarray) -> np.ndarray:
+        """把叠加层合成到 frame_bgr 上（返回新数组，不修改输入）。"""
+        out = cv2.multiply(frame_bgr, self.keep, scale=1.0 / 255.0)
+        return cv2.add(out, self.premul)
+
+
+# (magistrate_id, width, height) -> (区域坐标 key, OverlayLayer)
+# 每个 magistrate/尺寸只保留最新一份；坐标变化（配置变更）时自动重新渲染。
+_layers: Dict[Tuple[int, int, int], Tuple[tuple, OverlayLayer]] = {}
+_layers_lock = threading.Lock()
+
+
+def get_overlay(magistrate_id: int, key_area, ground_area, width: int, height: int) -> Optional[OverlayLayer]:
+    """取得叠加层；两个区域都未设置时返回 None（无需合成）。"""
+    areas_key = (_freeze(key_area), _freeze(ground_area))
+    if not any(len(a) == 4 for a in areas_key):
+        return None
+
+    slot = (magistrate_id, width, height)
+    with _layers_lock:
+        cached = _layers.get(slot)
+        if cached is not None and cached[0] == areas_key:
+            return cached[1]
+
+    layer = OverlayLayer.render(key_area, ground_area, width, height)
+    with _layers_lock:
+        _layers[slot] = (areas_key, layer)
+    return layer
+
@@ -0,0 +1,147 @@
+# app/utils/profiler.py
+import collections
+import os
+import sys
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+
+# 采样间隔与单次采样的最长时间（秒）
+DEFAULT_INTERVAL_SEC = 0.005
+MAX_DURATION_SEC = 120.0
+
+# 栈帧所在文件只保留相对于仓库根目录的路径，让火焰图更易读
+_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def _frame_label(code) -> str:
+    filename = code.co_filename
+    if filename.startswith(_ROOT):
+        filename = os.path.relpath(filename, _ROOT)
+    else:
+        filename = os.path.basename(filename)
+    return f"{code.co_name} ({filename}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """
+    进程内的采样分析器：在后台线程中每隔 interval 秒读取一次所有线程的调用栈（sys._current_frames()），
+    持续 duration 秒。请求处理线程、MJPEG 生成器、FrameHub 工作线程与 asyncio 事件循环都在采样范围内，
+    不需要改动被分析的代码，停止后没有任何开销。
+
+    结果有两种格式：
+      - folded：每行 "线程;外层函数;...;内层函数 次数"，可直接交给 flamegraph.pl / speedscope；
+      - top：按函数统计 self / total 采样数（相当于 pstats 的 tottime / cumtime 排序）。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._stacks: Dict[Tuple[str, ...], int] = {}
+        self._samples = 0
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+        self._interval = DEFAULT_INTERVAL_SEC
+
+    def start(self, duration: float, interval: float = DEFAULT_INTERVAL_SEC) -> bool:
+        """开始采样；已经在采样中时返回 False（不会叠加两个采样线程）。"""
+        duration = max(0.1, min(float(duration), MAX_DURATION_SEC))
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive():
+                return False
+            self._stop.clear()
+            self._stacks = {}
+            self._samples = 0
+            self._interval = interval
+            self._started_at = time.time()
+            self._finished_at = None
+            self._thread = threading.Thread(target=self._run, args=(duration, ),
+                                            name="SamplingProfiler", daemon=True)
+            self._thread.start()
+        return True
+
+    def stop(self):
+        self._stop.set()
+
+    def running(self) -> bool:
+        with self._lock:
+            return self._thread is not None and self._thread.is_alive()
+
+    def status(self) -> dict:
+        with self._lock:
+            return {
+                "running": self._thread is not None and self._thread.is_alive(),
+                "started_at": self._started_at,
+                "finished_at": self._finished_at,
+                "samples": self._samples,
+                "interval_sec": self._interval,
+            }
+
+    def _run(self, duration: float):
+        me = threading.get_ident()
+        deadline = time.monotonic() + duration
+        stacks: Dict[Tuple[str, ...], int] = collections.Counter()
+        samples = 0
+        while not self._stop.is_set() and time.monotonic() < deadline:
+            names = {t.ident: t.name for t in threading.enumerate()}
+            for ident, frame in sys._current_frames().items():
+                if ident == me:
+                    continue
+                stack: List[str] = []
+                while frame is not None:
+                    stack.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                stack.append(names.get(ident, f"thread-{ident}"))
+                stacks[tuple(reversed(stack))] += 1
+            samples += 1
+            self._stop.wait(self._interval)
+
+        with self._lock:
+            self._stacks = dict(stacks)
+            self._samples = samples
+            self._finished_at = time.time()
+
+    # ------------------------------------------------------------------
+    # 报告
+    # ------------------------------------------------------------------
+
+    def folded(self) -> str:
+        with self._lock:
+            stacks = dict(self._stacks)
+        lines = [f"{';'.join(s.replace(';', ':') for s in stack)} {n}" for stack, n in stacks.items()]
+        return "\n".join(sorted(lines)) + "\n"
+
+    def top(self, limit: int = 40, include_idle: bool = False) -> str:
+        with self._lock:
+            stacks = dict(self._stacks)
+            samples = self._samples
+        self_counts: Dict[str, int] = collections.Counter()
+        total_counts: Dict[str, int] = collections.Counter()
+        for stack, n in stacks.items():
+            frames = stack[1:]  # 去掉线程名
+            if not frames:
+                continue
+            if not include_idle and _is_idle(frames[-1]):
+                continue
+            self_counts[frames[-1]] += n
+            for label in set(frames):
+                total_counts[label] += n
+
+        lines = [f"{samples} samples @ {self._interval * 1000:.1f} ms, all threads",
+                 f"{'self':>8} {'total':>8}  function"]
+        for label, total in sorted(total_counts.items(), key=lambda kv: (-self_counts[kv[0]], -kv[1]))[:limit]:
+            lines.append(f"{self_counts[label]:>8} {total:>8}  {label}")
+        return "\n".join(lines) + "\n"
+
+
+# 线程阻塞等待时停留的函数（Condition/Event.wait、selectors）：统计热点时默认排除
+_IDLE_FUNCTIONS = ("wait (", "select (", "poll (")
+
+
+def _is_idle(label: str) -> bool:
+    return label.startswith(_IDLE_FUNCTIONS)
+
+
+profiler = SamplingProfiler()
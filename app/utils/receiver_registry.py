@@ -0,0 +1,222 @@
+# app/utils/receiver_registry.py
+import threading
+from typing import AsyncIterator, Dict, Iterator, List, Optional, Tuple
+
+from app.utils import config_repo, file_utils, frame_hub
+from app.utils.frame_slot import FrameSource, PolledReceiverSlot
+from app.utils.inference_ingest import WildcardInferenceIngest
+from pyengine.io.network.mqtt_bus import MqttBus
+from pyengine.io.network.mqtt_plugins import MqttPluginManager
+from pyengine.io.network.plugins.inference_result_receiver import InferenceResultReceiverPlugin
+from pyengine.utils.logger import logger
+
+
+# 最后一个观看者离开后，保持订阅的宽限时间（秒）：页面刷新、切换档位时不必重新订阅
+DEFAULT_IDLE_GRACE_SEC = 30.0
+
+
+class ReceiverRegistry:
+    """
+    推論結果接收器的动态注册表。
+
+    - 可用的 magistrate 由 pipeline_config 的 client_pipeline.inferences 决定（config_repo.magistrate_ids()）；
+    - 接收器在第一次被请求时才创建并订阅 pipeline_inference_N，不请求的摄像头不产生订阅；
+    - 正在观看的 MJPEG 客户端通过 hold()/hold_async() 持有接收器；最后一个客户端离开后
+      经过 idle_grace_sec 仍无人持有，则取消订阅并移除（心跳订阅不受影响）；
+    - pipeline_config 变化后，已从配置中删除的摄像头的接收器会被停止并移除，其 FrameHub 一并关闭，
+      仍在观看的 MJPEG 流随之结束（不会无限等待已停止的接收器），客户端退出后照常释放持有计数。
+
+    每个接收器使用独立的 MqttPluginManager，可以单独启动/停止而不影响心跳等其它插件。
+    传入 ingest（WildcardInferenceIngest）时改为共用一个通配订阅：接收器即 ingest 的槽位，
+    已收到过消息的摄像头即使尚未写入 pipeline_config 也可观看。
+    """
+
+    def __init__(self, bus: MqttBus, idle_grace_sec: float = DEFAULT_IDLE_GRACE_SEC,
+                 ingest: Optional[WildcardInferenceIngest] = None):
+        self.bus = bus
+        self.idle_grace_sec = idle_grace_sec
+        self.ingest = ingest
+        self._lock = threading.Lock()
+        # magistrate_id -> (plugin manager（通配模式下为 None）, 接收器/槽位)
+        self._receivers: Dict[int, Tuple[Optional[MqttPluginManager], FrameSource]] = {}
+        self._holders: Dict[int, int] = {}
+        self._idle_timers: Dict[int, threading.Timer] = {}
+        self._config_version: Optional[int] = None
+
+    def magistrate_ids(self) -> List[int]:
+        ids = config_repo.magistrate_ids()
+        if self.ingest is not None:
+            ids = sorted(set(ids).union(self.ingest.seen_ids()))
+        return ids
+
+    def get(self, magistrate_id: int) -> Optional[FrameSource]:
+        """取得（必要时创建并订阅）指定 magistrate 的接收器；配置中不存在该 magistrate 时返回 None。"""
+        ids = self.magistrate_ids()
+        self._prune(ids)
+        if magistrate_id not in ids:
+            return None
+
+        with self._lock:
+            entry = self._receivers.get(magistrate_id)
+            if entry is not None:
+                return entry[1]
+
+            topic = f"{file_utils.INFERENCE_PREFIX}{magistrate_id}"
+            if self.ingest is not None:
+                pm = None
+                receiver = self.ingest.open(magistrate_id)
+            else:
+                pm = MqttPluginManager(self.bus)
+                plugin = InferenceResultReceiverPlugin(topic=topic)
+                pm.register(plugin)
+                pm.start()
+                receiver = PolledReceiverSlot(magistrate_id, plugin)
+            self._receivers[magistrate_id] = (pm, receiver)
+            logger.info("ReceiverRegistry", f"Subscribed to {topic}")
+            # 创建后若没有客户端来持有（例如请求被拒绝），宽限期后自动取消订阅
+            if not self._holders.get(magistrate_id):
+                self._schedule_idle_locked(magistrate_id)
+            return receiver
+
+    # ------------------------------------------------------------------
+    # 观看者持有计数
+    # ------------------------------------------------------------------
+
+    def acquire(self, magistrate_id: int):
+        with self._lock:
+            self._holders[magistrate_id] = self._holders.get(magistrate_id, 0) + 1
+            timer = self._idle_timers.pop(magistrate_id, None)
+        if timer is not None:
+            timer.cancel()
+
+    def release(self, magistrate_id: int):
+        with self._lock:
+            count = self._holders.get(magistrate_id, 0) - 1
+            if count > 0:
+                self._holders[magistrate_id] = count
+                return
+            self._holders.pop(magistrate_id, None)
+            if magistrate_id in self._receivers:
+                self._schedule_idle_locked(magistrate_id)
+
+    def hold(self, magistrate_id: int, frames: Iterator[bytes]) -> Iterator[bytes]:
+        """包装 MJPEG 生成器：开始输出时持有接收器，客户端断开（close）时释放。"""
+        self.acquire(magistrate_id)
+        try:
+            yield from frames
+        finally:
+            frames.close()
+            self.release(magistrate_id)
+
+    async def hold_async(self, magistrate_id: int, frames: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+        """hold() 的异步版本。"""
+        self.acquire(magistrate_id)
+        try:
+            async for chunk in frames:
+                yield chunk
+        finally:
+            await frames.aclose()
+            self.release(magistrate_id)
+
+    def _schedule_idle_locked(self, magistrate_id: int):
+        old = self._idle_timers.pop(magistrate_id, None)
+        if old is not None:
+            old.cancel()
+        timer = threading.Timer(self.idle_grace_sec, self._expire, args=(magistrate_id, ))
+        timer.daemon = True
+        self._idle_timers[magistrate_id] = timer
+        timer.start()
+
+    def _expire(self, magistrate_id: int):
+        with self._lock:
+            timer = self._idle_timers.get(magistrate_id)
+            if timer is None or timer is not threading.current_thread():
+                # 宽限期内又有人持有（计时器已取消或被替换）
+                return
+            del self._idle_timers[magistrate_id]
+            if self._holders.get(magistrate_id):
+                return
+            entry = self._receivers.pop(magistrate_id, None)
+        if entry is not None:
+            self._stop(entry[0], magistrate_id)
+
+    def active_ids(self) -> List[int]:
+        """当前已创建接收器（正在订阅）的 magistrate 编号。"""
+        with self._lock:
+            return sorted(self._receivers)
+
+    def frame_stats(self) -> Dict[int, dict]:
+        """正在订阅的各摄像头的帧流水线计数（FrameCounters.snapshot()）。"""
+        with self._lock:
+            entries = list(self._receivers.items())
+        return {mid: receiver.counters.snapshot() for mid, (_, receiver) in sorted(entries)}
+
+    def stats(self) -> Dict[int, dict]:
+        """正在订阅的 magistrate -> 持有中的客户端数、是否处于宽限期。"""
+        with self._lock:
+            return {
+                mid: {"holders": self._holders.get(mid, 0), "idle": mid in self._idle_timers}
+                for mid in sorted(self._receivers)
+            }
+
+    def _prune(self, ids: List[int]):
+        # 配置未变化时无需检查
+        version = config_repo.version()
+        if version == self._config_version:
+            return
+        with self._lock:
+            self._config_version = version
+            removed = [mid for mid in self._receivers if mid not in ids]
+            entries = [self._receivers.pop(mid) for mid in removed]
+            for mid in removed:
+                timer = self._idle_timers.pop(mid, None)
+                if timer is not None:
+                    timer.cancel()
+        for mid, (pm, _) in zip(removed, entries):
+            self._stop(pm, mid)
+            frame_hub.close_frame_hub(mid)
+
+    def _stop(self, pm: Optional[MqttPluginManager], magistrate_id: int):
+        try:
+            if pm is None:
+                self.ingest.close(magistrate_id)
+            else:
+                pm.stop()
+            logger.info("ReceiverRegistry", f"Unsubscribed from {file_utils.INFERENCE_PREFIX}{magistrate_id}")
+        except Exception:
+            logger.error_trace("ReceiverRegistry", f"Failed to stop receiver for magistrate {magistrate_id}")
+
+    def stop_all(self):
+        with self._lock:
+            entries = list(self._receivers.items())
+            self._receivers.clear()
+            for timer in self._idle_timers.values():
+                timer.cancel()
+            self._idle_timers.clear()
+        for mid, (pm, _) in entries:
+            self._stop(pm, mid)
+        if self.ingest is not None:
+            self.ingest.stop()
+
+
+def get_receiver(config, magistrate_id: int) -> Optional[FrameSource]:
+    """从 app.config 中的注册表（"receivers"）取得接收器；MQTT 未启动时返回 None。"""
+    registry: Optional[ReceiverRegistry] = config.get("receivers")
+    if registry is None:
+        return None
+    return registry.get(magistrate_id)
+
+
+def hold_frames(config, magistrate_id: int, frames: Iterator[bytes]) -> Iterator[bytes]:
+    """由 app.config 中的注册表持有接收器（没有注册表时原样返回 frames）。"""
+    registry: Optional[ReceiverRegistry] = config.get("receivers")
+    if registry is None:
+        return frames
+    return registry.hold(magistrate_id, frames)
+
+
+def hold_frames_async(config, magistrate_id: int, frames: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    registry: Optional[ReceiverRegistry] = config.get("receivers")
+    if registry is None:
+        return frames
+    return registry.hold_async(magistrate_id, frames)
@@ -0,0 +1,138 @@
+# app/utils/status_stream.py
+import json
+import threading
+import time
+from typing import Callable, Dict, Optional, Tuple
+
+from pyengine.utils.logger import logger
+
+
+# 后台线程检查心跳状态变化的间隔（秒）；状态变化最迟在该时间后推送到浏览器
+STATUS_POLL_INTERVAL = 0.5
+
+# 没有状态变化时发送 SSE 注释行维持连接的间隔（秒）
+DEFAULT_KEEPALIVE_SEC = 15.0
+
+# 浏览器断线后 EventSource 自动重连的等待时间（毫秒）
+RECONNECT_DELAY_MS = 3000
+
+# 渲染函数返回：元素 id -> (swap 方式, HTML)
+Fragments = Dict[str, Tuple[str, str]]
+
+
+class StatusBroadcaster:
+    """
+    仪表盘状态的 Server-Sent Events 广播器。
+
+    心跳插件没有状态变化的回调，因此这里仍是服务器端轮询：一个后台线程按 STATUS_POLL_INTERVAL
+    取一次 fingerprint()（只读取状态，不渲染），与上一次不同时才调用 render()，再与上一次结果逐个元素比较，
+    只把发生变化的片段推送给所有已连接的浏览器；浏览器不再各自轮询，状态不变时没有任何输出。
+    render() 结果中不再出现的元素（摄像头已从配置中删除）从缓存中移除。
+    新连接先收到全部片段，之后只收到增量。没有订阅者时线程挂起。
+    """
+
+    def __init__(self, render: Callable[[], Fragments], poll_interval: float = STATUS_POLL_INTERVAL,
+                 fingerprint: Optional[Callable[[], str]] = None):
+        self.render = render
+        self.poll_interval = poll_interval
+        self.fingerprint = fingerprint
+        self._last_fingerprint: Optional[str] = None
+
+        self._lock = threading.Lock()
+        self._changed = threading.Condition(self._lock)
+        self._wakeup = threading.Event()
+        self._subscribers = 0
+        self._worker: Optional[threading.Thread] = None
+
+        # 元素 id -> 已编码好的 SSE data（JSON），以及该元素最后一次变化时的序号
+        self._payloads: Dict[str, str] = {}
+        self._versions: Dict[str, int] = {}
+        self._seq = 0
+
+    # ------------------------------------------------------------------
+    # 订阅管理
+    # ------------------------------------------------------------------
+
+    def _attach(self):
+        with self._lock:
+            self._subscribers += 1
+            if self._worker is None or not self._worker.is_alive():
+                self._worker = threading.Thread(target=self._run, name="status-stream", daemon=True)
+                self._worker.start()
+        self._wakeup.set()
+
+    def _detach(self):
+        with self._lock:
+            self._subscribers -= 1
+            if self._subscribers <= 0:
+                self._subscribers = 0
+                self._wakeup.clear()
+
+    def subscriber_count(self) -> int:
+        with self._lock:
+            return self._subscribers
+
+    def stream(self, keepalive_sec: float = DEFAULT_KEEPALIVE_SEC):
+        """
+        text/event-stream 生成器。每个变化的元素输出一条 `event: status` 消息，
+        data 为 {"target": 元素 id, "swap": "outerHTML"/"innerHTML", "html": 片段}。
+        客户端断开时 WSGI 服务器会 close() 生成器，finally 中自动解除订阅。
+        """
+        self._attach()
+        try:
+            yield f"retry: {RECONNECT_DELAY_MS}\n\n"
+            last_seq = 0
+            while True:
+                with self._changed:
+                    if not self._changed.wait_for(lambda: self._seq > last_seq, timeout=keepalive_sec):
+                        changed = None
+                    else:
+                        changed = [self._payloads[k] for k, v in self._versions.items() if v > last_seq]
+                        last_seq = self._seq
+                if changed is None:
+                    yield ": keepalive\n\n"
+                    continue
+                yield "".join(f"event: status\ndata: {payload}\n\n" for payload in changed)
+        finally:
+            self._detach()
+
+    # ------------------------------------------------------------------
+    # 工作线程
+    # ------------------------------------------------------------------
+
+    def _run(self):
+        while True:
+            # 无订阅者时挂起，直到有新的浏览器接入
+            self._wakeup.wait()
+
+            try:
+                stamp = self.fingerprint() if self.fingerprint is not None else None
+                if stamp is not None and stamp == self._last_fingerprint:
+                    time.sleep(self.poll_interval)
+                    continue
+                fragments = self.render()
+            except Exception:
+                logger.error_trace("StatusBroadcaster", "Failed to render status fragments")
+                time.sleep(self.poll_interval)
+                continue
+            self._last_fingerprint = stamp
+
+            with self._changed:
+                seq = self._seq + 1
+                changed = False
+                # 不再渲染的元素：丢弃缓存，新连接不会再收到它们
+                for element_id in [k for k in self._payloads if k not in fragments]:
+                    del self._payloads[element_id]
+                    del self._versions[element_id]
+                for element_id, (swap, html) in fragments.items():
+                    payload = json.dumps({"target": element_id, "swap": swap, "html": html.strip()},
+                                         ensure_ascii=False)
+                    if self._payloads.get(element_id) != payload:
+                        self._payloads[element_id] = payload
+                        self._versions[element_id] = seq
+                        changed = True
+                if changed:
+                    self._seq = seq
+                    self._changed.notify_all()
+
+            time.sleep(self.poll_interval)
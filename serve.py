@@ -0,0 +1,80 @@
+"""
+生产环境入口（无 debug / reloader）。
+
+    python serve.py
+
+环境变量：
+  RESTFUL_SERVER          waitress（默认，多线程 WSGI）或 uvicorn（ASGI：MJPEG 帧流走协程，见 app.asgi）
+  RESTFUL_HOST            监听地址（默认 0.0.0.0）
+  RESTFUL_PORT            监听端口（默认 5000）
+  RESTFUL_THREADS         普通请求（htmx 片段、配置保存等）使用的线程数（默认 8）
+  RESTFUL_STREAM_THREADS  MJPEG / SSE 长连接最多占用的线程数（默认 16）
+  RESTFUL_OUTBUF_HIGH_WATERMARK
+                          waitress 每个连接的输出缓冲上限（字节，默认 262144 ≈ 两帧 640x480 JPEG）
+
+服务器线程数 = RESTFUL_THREADS + RESTFUL_STREAM_THREADS；长连接超出上限时返回 503，
+不会挤占普通请求的线程（见 app.serving.StreamSlotMiddleware）。
+uvicorn 模式下 MJPEG 帧流不占线程，RESTFUL_STREAM_THREADS 只约束 SSE 状态推送。
+
+MJPEG 的自适应档位按“yield 一帧到下次恢复执行”的耗时判断客户端快慢（见 frame_hub._StreamClient）。
+waitress 默认缓冲到 16 MB 才阻塞写入，慢客户端在那之前看起来和快客户端一样，
+所以这里把输出缓冲压到约两帧：缓冲满后写入阻塞，背压才会反映到写出耗时上。
+"""
+import os
+
+from app import create_app
+from app.serving import StreamSlotMiddleware
+from app.utils import config_repo, file_utils
+
+
+# waitress 单连接输出缓冲的上限（字节）：约两帧 640x480 q95 的 JPEG
+DEFAULT_OUTBUF_HIGH_WATERMARK = 256 * 1024
+
+def main():
+    # 拷贝文件
+    file_utils.copy_configs(
+        src_folder="/opt/SurveillanceService/configs",
+        dest_folder="/opt/SurveillanceServiceRestful/configs",
+        default_folder="/opt/SurveillanceServiceRestful/configs/defaults",
+        overwrite=False,   # 不覆盖
+    )
+
+    # 预先解析全部配置文件路径，之后的请求直接命中缓存
+    file_utils.preresolve_configs(config_repo.magistrate_ids())
+
+    # 单进程：MQTT 在 app factory 中启动一次
+    app = create_app(start_mqtt=True)
+
+    host = os.environ.get("RESTFUL_HOST", "0.0.0.0")
+    port = int(os.environ.get("RESTFUL_PORT", "5000"))
+    threads = int(os.environ.get("RESTFUL_THREADS", "8"))
+    stream_threads = int(os.environ.get("RESTFUL_STREAM_THREADS", "16"))
+    outbuf_high_watermark = int(os.environ.get("RESTFUL_OUTBUF_HIGH_WATERMARK", str(DEFAULT_OUTBUF_HIGH_WATERMARK)))
+
+    wsgi_app = StreamSlotMiddleware(app, max_streams=stream_threads)
+
+    if os.environ.get("RESTFUL_SERVER", "waitress") == "uvicorn":
+        import uvicorn
+        from app.asgi import FrameStreamingASGI
+
+        uvicorn.run(
+            FrameStreamingASGI(app, wsgi_app, workers=threads + stream_threads),
+            host=host,
+            port=port,
+            lifespan="off",
+        )
+        return
+
+    from waitress import serve
+    serve(
+        wsgi_app,
+        host=host,
+        port=port,
+        threads=threads + stream_threads,
+        channel_timeout=120,
+        outbuf_high_watermark=outbuf_high_watermark,
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,26 @@
+import os
+import shutil
+
+import pytest
+
+DEFAULT_CONFIGS = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "configs", "defaults")
+
+
+@pytest.fixture
+def config_tree(tmp_path, monkeypatch):
+    """把 configs/defaults 拷贝到临时目录，并让 file_utils.get_config() 只解析到这里。"""
+    pytest.importorskip("pyengine")
+    folder = tmp_path / "configs"
+    shutil.copytree(DEFAULT_CONFIGS, folder)
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("RESTFUL_CONFIG_DIR", str(folder))
+    return folder
+
+
+@pytest.fixture
+def client(config_tree):
+    from app import create_app
+
+    app = create_app(start_mqtt=False)
+    app.config["TESTING"] = True
+    return app.test_client()
@@ -0,0 +1,171 @@
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pyengine")
+
+from app.utils import config_writer, file_utils  # noqa: E402
+from app.utils.config_repo import ConfigRepository  # noqa: E402
+
+
+def _read(path):
+    with open(path) as f:
+        return f.read()
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def config_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(file_utils, "get_config", lambda name, *args, **kwargs: str(tmp_path / f"{name}.yaml"))
+    monkeypatch.setattr(config_writer, "writer", config_writer.ConfigWriteBehind(window=0.01))
+    (tmp_path / "demo.yaml").write_text("0")
+    return tmp_path
+
+
+def test_get_returns_cached_snapshot_until_file_changes(config_dir):
+    loads = []
+
+    def loader(path):
+        loads.append(path)
+        return _read(path)
+
+    repo = ConfigRepository()
+    assert repo.get("demo", loader) == "0"
+    assert repo.get("demo", loader) == "0"
+    assert len(loads) == 1
+
+    time.sleep(0.01)
+    (config_dir / "demo.yaml").write_text("external")
+    assert repo.get("demo", loader) == "external"
+    assert len(loads) == 2
+
+
+def test_invalidate_reloads_and_notifies_none(config_dir):
+    repo = ConfigRepository()
+    seen = []
+    repo.subscribe("demo", seen.append)
+    assert repo.get("demo", _read) == "0"
+    version = repo.version
+    repo.invalidate("demo")
+    assert repo.version > version
+    assert seen[-1] is None
+    assert repo.get("demo", _read) == "0"
+    assert seen[-1] == "0"
+
+
+def test_overlapping_saves_never_fall_back_to_older_snapshot(config_dir):
+    gates = {"A": threading.Event(), "B": threading.Event()}
+    started = {"A": threading.Event(), "B": threading.Event()}
+
+    def saver(path, cfg):
+        started[cfg].set()
+        assert gates[cfg].wait(5)
+        with open(path, "w") as f:
+            f.write(cfg)
+
+    repo = ConfigRepository()
+    seen = []
+    repo.subscribe("demo", seen.append)
+    assert repo.get("demo", _read) == "0"
+
+    repo.save("demo", "A", saver, durable=False)
+    assert started["A"].wait(2)
+    repo.save("demo", "B", saver, durable=False)
+
+    # A 落盘、B 仍在等待：磁盘上是 A，读取必须继续看到 B
+    gates["A"].set()
+    _wait_until(lambda: _read(config_dir / "demo.yaml") == "A")
+    assert started["B"].wait(2)
+    for _ in range(20):
+        assert repo.get("demo", _read) == "B"
+
+    gates["B"].set()
+    _wait_until(lambda: _read(config_dir / "demo.yaml") == "B")
+    _wait_until(lambda: not repo._pending_writes)
+    assert repo.get("demo", _read) == "B"
+    assert seen[seen.index("B"):] == ["B"]
+
+
+def test_failed_write_drops_snapshot(config_dir):
+    def saver(path, cfg):
+        raise OSError("disk full")
+
+    repo = ConfigRepository()
+    assert repo.get("demo", _read) == "0"
+    with pytest.raises(OSError):
+        repo.save("demo", "lost", saver, durable=True)
+    assert repo.get("demo", _read) == "0"
+
+
+def test_slow_load_does_not_block_other_configs(config_dir):
+    (config_dir / "slow.yaml").write_text("slow")
+    release = threading.Event()
+    entered = threading.Event()
+
+    def slow_loader(path):
+        entered.set()
+        assert release.wait(5)
+        return _read(path)
+
+    repo = ConfigRepository()
+    worker = threading.Thread(target=repo.get, args=("slow", slow_loader))
+    worker.start()
+    try:
+        assert entered.wait(2)
+        started = time.monotonic()
+        assert repo.get("demo", _read) == "0"
+        assert time.monotonic() - started < 1.0
+    finally:
+        release.set()
+        worker.join(5)
+
+
+def test_concurrent_gets_parse_once(config_dir):
+    loads = []
+
+    def loader(path):
+        loads.append(path)
+        time.sleep(0.05)
+        return _read(path)
+
+    repo = ConfigRepository()
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(repo.get("demo", loader))) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join(5)
+    assert results == ["0"] * 4
+    assert len(loads) == 1
+
+
+def test_save_during_load_is_not_overwritten(config_dir):
+    release = threading.Event()
+    entered = threading.Event()
+
+    def slow_loader(path):
+        entered.set()
+        assert release.wait(5)
+        return _read(path)
+
+    def saver(path, cfg):
+        with open(path, "w") as f:
+            f.write(cfg)
+
+    repo = ConfigRepository()
+    results = []
+    worker = threading.Thread(target=lambda: results.append(repo.get("demo", slow_loader)))
+    worker.start()
+    assert entered.wait(2)
+    repo.save("demo", "saved", saver, durable=True)
+    release.set()
+    worker.join(5)
+    assert results == ["saved"]
+    assert repo.get("demo", _read) == "saved"
@@ -0,0 +1,101 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyengine")
+
+from app.utils import config_writer, file_utils  # noqa: E402
+from app.utils.config_writer import ConfigWriteBehind  # noqa: E402
+
+
+def _write_text(calls):
+    def saver(path, cfg):
+        calls.append(cfg)
+        with open(path, "w") as f:
+            f.write(cfg)
+    return saver
+
+
+def test_writes_within_window_are_coalesced(tmp_path):
+    path = str(tmp_path / "demo.yaml")
+    calls = []
+    writer = ConfigWriteBehind(window=0.05)
+    for cfg in ("a", "b", "c"):
+        pending = writer.submit("demo", path, cfg, _write_text(calls))
+    writer.wait(pending, timeout=5)
+    assert calls == ["c"]
+    with open(path) as f:
+        assert f.read() == "c"
+
+
+def test_on_written_receives_final_stamp(tmp_path):
+    path = str(tmp_path / "demo.yaml")
+    stamps = []
+    writer = ConfigWriteBehind(window=0.01)
+    pending = writer.submit("demo", path, "x", _write_text([]), on_written=stamps.append)
+    writer.wait(pending, timeout=5)
+    st = os.stat(path)
+    assert stamps == [(st.st_mtime_ns, st.st_size)]
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_flush_writes_immediately(tmp_path):
+    path = str(tmp_path / "demo.yaml")
+    writer = ConfigWriteBehind(window=60)
+    pending = writer.submit("demo", path, "now", _write_text([]))
+    writer.flush()
+    assert pending.done.is_set()
+    with open(path) as f:
+        assert f.read() == "now"
+
+
+def test_failed_write_raises_from_wait_and_keeps_original(tmp_path):
+    path = tmp_path / "demo.yaml"
+    path.write_text("original")
+    failures = []
+    written = []
+
+    def saver(tmp, cfg):
+        with open(tmp, "w") as f:
+            f.write("half")
+        raise OSError("disk full")
+
+    writer = ConfigWriteBehind(window=0.01)
+    pending = writer.submit("demo", str(path), "new", saver, on_written=written.append, on_failed=failures.append)
+    with pytest.raises(OSError):
+        writer.wait(pending, timeout=5)
+    assert written == [] and len(failures) == 1
+    assert path.read_text() == "original"
+    assert not os.path.exists(f"{path}.tmp")
+
+
+def test_sync_copies_once_per_batch(tmp_path, monkeypatch):
+    copied = []
+    monkeypatch.setattr(file_utils, "copy_single_config", copied.append)
+    path = str(tmp_path / "demo.yaml")
+    writer = ConfigWriteBehind(window=0.05)
+    writer.submit("demo", path, "a", _write_text([]), sync=True)
+    pending = writer.submit("demo", path, "b", _write_text([]))
+    writer.wait(pending, timeout=5)
+    assert copied == ["demo"]
+
+
+def test_wait_times_out(tmp_path):
+    writer = ConfigWriteBehind(window=60)
+    pending = writer.submit("demo", str(tmp_path / "demo.yaml"), "x", _write_text([]))
+    with pytest.raises(TimeoutError):
+        writer.wait(pending, timeout=0.01)
+    writer.flush()
+
+
+def test_durable_requested_reads_header_and_query():
+    from flask import Flask
+
+    app = Flask(__name__)
+    with app.test_request_context(headers={"X-Durable-Write": "1"}):
+        assert config_writer.durable_requested()
+    with app.test_request_context("/?durable=1"):
+        assert config_writer.durable_requested()
+    with app.test_request_context("/"):
+        assert not config_writer.durable_requested()
+    assert not config_writer.durable_requested()
@@ -0,0 +1,53 @@
+from types import SimpleNamespace
+
+import cv2
+import numpy as np
+
+from app.utils import frame_codec
+
+
+def _jpeg_msg(w=32, h=24):
+    ok, buf = cv2.imencode(".jpg", np.zeros((h, w, 3), np.uint8))
+    assert ok
+    return SimpleNamespace(frame_width=w, frame_height=h, frame_channels=3, frame_raw_data=buf.tobytes())
+
+
+class _CountingMsg:
+    """记录 frame_raw_data 被读取的次数。"""
+
+    def __init__(self, msg):
+        self._msg = msg
+        self.reads = 0
+
+    def __getattr__(self, name):
+        if name == "frame_raw_data":
+            self.reads += 1
+        return getattr(self._msg, name)
+
+
+def test_jpeg_passthrough_returns_payload_object():
+    frame_codec.reset_decode_stats()
+    msg = _jpeg_msg()
+    view = frame_codec.payload_view(msg)
+    jpg = frame_codec.jpeg_payload(msg, view=view)
+    assert jpg is msg.frame_raw_data
+    assert frame_codec.decode_stats()["jpeg_passthrough"] == 1
+
+
+def test_shared_view_reads_payload_once():
+    msg = _CountingMsg(_jpeg_msg())
+    view = frame_codec.payload_view(msg)
+    frame_codec.jpeg_payload(msg, view=view)
+    frame = frame_codec.decode_frame(msg, view=view)
+    assert frame is not None and frame.shape == (24, 32, 3)
+    assert msg.reads == 1
+
+
+def test_raw_pixels_are_a_view_of_the_payload():
+    frame_codec.reset_decode_stats()
+    pixels = np.arange(4 * 6 * 3, dtype=np.uint8)
+    msg = SimpleNamespace(frame_width=6, frame_height=4, frame_channels=3, frame_raw_data=pixels.tobytes())
+    frame = frame_codec.decode_frame(msg)
+    assert frame.shape == (4, 6, 3)
+    assert not frame.flags.writeable
+    assert frame_codec.decode_stats()["raw"] == 1
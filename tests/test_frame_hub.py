@@ -0,0 +1,93 @@
+import asyncio
+import threading
+import time
+
+import numpy as np
+import pytest
+
+pytest.importorskip("pyengine")
+
+from app.utils.frame_hub import FrameHub, StreamVariant  # noqa: E402
+from app.utils.frame_slot import LatestFrameSlot  # noqa: E402
+
+WIDTH, HEIGHT = 8, 6
+
+
+class _RawFrame:
+    """ParseFromString 直接把负载当作 BGR 原始像素。"""
+
+    def ParseFromString(self, payload):
+        self.frame_width = WIDTH
+        self.frame_height = HEIGHT
+        self.frame_channels = 3
+        self.frame_raw_data = payload
+
+
+def _payload(value=0):
+    return np.full((HEIGHT, WIDTH, 3), value, np.uint8).tobytes()
+
+
+def _wait_until(predicate, timeout=5.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def hub():
+    hub = FrameHub(99, LatestFrameSlot(99, _RawFrame))
+    yield hub
+    hub.close()
+
+
+def test_same_variant_is_encoded_once_for_all_subscribers(hub):
+    variant = StreamVariant(4, 4, False)
+    streams = [hub.stream(variant, adaptive=False) for _ in range(2)]
+    chunks = []
+    threads = [threading.Thread(target=lambda s=s: chunks.append(next(s))) for s in streams]
+    for t in threads:
+        t.start()
+    _wait_until(lambda: hub.subscriber_count() == 2)
+
+    hub.receiver.put(_payload())
+    for t in threads:
+        t.join(5)
+    assert len(chunks) == 2 and chunks[0] == chunks[1]
+    snap = hub.receiver.counters.snapshot()
+    assert snap["decoded"] == 1 and snap["encoded"] == 1
+
+    for s in streams:
+        s.close()
+    assert hub.subscriber_count() == 0
+
+
+def test_close_ends_sync_stream(hub):
+    finished = threading.Event()
+
+    def consume():
+        for _ in hub.stream(StreamVariant(4, 4, False), adaptive=False):
+            pass
+        finished.set()
+
+    threading.Thread(target=consume, daemon=True).start()
+    _wait_until(lambda: hub.subscriber_count() == 1)
+    hub.close()
+    assert finished.wait(2)
+    assert hub.subscriber_count() == 0
+
+
+def test_close_ends_async_stream(hub):
+    async def consume():
+        async for _ in hub.stream_async(StreamVariant(4, 4, False), adaptive=False):
+            pass
+
+    async def main():
+        task = asyncio.ensure_future(consume())
+        while hub.subscriber_count() == 0:
+            await asyncio.sleep(0.005)
+        threading.Thread(target=hub.close).start()
+        await asyncio.wait_for(task, 2)
+
+    asyncio.run(main())
+    assert hub.subscriber_count() == 0
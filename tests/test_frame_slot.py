@@ -0,0 +1,55 @@
+import threading
+import time
+
+from app.utils.frame_slot import LatestFrameSlot, PolledReceiverSlot
+
+
+class _Message:
+    def ParseFromString(self, payload):
+        self.payload = payload
+
+
+def test_put_wakes_waiting_worker():
+    slot = LatestFrameSlot(1, _Message)
+    woke = []
+
+    def worker():
+        started = time.monotonic()
+        woke.append((slot.wait(5.0), time.monotonic() - started))
+
+    t = threading.Thread(target=worker)
+    t.start()
+    time.sleep(0.05)
+    slot.put(b"frame")
+    t.join(2)
+    assert woke and woke[0][0] is True and woke[0][1] < 1.0
+    assert slot.take().payload == b"frame"
+
+
+def test_wait_times_out_without_frames():
+    slot = LatestFrameSlot(1, _Message)
+    assert slot.wait(0.01) is False
+
+
+def test_overwritten_frame_counts_as_dropped():
+    slot = LatestFrameSlot(1, _Message)
+    slot.put(b"a")
+    slot.put(b"b")
+    assert slot.take().payload == b"b"
+    assert slot.take() is None
+    snap = slot.counters.snapshot()
+    assert snap["received"] == 2 and snap["dropped_stale"] == 1
+
+
+def test_polled_slot_reports_dropped_as_unavailable():
+    class Plugin:
+        msg = object()
+
+        def read(self):
+            return self.msg
+
+    slot = PolledReceiverSlot(1, Plugin())
+    assert slot.take() is not None
+    assert slot.take() is None
+    assert slot.wait(1.0) is False
+    assert slot.counters.snapshot()["dropped_stale"] is None
@@ -0,0 +1,38 @@
+import numpy as np
+
+from app.utils import ground_utils
+
+
+def _cameras(n):
+    return dict(
+        camera_height=np.full(n, 300.0),
+        roll_angle=np.zeros(n),
+        pitch_angle=np.full(n, -45.0),
+        yaw_angle=np.zeros(n),
+        focal_length=np.full((n, 2), 800.0),
+        principal_coord=np.tile([400.0, 300.0], (n, 1)),
+    )
+
+
+def test_batch_with_all_empty_point_sets_returns_zeros():
+    pts = ground_utils.pad_point_sets([[], []])
+    assert pts.shape == (2, 0, 2)
+
+    dims = ground_utils.calculate_ground_dimensions_batch(ground_coords=pts, **_cameras(2))
+
+    assert dims.shape == (2, 2)
+    assert np.array_equal(dims, np.zeros((2, 2)))
+
+
+def test_batch_mixes_empty_and_calibrated_cameras():
+    quad = [[100, 300], [500, 300], [600, 470], [20, 470]]
+    pts = ground_utils.pad_point_sets([quad, []])
+
+    dims = ground_utils.calculate_ground_dimensions_batch(ground_coords=pts, **_cameras(2))
+
+    single = ground_utils.calculate_ground_dimensions(
+        camera_height=300, roll_angle=0, pitch_angle=-45, yaw_angle=0,
+        focal_length=[800, 800], principal_coord=[400, 300], ground_coords=quad,
+    )
+    assert np.allclose(dims[0], single)
+    assert np.array_equal(dims[1], [0.0, 0.0])
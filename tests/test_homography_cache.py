@@ -0,0 +1,32 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("pyengine")
+
+from app.utils import config_repo, homography_cache  # noqa: E402
+
+
+def test_matrix_is_cached_until_ground_changes(config_tree):
+    corner = np.array([[100.0, 100.0]])
+    first = homography_cache.get_homography(1)
+    assert first is not None
+    assert not first.flags.writeable
+    assert homography_cache.get_homography(1) is first
+    before = homography_cache.project_to_ground(1, corner)
+
+    # save_camera 直接更新快照：下一次读取按新的长度重新计算，无需显式失效
+    cam = config_repo.edit_camera_settings(1)
+    cam.ground_x_length_calculated *= 2
+    config_repo.save_camera(1, cam, durable=True)
+    assert homography_cache.get_homography(1) is not first
+    after = homography_cache.project_to_ground(1, corner)
+    assert after[0, 0] > before[0, 0] * 1.5
+    assert after[0, 1] == pytest.approx(before[0, 1])
+
+
+def test_uncalibrated_camera_returns_none(config_tree):
+    cam = config_repo.edit_camera_settings(1)
+    cam.ground_coords = []
+    config_repo.save_camera(1, cam, durable=True)
+    assert homography_cache.get_homography(1) is None
+    assert homography_cache.project_to_ground(1, np.array([[1.0, 1.0]])) is None
@@ -0,0 +1,44 @@
+import os
+
+import pytest
+
+pytest.importorskip("pyengine")
+
+from app.utils import overlay_areas  # noqa: E402
+
+
+@pytest.fixture
+def areas(config_tree, monkeypatch):
+    monkeypatch.setattr(overlay_areas, "RECHECK_INTERVAL", 0.0)
+    watcher = overlay_areas.OverlayAreas(1)
+    yield watcher
+    watcher.close()
+
+
+def _edit_outside_app(path, old, new):
+    text = path.read_text()
+    path.write_text(text.replace(old, new))
+    st = os.stat(path)
+    # 保证 mtime 变化（部分文件系统的时间戳精度较粗）
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 1_000_000_000))
+
+
+def test_external_yaml_edit_is_picked_up(config_tree, areas):
+    key_area, _ = areas.areas()
+    assert [300, 300] in [list(p) for p in key_area]
+
+    _edit_outside_app(config_tree / "magistrate_config1.yaml", "300", "400")
+    key_area, _ = areas.areas()
+    assert [400, 400] in [list(p) for p in key_area]
+
+
+def test_unchanged_files_are_not_reparsed(config_tree, areas, monkeypatch):
+    from app.utils import config_repo
+
+    areas.areas()
+    loads = []
+    original = config_repo.load_magistrate_config
+    monkeypatch.setattr(config_repo, "load_magistrate_config", lambda path: loads.append(path) or original(path))
+    for _ in range(5):
+        areas.areas()
+    assert loads == []
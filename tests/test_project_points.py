@@ -0,0 +1,40 @@
+import numpy as np
+import pytest
+
+URL = "/panel/keyarea/1/project"
+
+
+@pytest.mark.parametrize("body", [
+    [[1, 2]],
+    {"points": [[1, 2, 3], [4, 5, 6]]},
+    {"points": [1, 2, 3, 4]},
+    {"points": [[1, 2], [3]]},
+    {"points": [["a", "b"]]},
+    {"boxes": [[0, 0, 10]]},
+    {"boxes": [0, 0, 10, 10]},
+])
+def test_malformed_points_and_boxes_are_rejected(client, body):
+    assert client.post(URL, json=body).status_code == 400
+
+
+def test_points_and_boxes_are_projected(client):
+    resp = client.post(URL, json={"points": [[10, 10]], "boxes": [[0, 0, 20, 40]]})
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert len(data["points"]) == 1 and len(data["points"][0]) == 2
+    assert len(data["boxes"]) == 1 and len(data["boxes"][0]) == 2
+
+
+def test_points_beyond_horizon_are_null(client, monkeypatch):
+    from app.utils import homography_cache
+
+    # w = v - 100：v == 100 的点落在地平线上（除以 0）
+    matrix = np.array([[1.0, 0.0, 0.0], [0.0, 1.0, 0.0], [0.0, 1.0, -100.0]])
+    monkeypatch.setattr(homography_cache, "get_homography", lambda magistrate_id: matrix)
+
+    resp = client.post(URL, json={"points": [[5, 100], [500, 200]]})
+    assert resp.status_code == 200
+    assert b"Infinity" not in resp.data and b"NaN" not in resp.data
+    points = resp.get_json()["points"]
+    assert points[0] is None
+    assert points[1] == [5.0, 2.0]
@@ -0,0 +1,26 @@
+import pytest
+
+
+@pytest.mark.parametrize("url", ["/get-magistrate-grid", "/get-pipeline-indicator"])
+def test_unchanged_fragment_returns_304(client, url):
+    first = client.get(url)
+    assert first.status_code == 200
+    etag = first.headers["ETag"]
+    assert etag.startswith("W/")
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get(url, headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["HX-Reswap"] == "none"
+    assert again.headers["ETag"] == etag
+    assert again.data == b""
+
+
+def test_config_change_invalidates_etag(client):
+    from app.utils import config_repo
+
+    etag = client.get("/get-magistrate-grid").headers["ETag"]
+    config_repo.invalidate()
+    resp = client.get("/get-magistrate-grid", headers={"If-None-Match": etag})
+    assert resp.status_code == 200
+    assert resp.headers["ETag"] != etag
@@ -0,0 +1,56 @@
+import json
+import threading
+import time
+
+import pytest
+
+pytest.importorskip("pyengine")
+
+from app.utils.status_stream import StatusBroadcaster  # noqa: E402
+
+
+def _events(chunk):
+    return [json.loads(line[len("data: "):]) for line in chunk.splitlines() if line.startswith("data: ")]
+
+
+class _Dashboard:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.state = {"magistrate-status-1": "online", "magistrate-status-2": "online"}
+        self.renders = 0
+
+    def fingerprint(self):
+        with self.lock:
+            return repr(sorted(self.state.items()))
+
+    def render(self):
+        with self.lock:
+            self.renders += 1
+            return {k: ("outerHTML", f"<div id='{k}'>{v}</div>") for k, v in self.state.items()}
+
+
+def test_only_changed_fragments_are_pushed_and_removed_ids_pruned():
+    board = _Dashboard()
+    broadcaster = StatusBroadcaster(board.render, poll_interval=0.01, fingerprint=board.fingerprint)
+    stream = broadcaster.stream(keepalive_sec=2)
+    assert next(stream).startswith("retry:")
+    assert {e["target"] for e in _events(next(stream))} == {"magistrate-status-1", "magistrate-status-2"}
+
+    # 状态不变：fingerprint 相同，不再渲染
+    time.sleep(0.1)
+    renders = board.renders
+    time.sleep(0.1)
+    assert board.renders == renders
+
+    with board.lock:
+        board.state["magistrate-status-2"] = "offline"
+    changed = _events(next(stream))
+    assert [e["target"] for e in changed] == ["magistrate-status-2"]
+
+    with board.lock:
+        del board.state["magistrate-status-1"]
+        board.state["magistrate-status-2"] = "online"
+    next(stream)
+    assert set(broadcaster._payloads) == {"magistrate-status-2"}
+    stream.close()
+    assert broadcaster.subscriber_count() == 0
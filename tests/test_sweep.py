@@ -0,0 +1,44 @@
+import pytest
+
+URL = "/panel/keyarea/1/ground-settings/sweep"
+POINTS = [[100, 300], [540, 300], [600, 470], [40, 470]]
+
+
+def test_grid_shape_follows_axes(client):
+    resp = client.post(URL, json={
+        "points": POINTS,
+        "axes": {"pitch_angle": {"center": -30, "span": 5, "num": 3}, "camera_height": [250, 300]},
+    })
+    assert resp.status_code == 200
+    data = resp.get_json()
+    assert data["params"] == ["camera_height", "pitch_angle"]
+    assert data["shape"] == [2, 3]
+    assert data["axes"]["pitch_angle"] == [-35.0, -30.0, -25.0]
+    assert len(data["ground_x"]) == len(data["ground_y"]) == 6
+
+
+@pytest.mark.parametrize("body", [
+    [1, 2, 3],
+    {"points": POINTS, "axes": [1, 2]},
+    {"points": POINTS},
+    {"points": POINTS, "axes": {"unknown": [1, 2]}},
+    {"points": POINTS, "axes": {"pitch_angle": {"start": 0, "stop": 1, "num": 0}}},
+    {"points": POINTS, "axes": {"pitch_angle": ["a"]}},
+    {"points": POINTS, "axes": {"pitch_angle": [float("nan")]}},
+    {"points": POINTS, "axes": {"pitch_angle": {"num": 3}}},
+    {"points": [[1, 2], [3, 4]], "axes": {"pitch_angle": [0]}},
+    {"points": [[1, 2, 3]] * 4, "axes": {"pitch_angle": [0]}},
+])
+def test_malformed_requests_are_rejected(client, body):
+    assert client.post(URL, json=body).status_code == 400
+
+
+def test_oversized_grid_is_rejected_before_allocation(client):
+    resp = client.post(URL, json={
+        "points": POINTS,
+        "axes": {
+            "camera_height": {"start": 0, "stop": 1, "num": 10 ** 6},
+            "pitch_angle": {"start": 0, "stop": 1, "num": 10 ** 6},
+        },
+    })
+    assert resp.status_code == 400